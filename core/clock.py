@@ -0,0 +1,160 @@
+"""
+Часы: реальные и виртуальные.
+
+Код с таймаутами получает часы параметром вместо прямых вызовов
+time.monotonic()/time.time()/time.sleep() и ожиданий Condition.
+В работе используются реальные часы (SYSTEM_CLOCK), а при воспроизведении
+записей и в тестах - VirtualClock: sleep() и ожидания мгновенно сдвигают
+время, поэтому таймауты отрабатывают быстрее реального времени и
+детерминированно.
+
+Использование:
+    clock = VirtualClock()
+    clock.add_listener(lambda now: ...)   # вызывается при каждом сдвиге
+    clock.sleep(2.0)                      # мгновенно, clock.now() вырос на 2.0
+    clock.wait_until(lambda: done, timeout=1.0)
+"""
+import threading
+import time
+from typing import Callable, Optional
+
+
+class Clock:
+    """Реальные часы: time.monotonic() и time.sleep()."""
+
+    def now(self) -> float:
+        """Монотонное время в секундах."""
+        return time.monotonic()
+
+    def time(self) -> float:
+        """Настенное время в секундах (отметки для других процессов и логов)."""
+        return time.time()
+
+    def sleep(self, seconds: float) -> None:
+        """Приостановить выполнение."""
+        if seconds > 0:
+            time.sleep(seconds)
+
+    def sleep_until(self, deadline: float) -> None:
+        """Спать до момента deadline по now()."""
+        self.sleep(deadline - self.now())
+
+    def wait_until(self, predicate: Callable[[], bool], timeout: Optional[float] = None,
+                   interval: float = 0.01) -> bool:
+        """
+        Опрашивать условие, пока оно не выполнится или не истечёт таймаут.
+
+        Args:
+            predicate: Проверяемое условие.
+            timeout: Максимальное время ожидания в секундах (None - без ограничения).
+            interval: Период опроса в секундах.
+
+        Returns:
+            True если условие выполнилось, False по таймауту.
+        """
+        deadline = None if timeout is None else self.now() + timeout
+        while not predicate():
+            if deadline is not None:
+                remaining = deadline - self.now()
+                if remaining <= 0:
+                    return False
+                self.sleep(min(interval, remaining))
+            else:
+                self.sleep(interval)
+        return True
+
+    def wait_for(self, condition: threading.Condition, predicate: Callable[[], bool],
+                 timeout: Optional[float] = None) -> bool:
+        """
+        Дождаться условия на Condition (вызывающий владеет её локом).
+
+        Args:
+            condition: Condition, на которой уведомляются изменения.
+            predicate: Проверяемое условие.
+            timeout: Максимальное время ожидания в секундах (None - без ограничения).
+
+        Returns:
+            True если условие выполнилось, False по таймауту.
+        """
+        return condition.wait_for(predicate, timeout=timeout)
+
+    def wait_event(self, event: threading.Event, timeout: Optional[float] = None) -> bool:
+        """
+        Дождаться установки Event (прерываемая пауза потоков-наблюдателей).
+
+        Args:
+            event: Ожидаемое событие.
+            timeout: Максимальное время ожидания в секундах (None - без ограничения).
+
+        Returns:
+            True если событие установлено, False по таймауту.
+        """
+        return event.wait(timeout)
+
+
+class VirtualClock(Clock):
+    """
+    Виртуальные часы для однопоточной симуляции.
+
+    Время меняется только через sleep()/advance() и ожидания; после
+    каждого сдвига вызываются слушатели (например, подача записанных
+    событий). Ожидания на Condition отпускают её лок на время сдвига,
+    чтобы слушатели могли изменить защищённое состояние и уведомить.
+    """
+
+    def __init__(self, start: float = 0.0, wall_offset: float = 0.0, step: float = 0.01):
+        """
+        Args:
+            start: Начальное время в секундах.
+            wall_offset: Настенное время в момент now() == 0 (time() = now() + wall_offset).
+            step: Шаг сдвига времени в ожиданиях wait_for().
+        """
+        self._now = start
+        self._wall_offset = wall_offset
+        self._step = step
+        self._listeners: list[Callable[[float], None]] = []
+
+    def now(self) -> float:
+        return self._now
+
+    def time(self) -> float:
+        return self._now + self._wall_offset
+
+    def sleep(self, seconds: float) -> None:
+        self.advance(seconds)
+
+    def wait_for(self, condition: threading.Condition, predicate: Callable[[], bool],
+                 timeout: Optional[float] = None) -> bool:
+        deadline = None if timeout is None else self._now + timeout
+        while not predicate():
+            if deadline is not None and self._now >= deadline:
+                return False
+            step = self._step if deadline is None else min(self._step, deadline - self._now)
+            condition.release()
+            try:
+                self.advance(step)
+            finally:
+                condition.acquire()
+        return True
+
+    def wait_event(self, event: threading.Event, timeout: Optional[float] = None) -> bool:
+        return self.wait_until(event.is_set, timeout=timeout, interval=self._step)
+
+    def advance(self, seconds: float) -> None:
+        """
+        Сдвинуть время вперёд и уведомить слушателей.
+
+        Args:
+            seconds: Сдвиг в секундах (отрицательный игнорируется).
+        """
+        self._now += max(0.0, seconds)
+        for listener in self._listeners:
+            listener(self._now)
+
+    def add_listener(self, listener: Callable[[float], None]) -> None:
+        """Вызывать listener(now) после каждого сдвига времени."""
+        self._listeners.append(listener)
+
+
+# Реальные часы по умолчанию
+SYSTEM_CLOCK = Clock()
@@ -26,6 +26,17 @@ def _get_env_int(key: str, default: int) -> int:
         return default
 
 
+def _get_env_int_list(key: str, default: list[int]) -> list[int]:
+    """Получить список целых чисел (через запятую) из переменной окружения."""
+    value = os.getenv(key)
+    if value is None:
+        return list(default)
+    try:
+        return [int(item) for item in value.split(",") if item.strip()]
+    except ValueError:
+        return list(default)
+
+
 def _get_env_float(key: str, default: float) -> float:
     """Получить число с плавающей точкой из переменной окружения."""
     value = os.getenv(key)
@@ -45,6 +56,37 @@ class Settings:
     model_path: Path = field(default_factory=lambda: Path("weights/best_11s_rknn_model"))
     image_size: int = 1280
     warmup_runs: int = 2
+    # Прогрев записанными кадрами до стабилизации задержки
+    warmup_frames_dir: Path = field(default_factory=lambda: Path("imgs"))
+    warmup_max_runs: int = 20
+    warmup_window: int = 3
+    warmup_tolerance: float = 0.15
+    # Горячая замена модели: проверка на эталонных кадрах (метка в имени файла)
+    model_reference_dir: Path = field(default_factory=lambda: Path("imgs"))
+    model_swap_min_accuracy: float = 0.75
+    # Каскад: быстрая модель низкого разрешения, полная - только при сомнении
+    # (пустой путь - каскад выключен)
+    cascade_model_path: str = ""
+    cascade_image_size: int = 320
+    cascade_confidence: float = 0.9
+    cascade_margin: float = 0.5
+    # Дополнительные экспортированные разрешения: "640=weights/best_640,960=weights/best_960"
+    # (model_path всегда используется для image_size). Разрешение выбирается
+    # на каждый запрос по бюджету задержки (0 - бюджет только из срока запроса)
+    resolution_models: str = ""
+    latency_budget_ms: float = 0.0
+    # TTA для сомнительных кадров: отражение и центральная обрезка одним пакетом,
+    # только если уверенность ниже tta_threshold
+    tta_enabled: bool = False
+    tta_threshold: float = 0.6
+    tta_crop: float = 0.85
+
+    # Пул инференса (несколько экземпляров модели, например по ядрам NPU)
+    inference_workers: int = 1
+    inference_queue_size: int = 16
+    inference_queue_timeout: float = 5.0
+    # Срок ответа на запрос (меньше vision_timeout в Application, 2 сек)
+    inference_deadline: float = 1.8
 
     # Камера (2K разрешение)
     camera_index: int = 0
@@ -53,9 +95,46 @@ class Settings:
     camera_fps: int = 30
     camera_fourcc: str = "MJPG"
 
-    # Буфер кадров
+    # Поиск камеры: кэш найденного устройства и число перебираемых индексов
+    camera_cache_path: Path = field(default_factory=lambda: Path("camera_cache.json"))
+    camera_scan_max: int = 5
+    camera_reopen_delay: float = 2.0
+    camera_reopen_max_delay: float = 30.0
+    camera_stall_timeout: float = 1.0
+    camera_min_fps: float = 5.0
+
+    # Группа камер (несколько ракурсов). Пустой список - одна камера
+    camera_group: list[int] = field(default_factory=list)
+    camera_sync_tolerance: float = 0.05
+
+    # Буфер кадров (минимум: с оценкой качества буфер растёт до
+    # ceil(best_frame_window * camera_fps) + 1 кадров, см. CameraManager.buffer_capacity)
     frame_buffer_size: int = 3
 
+    # Детектор движения/занятости на потоке захвата
+    motion_detection: bool = True
+    motion_pixel_threshold: int = 25
+    motion_ratio: float = 0.005
+    occupancy_ratio: float = 0.02
+    stable_frames: int = 5
+    stable_wait_timeout: float = 1.0
+    speculative_inference: bool = True
+
+    # Шина кадров в разделяемой памяти для других процессов (пусто - выключена)
+    frame_bus_name: str = ""
+    frame_bus_slots: int = 8
+
+    # Оценка качества кадров (резкость/экспозиция)
+    frame_quality: bool = True
+    quality_roi: float = 0.6
+    best_frame_window: float = 0.3
+
+    # Кэш результатов по перцептивному хэшу (0 - выключен; по умолчанию выключен:
+    # новый объект в неизменной сцене может получить ответ предыдущего)
+    result_cache_size: int = 0
+    result_cache_max_distance: int = 4
+    result_cache_ttl: float = 2.0
+
     # TCP сервер (deprecated, используется WebSocket)
     tcp_host: str = "0.0.0.0"
     tcp_port: int = 8081
@@ -66,6 +145,10 @@ class Settings:
     websocket_port: int = 8765
     websocket_reconnect_delay: float = 5.0
 
+    # Протокол запросов Application → vision: "json" (запросы с id) или
+    # "string" (совместимость со старым vision, не знающим команду classify)
+    vision_protocol: str = "json"
+
     # Retry настройки для камеры
     retry_count: int = 3
     retry_delay: float = 0.5
@@ -74,6 +157,11 @@ class Settings:
     output_dir: Path = field(default_factory=lambda: Path("real_time"))
     save_frames: bool = True
 
+    # Бортовой самописец: последние записи процесса, сброс при ошибке/по команде
+    flight_recorder_size: int = 4096
+    flight_recorder_seconds: float = 60.0
+    flight_recorder_dir: Path = field(default_factory=lambda: Path("flight_records"))
+
     @classmethod
     def from_env(cls, env_path: Optional[Path] = None) -> "Settings":
         """
@@ -95,6 +183,27 @@ class Settings:
             model_path=_get_env_path("MODEL_PATH", "weights/best_11s_rknn_model"),
             image_size=_get_env_int("IMAGE_SIZE", 1280),
             warmup_runs=_get_env_int("WARMUP_RUNS", 2),
+            warmup_frames_dir=_get_env_path("WARMUP_FRAMES_DIR", "imgs"),
+            warmup_max_runs=_get_env_int("WARMUP_MAX_RUNS", 20),
+            warmup_window=_get_env_int("WARMUP_WINDOW", 3),
+            warmup_tolerance=_get_env_float("WARMUP_TOLERANCE", 0.15),
+            model_reference_dir=_get_env_path("MODEL_REFERENCE_DIR", "imgs"),
+            model_swap_min_accuracy=_get_env_float("MODEL_SWAP_MIN_ACCURACY", 0.75),
+            cascade_model_path=os.getenv("CASCADE_MODEL_PATH", ""),
+            cascade_image_size=_get_env_int("CASCADE_IMAGE_SIZE", 320),
+            cascade_confidence=_get_env_float("CASCADE_CONFIDENCE", 0.9),
+            cascade_margin=_get_env_float("CASCADE_MARGIN", 0.5),
+            resolution_models=os.getenv("RESOLUTION_MODELS", ""),
+            latency_budget_ms=_get_env_float("LATENCY_BUDGET_MS", 0.0),
+            tta_enabled=os.getenv("TTA_ENABLED", "false").lower() in ("true", "1", "yes"),
+            tta_threshold=_get_env_float("TTA_THRESHOLD", 0.6),
+            tta_crop=_get_env_float("TTA_CROP", 0.85),
+
+            # Пул инференса
+            inference_workers=_get_env_int("INFERENCE_WORKERS", 1),
+            inference_queue_size=_get_env_int("INFERENCE_QUEUE_SIZE", 16),
+            inference_queue_timeout=_get_env_float("INFERENCE_QUEUE_TIMEOUT", 5.0),
+            inference_deadline=_get_env_float("INFERENCE_DEADLINE", 1.8),
 
             # Камера (2K разрешение)
             camera_index=_get_env_int("CAMERA_INDEX", 0),
@@ -102,10 +211,41 @@ class Settings:
             camera_height=_get_env_int("CAMERA_HEIGHT", 1440),
             camera_fps=_get_env_int("CAMERA_FPS", 30),
             camera_fourcc=os.getenv("CAMERA_FOURCC", "MJPG"),
+            camera_cache_path=_get_env_path("CAMERA_CACHE_PATH", "camera_cache.json"),
+            camera_scan_max=_get_env_int("CAMERA_SCAN_MAX", 5),
+            camera_reopen_delay=_get_env_float("CAMERA_REOPEN_DELAY", 2.0),
+            camera_reopen_max_delay=_get_env_float("CAMERA_REOPEN_MAX_DELAY", 30.0),
+            camera_stall_timeout=_get_env_float("CAMERA_STALL_TIMEOUT", 1.0),
+            camera_min_fps=_get_env_float("CAMERA_MIN_FPS", 5.0),
+            camera_group=_get_env_int_list("CAMERA_GROUP", []),
+            camera_sync_tolerance=_get_env_float("CAMERA_SYNC_TOLERANCE", 0.05),
 
             # Буфер
             frame_buffer_size=_get_env_int("FRAME_BUFFER_SIZE", 3),
 
+            # Детектор движения
+            motion_detection=os.getenv("MOTION_DETECTION", "true").lower() in ("true", "1", "yes"),
+            motion_pixel_threshold=_get_env_int("MOTION_PIXEL_THRESHOLD", 25),
+            motion_ratio=_get_env_float("MOTION_RATIO", 0.005),
+            occupancy_ratio=_get_env_float("OCCUPANCY_RATIO", 0.02),
+            stable_frames=_get_env_int("STABLE_FRAMES", 5),
+            stable_wait_timeout=_get_env_float("STABLE_WAIT_TIMEOUT", 1.0),
+            speculative_inference=os.getenv("SPECULATIVE_INFERENCE", "true").lower() in ("true", "1", "yes"),
+
+            # Шина кадров
+            frame_bus_name=os.getenv("FRAME_BUS_NAME", ""),
+            frame_bus_slots=_get_env_int("FRAME_BUS_SLOTS", 8),
+
+            # Качество кадров
+            frame_quality=os.getenv("FRAME_QUALITY", "true").lower() in ("true", "1", "yes"),
+            quality_roi=_get_env_float("QUALITY_ROI", 0.6),
+            best_frame_window=_get_env_float("BEST_FRAME_WINDOW", 0.3),
+
+            # Кэш результатов
+            result_cache_size=_get_env_int("RESULT_CACHE_SIZE", 0),
+            result_cache_max_distance=_get_env_int("RESULT_CACHE_MAX_DISTANCE", 4),
+            result_cache_ttl=_get_env_float("RESULT_CACHE_TTL", 2.0),
+
             # TCP (deprecated)
             tcp_host=os.getenv("TCP_HOST", "0.0.0.0"),
             tcp_port=_get_env_int("TCP_PORT", 8081),
@@ -115,6 +255,7 @@ class Settings:
             websocket_host=os.getenv("WEBSOCKET_HOST", "localhost"),
             websocket_port=_get_env_int("WEBSOCKET_PORT", 8765),
             websocket_reconnect_delay=_get_env_float("WEBSOCKET_RECONNECT_DELAY", 5.0),
+            vision_protocol=os.getenv("VISION_PROTOCOL", "json").strip().lower(),
 
             # Retry
             retry_count=_get_env_int("RETRY_COUNT", 3),
@@ -123,6 +264,11 @@ class Settings:
             # Вывод
             output_dir=_get_env_path("OUTPUT_DIR", "real_time"),
             save_frames=os.getenv("SAVE_FRAMES", "true").lower() in ("true", "1", "yes"),
+
+            # Бортовой самописец
+            flight_recorder_size=_get_env_int("FLIGHT_RECORDER_SIZE", 4096),
+            flight_recorder_seconds=_get_env_float("FLIGHT_RECORDER_SECONDS", 60.0),
+            flight_recorder_dir=_get_env_path("FLIGHT_RECORDER_DIR", "flight_records"),
         )
 
 
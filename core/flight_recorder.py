@@ -0,0 +1,291 @@
+"""
+Бортовой самописец: кольцевой буфер последних событий процесса.
+
+Обеспечивает:
+- Запись снимков ПЛК, переходов состояний, сообщений WebSocket и
+  результатов инференса с отметками time.monotonic()
+- Постоянную работу в продакшене: буфер выделяется заранее, запись -
+  присваивание в слот под коротким локом, без форматирования
+- Сброс последних N секунд в JSONL при ошибке или по команде
+
+Время записей - CLOCK_MONOTONIC, общий для процессов одной машины,
+поэтому файлы app и vision сопоставляются по полю t. Заголовок файла
+содержит wall_offset для перевода в настенное время (t + wall_offset).
+
+Использование:
+    recorder = FlightRecorder("app")
+    recorder.record("state", {"from": "idle", "to": "waiting_vision"})
+    recorder.dump_async(reason="vision_timeout")
+
+    python -m core.flight_recorder flight_records/app_20251111_104852.jsonl
+"""
+import argparse
+import json
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Optional
+
+from core.clock import SYSTEM_CLOCK, Clock
+from core.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+# Виды записей
+KIND_PLC = "plc"
+KIND_STATE = "state"
+KIND_WS_IN = "ws_in"
+KIND_WS_OUT = "ws_out"
+KIND_INFERENCE = "inference"
+KIND_EVENT = "event"
+
+# Сообщения длиннее MAX_MESSAGE_CHARS сокращаются перед записью: строковые
+# поля длиннее MAX_FIELD_CHARS (например, photo_base64) заменяются их длиной
+MAX_MESSAGE_CHARS = 4096
+MAX_FIELD_CHARS = 256
+
+
+def compact_message(message: Any) -> Any:
+    """
+    Сократить большое сообщение WebSocket для записи в самописец.
+
+    Короткие сообщения возвращаются как есть (без разбора). В JSON
+    объекте длинные строковые поля заменяются на "<N символов>",
+    прочие сообщения обрезаются до MAX_MESSAGE_CHARS.
+
+    Args:
+        message: Сообщение (строка) или другие данные записи.
+
+    Returns:
+        Сообщение для записи.
+    """
+    if not isinstance(message, str) or len(message) <= MAX_MESSAGE_CHARS:
+        return message
+    try:
+        data = json.loads(message)
+    except json.JSONDecodeError:
+        data = None
+    if not isinstance(data, dict):
+        return f"{message[:MAX_MESSAGE_CHARS]}...<{len(message)} символов>"
+    return json.dumps({
+        key: f"<{len(value)} символов>" if isinstance(value, str) and len(value) > MAX_FIELD_CHARS else value
+        for key, value in data.items()
+    }, ensure_ascii=False)
+
+
+class FlightRecorder:
+    """
+    Кольцевой буфер записей фиксированного размера.
+
+    Данные записи сохраняются по ссылке: передавайте новые объекты
+    (строки, кортежи, свежие словари), которые дальше не изменяются.
+    Сериализация выполняется только при сбросе.
+    """
+
+    def __init__(
+        self,
+        process: str,
+        capacity: int = 4096,
+        seconds: float = 60.0,
+        directory: Path = Path("flight_records"),
+        min_dump_interval: float = 10.0,
+        clock: Optional[Clock] = None,
+    ):
+        """
+        Args:
+            process: Имя процесса (префикс файлов).
+            capacity: Количество записей в буфере.
+            seconds: Сколько последних секунд сбрасывать по умолчанию.
+            directory: Папка для файлов сброса.
+            min_dump_interval: Минимальный интервал автоматических сбросов (сек).
+            clock: Часы для отметок времени (по умолчанию реальные).
+        """
+        self.process = process
+        self._capacity = max(1, capacity)
+        self._seconds = seconds
+        self._directory = Path(directory)
+        self._min_dump_interval = min_dump_interval
+        self._clock = clock if clock is not None else SYSTEM_CLOCK
+
+        # Предвыделенные слоты: время, вид, данные
+        self._times = [0.0] * self._capacity
+        self._kinds: list[Optional[str]] = [None] * self._capacity
+        self._data: list[Any] = [None] * self._capacity
+        self._count = 0
+        self._lock = threading.Lock()
+
+        self._last_auto_dump: Optional[float] = None
+
+    @classmethod
+    def from_settings(cls, settings, process: str, clock: Optional[Clock] = None) -> "FlightRecorder":
+        """Создать самописец по настройкам (flight_recorder_*)."""
+        return cls(
+            process,
+            capacity=settings.flight_recorder_size,
+            seconds=settings.flight_recorder_seconds,
+            directory=settings.flight_recorder_dir,
+            clock=clock,
+        )
+
+    @property
+    def capacity(self) -> int:
+        """Размер буфера в записях."""
+        return self._capacity
+
+    def __len__(self) -> int:
+        return min(self._count, self._capacity)
+
+    def record(self, kind: str, data: Any = None) -> None:
+        """
+        Добавить запись (самая старая перезаписывается).
+
+        Args:
+            kind: Вид записи (KIND_*).
+            data: Данные записи (JSON-совместимые).
+        """
+        now = self._clock.now()
+        with self._lock:
+            slot = self._count % self._capacity
+            self._times[slot] = now
+            self._kinds[slot] = kind
+            self._data[slot] = data
+            self._count += 1
+
+    def entries(self, seconds: Optional[float] = None) -> list[tuple[float, str, Any]]:
+        """
+        Записи в хронологическом порядке.
+
+        Args:
+            seconds: Только последние seconds секунд (None - весь буфер).
+
+        Returns:
+            Список (t, kind, data).
+        """
+        with self._lock:
+            count = self._count
+            size = min(count, self._capacity)
+            start = count - size
+            slots = [(start + i) % self._capacity for i in range(size)]
+            items = [(self._times[s], self._kinds[s], self._data[s]) for s in slots]
+
+        if seconds is not None:
+            since = self._clock.now() - seconds
+            items = [item for item in items if item[0] >= since]
+        return items
+
+    def dump(self, reason: str = "request", seconds: Optional[float] = None,
+             path: Optional[Path] = None) -> Path:
+        """
+        Сбросить последние записи в JSONL файл.
+
+        Первая строка - заголовок (процесс, причина, время), далее по
+        строке на запись: {"t": ..., "kind": ..., "data": ...}.
+
+        Args:
+            reason: Причина сброса.
+            seconds: Сколько последних секунд сбросить (None - из настроек).
+            path: Файл (по умолчанию directory/<process>_<дата>_<reason>.jsonl).
+
+        Returns:
+            Путь к файлу.
+        """
+        return self._write(self.entries(seconds if seconds is not None else self._seconds), reason, path)
+
+    def dump_async(self, reason: str, seconds: Optional[float] = None, force: bool = False) -> Optional[Path]:
+        """
+        Сбросить записи в фоновом потоке (не задерживает вызывающий цикл).
+
+        Записи копируются сразу, файл пишется в отдельном потоке.
+        Автоматические сбросы чаще min_dump_interval пропускаются.
+
+        Args:
+            reason: Причина сброса.
+            seconds: Сколько последних секунд сбросить (None - из настроек).
+            force: Сбросить независимо от интервала (сброс по команде).
+
+        Returns:
+            Путь к будущему файлу или None, если сброс пропущен.
+        """
+        now = self._clock.now()
+        if not force:
+            if self._last_auto_dump is not None and now - self._last_auto_dump < self._min_dump_interval:
+                return None
+            self._last_auto_dump = now
+
+        items = self.entries(seconds if seconds is not None else self._seconds)
+        path = self._default_path(reason)
+        threading.Thread(
+            target=self._write, args=(items, reason, path), name="FlightRecorderDump", daemon=True
+        ).start()
+        return path
+
+    def _default_path(self, reason: str) -> Path:
+        """Имя файла сброса: процесс, время и причина."""
+        stamp = datetime.fromtimestamp(self._clock.time()).strftime("%Y%m%d_%H%M%S_%f")
+        return self._directory / f"{self.process}_{stamp}_{reason}.jsonl"
+
+    def _write(self, items: list, reason: str, path: Optional[Path]) -> Path:
+        """Записать заголовок и записи в JSONL."""
+        path = Path(path) if path else self._default_path(reason)
+        now = self._clock.now()
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            header = {
+                "process": self.process,
+                "reason": reason,
+                "entries": len(items),
+                "capacity": self._capacity,
+                "monotonic": round(now, 6),
+                "wall_offset": round(self._clock.time() - now, 6),
+            }
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(json.dumps(header, ensure_ascii=False) + "\n")
+                for t, kind, data in items:
+                    f.write(json.dumps({"t": round(t, 6), "kind": kind, "data": data},
+                                       ensure_ascii=False, separators=(",", ":"), default=str) + "\n")
+            logger.info("Самописец: %s записей сброшено в %s (%s)", len(items), path, reason)
+        except OSError as e:
+            logger.error(f"Самописец: не удалось записать {path}: {e}")
+        return path
+
+
+def load_dump(path: Path) -> tuple[dict, list[dict]]:
+    """
+    Прочитать файл сброса.
+
+    Args:
+        path: JSONL файл самописца.
+
+    Returns:
+        Кортеж (заголовок, записи).
+    """
+    with open(path, encoding="utf-8") as f:
+        lines = [json.loads(line) for line in f if line.strip()]
+    if not lines:
+        return {}, []
+    return lines[0], lines[1:]
+
+
+def main():
+    """Печать файлов сброса одной хронологией (app и vision вместе)."""
+    parser = argparse.ArgumentParser(description="Просмотр файлов бортового самописца")
+    parser.add_argument("files", type=Path, nargs="+", help="JSONL файлы сброса")
+    parser.add_argument("--kind", action="append", help="Только записи этого вида (можно несколько)")
+    args = parser.parse_args()
+
+    timeline = []
+    for path in args.files:
+        header, entries = load_dump(path)
+        offset = header.get("wall_offset", 0.0)
+        for entry in entries:
+            if args.kind and entry["kind"] not in args.kind:
+                continue
+            timeline.append((entry["t"], offset, header.get("process", "?"), entry))
+
+    for t, offset, process, entry in sorted(timeline, key=lambda item: item[0]):
+        wall = datetime.fromtimestamp(t + offset).strftime("%H:%M:%S.%f")[:-3]
+        print(f"{wall} {process:<6} {entry['kind']:<9} {json.dumps(entry['data'], ensure_ascii=False)}")
+
+
+if __name__ == "__main__":
+    main()
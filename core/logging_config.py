@@ -7,6 +7,23 @@
 - WARNING: предупреждения (таймауты, повторные попытки)
 - ERROR: ошибки (исключения, сбои)
 
+Запись асинхронная: логгеры кладут записи в очередь (QueueHandler),
+а форматирование и вывод выполняет отдельный поток (QueueListener).
+Поэтому задержки консоли или диска не попадают в state machine и
+инференс. Сообщение форматируется лениво - в потоке вывода, поэтому
+в горячих путях аргументы передаются отдельно, а не f-строкой:
+
+    logger.debug("Предсказание: %s (%.3f)", class_name, confidence)
+
+Структурные поля передаются через extra и выводятся как key=value
+или поля JSON:
+
+    logger.info("Ответ vision", extra={"fields": {"id": 17, "ms": 41.2}})
+
+DEBUG записи каждого модуля ограничиваются по частоте (LOG_RATE_LIMIT
+в секунду); число пропущенных записей выводится в поле suppressed
+следующей записи модуля.
+
 Использование:
     from logging_config import get_logger
     logger = get_logger(__name__)
@@ -15,13 +32,28 @@
 
 Переменные окружения:
     LOG_LEVEL: уровень логирования (DEBUG, INFO, WARNING, ERROR)
-    LOG_FORMAT: формат сообщений (simple, detailed)
+    LOG_FORMAT: формат сообщений (simple, detailed, kv, json)
+    LOG_ASYNC: запись через очередь и отдельный поток (true/false, по умолчанию true)
+    LOG_QUEUE_SIZE: размер очереди (при переполнении записи отбрасываются)
+    LOG_RATE_LIMIT: DEBUG записей в секунду на модуль (0 - без ограничения)
 """
 
+import atexit
+import json
 import logging
+import logging.handlers
 import os
+import queue
+import threading
+import time
 from typing import Optional
 
+_DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# Установленные setup_logging обработчик root и поток вывода
+_root_handler: Optional[logging.Handler] = None
+_listener: Optional[logging.handlers.QueueListener] = None
+
 
 def get_log_level() -> int:
     """Получить уровень логирования из переменной окружения."""
@@ -44,27 +76,199 @@ def get_log_format() -> str:
     return "[%(levelname)s] %(name)s: %(message)s"
 
 
-def setup_logging(level: Optional[int] = None) -> None:
+def _record_fields(record: logging.LogRecord) -> dict:
+    """Структурные поля записи (extra={"fields": ...}) и число пропущенных записей."""
+    fields = dict(getattr(record, "fields", None) or {})
+    suppressed = getattr(record, "suppressed", 0)
+    if suppressed:
+        fields["suppressed"] = suppressed
+    return fields
+
+
+class TextFormatter(logging.Formatter):
+    """Текстовый формат (simple/detailed) со структурными полями в конце строки."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        text = super().format(record)
+        fields = _record_fields(record)
+        if fields:
+            text += " " + " ".join(f"{key}={value}" for key, value in fields.items())
+        return text
+
+
+class KeyValueFormatter(logging.Formatter):
+    """Формат key=value: одна запись - одна строка."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        items = {
+            "ts": self.formatTime(record, _DATE_FORMAT),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+            **_record_fields(record),
+        }
+        text = " ".join(f"{key}={_kv_value(value)}" for key, value in items.items())
+        if record.exc_info:
+            text += " exc=" + json.dumps(self.formatException(record.exc_info), ensure_ascii=False)
+        return text
+
+
+def _kv_value(value) -> str:
+    """Значение для формата key=value (строки с пробелами - в кавычках)."""
+    if isinstance(value, str) and (not value or " " in value or "=" in value):
+        return json.dumps(value, ensure_ascii=False)
+    return str(value)
+
+
+class JsonFormatter(logging.Formatter):
+    """Формат JSON lines: одна запись - один JSON объект."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+            **_record_fields(record),
+        }
+        if record.exc_info:
+            data["exc"] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+def get_formatter() -> logging.Formatter:
+    """Форматтер по LOG_FORMAT."""
+    format_type = os.getenv("LOG_FORMAT", "simple").lower()
+    if format_type == "json":
+        return JsonFormatter()
+    if format_type == "kv":
+        return KeyValueFormatter()
+    return TextFormatter(get_log_format(), datefmt=_DATE_FORMAT)
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Ограничение частоты DEBUG записей по модулям (token bucket).
+
+    Записи выше DEBUG проходят всегда. Пропущенные записи считаются,
+    и их число попадает в поле suppressed следующей записи модуля.
+    """
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        """
+        Args:
+            rate: Записей в секунду на модуль.
+            burst: Допустимый всплеск (по умолчанию равен rate).
+        """
+        super().__init__()
+        self._rate = rate
+        self._burst = burst if burst is not None else max(1.0, rate)
+        self._buckets: dict[str, list] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(record.name)
+            if bucket is None:
+                # [токены, время последнего пополнения, пропущено]
+                bucket = self._buckets[record.name] = [self._burst, now, 0]
+            bucket[0] = min(self._burst, bucket[0] + (now - bucket[1]) * self._rate)
+            bucket[1] = now
+
+            if record.levelno <= logging.DEBUG:
+                if bucket[0] < 1.0:
+                    bucket[2] += 1
+                    return False
+                bucket[0] -= 1.0
+
+            if bucket[2]:
+                record.suppressed = bucket[2]
+                bucket[2] = 0
+        return True
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler без форматирования в вызывающем потоке и без ожидания.
+
+    Запись передаётся в очередь как есть (сообщение собирается в потоке
+    вывода, поэтому изменяемые аргументы не стоит менять после вызова
+    логгера), а при переполнении очереди отбрасывается и учитывается в dropped.
+    """
+
+    def __init__(self, record_queue: queue.Queue):
+        super().__init__(record_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def _stop_listener() -> None:
+    """Остановить поток вывода, дописав оставшиеся записи."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def setup_logging(level: Optional[int] = None, async_mode: Optional[bool] = None) -> None:
     """
-    Настроить базовое логирование для всего приложения.
+    Настроить логирование для всего приложения.
+
+    Повторный вызов заменяет ранее установленные обработчики.
 
     Args:
         level: Уровень логирования (если None, берётся из LOG_LEVEL).
+        async_mode: Запись через очередь (если None, берётся из LOG_ASYNC).
     """
+    global _root_handler, _listener
+
     if level is None:
         level = get_log_level()
+    if async_mode is None:
+        async_mode = os.getenv("LOG_ASYNC", "true").lower() in ("true", "1", "yes")
+
+    root = logging.getLogger()
+    if _root_handler is not None:
+        root.removeHandler(_root_handler)
+        _stop_listener()
+
+    output = logging.StreamHandler()
+    output.setFormatter(get_formatter())
+
+    if async_mode:
+        handler = NonBlockingQueueHandler(queue.Queue(maxsize=_get_int("LOG_QUEUE_SIZE", 10000)))
+        _listener = logging.handlers.QueueListener(handler.queue, output)
+        _listener.start()
+    else:
+        handler = output
 
-    logging.basicConfig(
-        level=level,
-        format=get_log_format(),
-        datefmt="%Y-%m-%d %H:%M:%S",
-    )
+    rate = _get_float("LOG_RATE_LIMIT", 20.0)
+    if rate > 0:
+        handler.addFilter(RateLimitFilter(rate))
+
+    root.addHandler(handler)
+    root.setLevel(level)
+    _root_handler = handler
 
     # Подавляем излишние логи от библиотек
     logging.getLogger("websockets").setLevel(logging.WARNING)
     logging.getLogger("asyncio").setLevel(logging.WARNING)
 
 
+def dropped_records() -> int:
+    """Число записей, отброшенных из-за переполнения очереди."""
+    return getattr(_root_handler, "dropped", 0)
+
+
 def get_logger(name: str) -> logging.Logger:
     """
     Получить логгер для модуля.
@@ -82,3 +286,39 @@ def get_logger(name: str) -> logging.Logger:
         setup_logging()
 
     return logger
+
+
+def log_timing(metric: str, elapsed_ms: float, **fields) -> None:
+    """
+    Записать замер задержки структурной записью логгера timing.
+
+    Args:
+        metric: Имя замера (например, "veil_cleared→vision_response").
+        elapsed_ms: Задержка, мс.
+        **fields: Дополнительные поля (id запроса, задержка модели и т.п.).
+    """
+    timing_logger = get_logger("timing")
+    if timing_logger.isEnabledFor(logging.INFO):
+        timing_logger.info(
+            "%s: %.2f мс", metric, elapsed_ms,
+            extra={"fields": {"metric": metric, "ms": round(elapsed_ms, 2), **fields}},
+        )
+
+
+def _get_int(key: str, default: int) -> int:
+    """Целое из переменной окружения."""
+    try:
+        return int(os.getenv(key, default))
+    except ValueError:
+        return default
+
+
+def _get_float(key: str, default: float) -> float:
+    """Число из переменной окружения."""
+    try:
+        return float(os.getenv(key, default))
+    except ValueError:
+        return default
+
+
+atexit.register(_stop_listener)
@@ -0,0 +1,33 @@
+"""
+Статистика задержек для отчётов (нагрузочный тест, оценка модели).
+"""
+import math
+
+
+def percentiles(samples: list) -> dict:
+    """
+    Сводка задержек (мс): p50/p95/p99, среднее и максимум.
+
+    Args:
+        samples: Список задержек в миллисекундах.
+
+    Returns:
+        Словарь со статистикой (пустой список → только count).
+    """
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+
+    def pick(p: float) -> float:
+        # Nearest-rank: ceil(p/100 * n)-й элемент по порядку
+        idx = min(len(ordered) - 1, max(0, math.ceil(p / 100 * len(ordered)) - 1))
+        return round(ordered[idx], 3)
+
+    return {
+        "count": len(ordered),
+        "p50_ms": pick(50),
+        "p95_ms": pick(95),
+        "p99_ms": pick(99),
+        "mean_ms": round(sum(ordered) / len(ordered), 3),
+        "max_ms": round(ordered[-1], 3),
+    }
@@ -0,0 +1,122 @@
+"""
+Протокол запросов классификации между Application и vision.
+
+JSON режим (по умолчанию):
+    → {"command": "classify", "id": "17", "hint": "bottle", "sent_at": 1718000000.123, "timeout_ms": 2000}
+    ← {"id": "17", "result": "bottle", "confidence": 0.973, "received_at": ..., "replied_at": ...,
+       "model_ms": 41.2, "queue_ms": 0.3}
+
+Ответ без результата к сроку: {"id": "17", "result": "none", "error": "deadline_exceeded", ...}.
+Ответы сопоставляются с запросами по id: опоздавший ответ на прошлый
+запрос отбрасывается, а не принимается за ответ на текущий.
+
+Строковый режим (совместимость со старыми клиентами):
+    → "bottle_exist" | "bank_exist"
+    ← "bottle" | "bank" | "none"
+
+Кроме ответов vision сам присылает состояние сервиса (без запроса):
+    ← {"status": "warming" | "ready" | "failed", "model_ready": ..., ...}
+"""
+import json
+import time
+from dataclasses import asdict, dataclass
+from typing import Optional
+
+PROTOCOL_JSON = "json"
+PROTOCOL_STRING = "string"
+
+CLASSIFY_COMMAND = "classify"
+
+# Результаты классификации
+VISION_RESULTS = ("bottle", "bank", "none")
+
+
+@dataclass
+class VisionReply:
+    """Ответ vision на запрос классификации."""
+
+    result: str
+    id: Optional[str] = None
+    confidence: Optional[float] = None
+    received_at: Optional[float] = None
+    replied_at: Optional[float] = None
+    model_ms: Optional[float] = None
+    queue_ms: Optional[float] = None
+    error: Optional[str] = None
+
+    def to_json(self) -> str:
+        """Сериализовать ответ (поля None не передаются)."""
+        return json.dumps({key: value for key, value in asdict(self).items() if value is not None})
+
+
+def build_request(request_id: str, hint: Optional[str] = None, timeout: Optional[float] = None) -> str:
+    """
+    Сформировать JSON запрос классификации.
+
+    Args:
+        request_id: Идентификатор запроса.
+        hint: Тип контейнера по датчикам ПЛК ("bottle", "bank") или None.
+        timeout: Сколько Application ждёт ответ (сек).
+
+    Returns:
+        JSON строка запроса.
+    """
+    request = {"command": CLASSIFY_COMMAND, "id": request_id, "sent_at": round(time.time(), 6)}
+    if hint:
+        request["hint"] = hint
+    if timeout is not None:
+        request["timeout_ms"] = int(timeout * 1000)
+    return json.dumps(request)
+
+
+def parse_reply(message: str) -> Optional[VisionReply]:
+    """
+    Разобрать ответ vision в любом из режимов.
+
+    Args:
+        message: Сообщение от клиента vision.
+
+    Returns:
+        VisionReply (id=None для строкового протокола) или None,
+        если сообщение не является ответом на классификацию.
+    """
+    if not message:
+        return None
+
+    if message.startswith("{"):
+        try:
+            data = json.loads(message)
+        except json.JSONDecodeError:
+            return None
+        if not isinstance(data, dict) or data.get("result") not in VISION_RESULTS:
+            return None  # например, ответ get_photo
+        fields = VisionReply.__dataclass_fields__
+        reply = VisionReply(**{key: value for key, value in data.items() if key in fields})
+        if reply.id is not None:
+            reply.id = str(reply.id)
+        return reply
+
+    message = message.strip().lower()
+    return VisionReply(result=message) if message in VISION_RESULTS else None
+
+
+def parse_status(message: str) -> Optional[dict]:
+    """
+    Разобрать сообщение о состоянии сервиса vision.
+
+    Args:
+        message: Сообщение от клиента vision.
+
+    Returns:
+        Словарь состояния или None, если это не сообщение о состоянии
+        (ответ на классификацию, фото, строковый протокол).
+    """
+    if not message or not message.startswith("{") or '"status"' not in message:
+        return None
+    try:
+        data = json.loads(message)
+    except json.JSONDecodeError:
+        return None
+    if isinstance(data, dict) and "status" in data and not {"result", "command"} & data.keys():
+        return data
+    return None
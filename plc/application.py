@@ -1,4 +1,3 @@
-import time
 import json
 import base64
 from pathlib import Path
@@ -9,7 +8,11 @@ import signal
 import sys
 from websocket import WebSocket
 from enum import Enum
-from core.logging_config import get_logger, setup_logging
+from core.clock import SYSTEM_CLOCK
+from core.config import get_settings
+from core.flight_recorder import KIND_PLC, KIND_STATE, FlightRecorder
+from core.logging_config import get_logger, log_timing, setup_logging
+from core.vision_protocol import PROTOCOL_STRING, PROTOCOL_JSON, build_request, parse_reply
 
 # Инициализация логирования
 setup_logging()
@@ -25,7 +28,7 @@ class AppState(Enum):
     ERROR = "error"
 
 class Application:
-    def __init__(self, serial_port, baudrate, slave_address, cmd_register = 25, status_register = 26, update_data_period = 0.1, web_socket_port = 8765, web_socket_host = 'localhost', speed = 500, photos_dir = 'photos'):
+    def __init__(self, serial_port, baudrate, slave_address, cmd_register = 25, status_register = 26, update_data_period = 0.1, web_socket_port = 8765, web_socket_host = 'localhost', speed = 500, photos_dir = 'photos', vision_protocol = PROTOCOL_JSON, flight_recorder = None, clock = None):
         self.PLC = None
         self.websocket_server = None
         self.serial_port = serial_port
@@ -42,24 +45,38 @@ class Application:
         # Создаём папку для фото, если её нет
         self.photos_dir.mkdir(parents=True, exist_ok=True)
 
+        # Часы для таймаутов (виртуальные при воспроизведении записей и в симуляции)
+        self.clock = clock if clock is not None else SYSTEM_CLOCK
+
         self.flag = False
-        self.time_flag = time.time()
+        self.time_flag = self.clock.time()
 
         self.thread_websocket = None
         self.thread_terminal = None
         self.thread_update_data = None
         
+        # Бортовой самописец: снимки ПЛК, переходы состояний, сообщения WebSocket
+        if flight_recorder is None:
+            flight_recorder = FlightRecorder.from_settings(get_settings(), "app", clock=self.clock)
+        self.recorder = flight_recorder
+
         # State Machine
         self.state = AppState.IDLE
         self.state_lock = threading.Lock()  # Lock для потокобезопасности
 
         # Таймауты (секунды)
         self.vision_timeout = 2.0           # Таймаут ответа от vision
+        self.vision_protocol = vision_protocol  # "json" (запросы с id) или "string" (совместимость)
+        if vision_protocol not in (PROTOCOL_JSON, PROTOCOL_STRING):
+            logger.warning("Неизвестный протокол vision '%s', используется %s", vision_protocol, PROTOCOL_JSON)
+            self.vision_protocol = PROTOCOL_JSON
         self.dump_timeout = 3.0             # Таймаут движения каретки
 
         # Временные данные для state machine
         self.current_plc_detection = None   # "bottle" или "bank" - что детектировал ПЛК
         self.vision_request_time = None     # Время отправки запроса к vision
+        self._vision_request_id = None      # id текущего запроса к vision (JSON протокол)
+        self._vision_request_seq = 0        # Счётчик запросов к vision
         self.dump_started_time = None       # Время начала сброса каретки
 
         # Отслеживание завесы
@@ -83,6 +100,7 @@ class Application:
         # Защита от повторного инференса для одного контейнера
         self._inference_requested = False      # Флаг: инференс уже запрошен для текущего контейнера
         self._pending_vision_response = None   # Ответ vision, ожидающий ответа ПЛК
+        self._pending_vision_confidence = 1.0  # Уверенность из ответа vision (JSON протокол)
 
         # Command Registry: команда → (handler, требует_param)
         self._command_handlers = {
@@ -90,6 +108,8 @@ class Application:
             "get_device_info": (self.handle_get_device_info, False),
             "dump_container": (self.handle_container_dump, True),
             "container_unloaded": (self.handle_container_unloaded, True),
+            "swap_model": (self.handle_swap_model, True),
+            "dump_flight_recorder": (self.handle_dump_flight_recorder, False),
             # Заглушки
             "enter_service_mode": (self.handle_stub_command, False),
             "exit_service_mode": (self.handle_stub_command, False),
@@ -126,6 +146,19 @@ class Application:
             },
         }
 
+    @property
+    def state(self) -> AppState:
+        """Текущее состояние автомата."""
+        return self._state
+
+    @state.setter
+    def state(self, value: AppState) -> None:
+        """Сменить состояние (переход записывается в самописец)."""
+        previous = getattr(self, "_state", None)
+        self._state = value
+        if previous is not value:
+            self.recorder.record(KIND_STATE, {"from": previous.value if previous else None, "to": value.value})
+
     def signal_handler(self, sig, frame):
         self.running = False
         sys.exit(0)
@@ -152,7 +185,8 @@ class Application:
         try:
             while self.running:
                 self.PLC.update_data()
-                time.sleep(self.update_data_period)
+                self.recorder.record(KIND_PLC, self.PLC.snapshot())
+                self.clock.sleep(self.update_data_period)
         except Exception as e:
             logger.error(f"Ошибка обновления данных PLC: {e}")
 
@@ -160,8 +194,10 @@ class Application:
     def setup(self):
         try:
             self.PLC = PLC(self.serial_port, self.baudrate, self.slave_address, self.cmd_register, self.status_register, self.speed)
-            self.websocket_server = WebSocket(self.PLC, self.web_socket_host, self.web_socket_port)
-            time.sleep(1) 
+            self.websocket_server = WebSocket(self.PLC, self.web_socket_host, self.web_socket_port, clock=self.clock)
+            self.websocket_server.set_snapshot_provider("app", self.get_state_snapshot)
+            self.websocket_server.set_flight_recorder(self.recorder)
+            self.clock.sleep(1) 
             self.start_threads()
 
         except Exception as e:
@@ -172,7 +208,9 @@ class Application:
 
 
     def run(self):
-        signal.signal(signal.SIGINT, self.signal_handler)
+        # Обработчик сигнала можно установить только из главного потока
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGINT, self.signal_handler)
         try:
             while self.running:
                 # ОБРАБОТКА СОСТОЯНИЙ STATE MACHINE
@@ -181,32 +219,26 @@ class Application:
 
                 # Проверка таймаута для обнуления регистров после детекции
                 if self.carriage_moving_bottle and self.carriage_moving_start_time:
-                    if time.time() - self.carriage_moving_start_time > self.carriage_reset_timeout:
+                    if self.clock.now() - self.carriage_moving_start_time > self.carriage_reset_timeout:
                         logger.info("Таймаут движения каретки (бутылка) → обнуление регистра")
                         self.PLC.cmd_radxa_stop_detected_bottle()
                         self.carriage_moving_bottle = False
                         self.carriage_moving_start_time = None
                 
                 if self.carriage_moving_bank and self.carriage_moving_start_time:
-                    if time.time() - self.carriage_moving_start_time > self.carriage_reset_timeout:
+                    if self.clock.now() - self.carriage_moving_start_time > self.carriage_reset_timeout:
                         logger.info("Таймаут движения каретки (банка) → обнуление регистра")
                         self.PLC.cmd_radxa_stop_detected_bank()
                         self.carriage_moving_bank = False
                         self.carriage_moving_start_time = None
 
                 if self.state == AppState.WAITING_VISION:
-                    # Получаем ответ от vision (одноразовое чтение)
-                    vision_response = self.websocket_server.get_command("vision")
-
-                    # Сохраняем ответ vision, если получен
-                    if vision_response and vision_response != "" and self._pending_vision_response is None:
-                        logger.info(f"Vision ответил: {vision_response}")
-                        self._pending_vision_response = vision_response
-
+                    # Получаем ответ от vision (одноразовое чтение, с проверкой id)
+                    if self._pending_vision_response is None and self._poll_vision_reply():
                         # Вычисляем дельту времени между veil_just_cleared и ответом от vision
                         if self.veil_cleared_time is not None:
-                            delta_ms = (time.time() - self.veil_cleared_time) * 1000
-                            print(f"[TIMING] Дельта: {delta_ms:.2f} мс (veil_cleared → vision_response)")
+                            delta_ms = (self.clock.now() - self.veil_cleared_time) * 1000
+                            log_timing("veil_cleared→vision_response", delta_ms)
                             self.veil_cleared_time = None
 
                     # Обновляем current_plc_detection из ПЛК если ещё не определён
@@ -221,23 +253,28 @@ class Application:
                     # Проверяем готовность обоих результатов
                     if self._pending_vision_response is not None and self.current_plc_detection is not None:
                         # Оба готовы - принимаем решение
-                        self._handle_vision_response_with_events(self._pending_vision_response)
+                        self._handle_vision_response_with_events(
+                            self._pending_vision_response, self._pending_vision_confidence
+                        )
                         with self.state_lock:
                             self.state = AppState.IDLE
                         self.vision_request_time = None
                         self.current_plc_detection = None
                         self._pending_vision_response = None
-                    elif time.time() - self.vision_request_time > self.vision_timeout:
+                        self._vision_request_id = None
+                    elif self.clock.now() - self.vision_request_time > self.vision_timeout:
                         # Таймаут ожидания
                         if self._pending_vision_response is None:
                             logger.warning("ТАЙМАУТ ожидания vision → IDLE")
+                            self._dump_flight_recorder("vision_timeout")
                         else:
                             logger.warning("ТАЙМАУТ ожидания ПЛК → IDLE")
+                            self._dump_flight_recorder("plc_timeout")
 
                         # Вычисляем дельту времени даже при таймауте
                         if self.veil_cleared_time is not None:
-                            delta_ms = (time.time() - self.veil_cleared_time) * 1000
-                            print(f"[TIMING] Дельта (таймаут): {delta_ms:.2f} мс (veil_cleared → timeout)")
+                            delta_ms = (self.clock.now() - self.veil_cleared_time) * 1000
+                            log_timing("veil_cleared→timeout", delta_ms)
                             self.veil_cleared_time = None
 
                         with self.state_lock:
@@ -245,6 +282,7 @@ class Application:
                         self.vision_request_time = None
                         self.current_plc_detection = None
                         self._pending_vision_response = None
+                        self._vision_request_id = None
                         # Событие: контейнер не распознан
                         self.send_event_to_app("container_not_recognized", {})
 
@@ -269,11 +307,11 @@ class Application:
                     # Запуск инференса СРАЗУ при освобождении завесы (параллельно с ПЛК)
                     if self.prev_veil_state == 1 and current_veil == 0 and not self._inference_requested:
                         self.veil_just_cleared = True
-                        self.veil_cleared_time = time.time()
+                        self.veil_cleared_time = self.clock.now()
                         self._inference_requested = True  # Помечаем что инференс запрошен
 
                         logger.info("Завеса освободилась → WAITING_VISION (инференс запущен)")
-                        self.vision_request_time = time.time()
+                        self.vision_request_time = self.clock.now()
 
                         # Определяем тип контейнера по ПЛК (если уже есть) или используем bottle_exist по умолчанию
                         if self.PLC.get_bottle_exist() == 1:
@@ -289,9 +327,7 @@ class Application:
 
                         # Событие: контейнер обнаружен
                         self.send_event_to_app("container_detected", {"plc_type": self.current_plc_detection or "unknown"})
-                        # Сброс старых ответов vision перед новым запросом
-                        self.websocket_server.get_command("vision")
-                        self.websocket_server.send_to_client("vision", vision_cmd)
+                        self._send_vision_request(vision_cmd)
                         with self.state_lock:
                             self.state = AppState.WAITING_VISION
 
@@ -313,7 +349,7 @@ class Application:
                 self._check_receiver_state()
                 self._check_hardware_errors()
 
-                time.sleep(0.01)
+                self.clock.sleep(0.01)
 
         except Exception as e:
             logger.error(f"Ошибка в главном цикле: {e}")
@@ -330,7 +366,7 @@ class Application:
         config = self._dumping_config[state]
 
         if config["sensor_getter"]() == 1:
-            logger.info(f"Датчик {config['direction']} достигнут, обнуляем регистры")
+            logger.info("Датчик %s достигнут, обнуляем регистры", config['direction'])
             self.PLC.cmd_full_clear_register()
             with self.state_lock:
                 self.state = AppState.IDLE
@@ -339,7 +375,7 @@ class Application:
                 "type": config["type"],
                 "counter": config["counter_getter"]()
             })
-        elif time.time() - self.dump_started_time > self.dump_timeout:
+        elif self.clock.now() - self.dump_started_time > self.dump_timeout:
             logger.warning(f"ТАЙМАУТ при движении {config['direction']}! → ERROR")
             self.PLC.cmd_full_clear_register()
             with self.state_lock:
@@ -393,6 +429,27 @@ class Application:
             "timestamp": datetime.now().isoformat()
         })
 
+    def get_state_snapshot(self) -> dict:
+        """
+        Компактный снимок состояния для клиента app.
+
+        Отправляется сервером вместо replay, если клиент после
+        переподключения отстал сильнее, чем хранит журнал событий.
+
+        Returns:
+            Словарь с состоянием автомата, счётчиками и датчиками приёмника.
+        """
+        return {
+            "state": self.state.value,
+            "bottle_count": self.PLC.get_bottle_count(),
+            "bank_count": self.PLC.get_bank_count(),
+            "bottle_fill_percent": self.PLC.get_bottle_fill_percent(),
+            "bank_fill_percent": self.PLC.get_bank_fill_percent(),
+            "bottle_exist": self.PLC.get_bottle_exist(),
+            "bank_exist": self.PLC.get_bank_exist(),
+            "weight_error": self.PLC.get_state_weight_error(),
+        }
+
     def send_event_to_app(self, event_name: str, data: dict = None):
         """
         Отправить событие клиенту app.
@@ -403,7 +460,27 @@ class Application:
         """
         event = self.create_event(event_name, data)
         self.websocket_server.send_to_client("app", event)
-        logger.debug(f"Event → app: {event_name}: {data}")
+        logger.debug("Event → app: %s: %s", event_name, data)
+        if event_name == "hardware_error":
+            self._dump_flight_recorder((data or {}).get("error_code", event_name))
+
+    def _dump_flight_recorder(self, reason: str, force: bool = False):
+        """
+        Сбросить самописцы app и vision в файлы (в фоне).
+
+        Args:
+            reason: Причина сброса (попадает в имя файла).
+            force: Сбросить даже если недавно уже сбрасывали.
+
+        Returns:
+            Путь к файлу app или None, если автоматический сброс пропущен.
+        """
+        path = self.recorder.dump_async(reason, force=force)
+        if path is not None and "vision" in self.websocket_server.clients:
+            self.websocket_server.send_to_client("vision", json.dumps(
+                {"command": "dump_flight_recorder", "reason": reason, "force": force}
+            ))
+        return path
 
     def _check_receiver_state(self):
         """Проверить и отправить событие состояния приёмника."""
@@ -532,11 +609,11 @@ class Application:
         self.websocket_server.send_to_client("vision", '{"command": "get_photo"}')
 
         # Ждём ответа с таймаутом (одноразовое чтение)
-        start_time = time.time()
-        while time.time() - start_time < 2.0:
+        start_time = self.clock.now()
+        while self.clock.now() - start_time < 2.0:
             response = self.websocket_server.get_command("vision")
             if not response:
-                time.sleep(0.1)
+                self.clock.sleep(0.1)
                 continue
             if response.startswith("{"):
                 try:
@@ -546,7 +623,7 @@ class Application:
                         photo_path = self._save_photo(data["photo_base64"])
                         if photo_path:
                             data["photo_path"] = str(photo_path)
-                            logger.info(f"Фото сохранено: {photo_path}")
+                            logger.info("Фото сохранено: %s", photo_path)
                         self.send_event_to_app("photo_ready", data)
                         return
                     elif "error" in data:
@@ -554,7 +631,7 @@ class Application:
                         return
                 except json.JSONDecodeError:
                     pass
-            time.sleep(0.1)
+            self.clock.sleep(0.1)
 
         # Таймаут - vision недоступен
         self.send_event_to_app("photo_ready", {"error": "vision_unavailable"})
@@ -570,14 +647,14 @@ class Application:
             logger.info("Команда: сброс пластика (влево)")
             with self.state_lock:
                 self.state = AppState.DUMPING_PLASTIC
-            self.dump_started_time = time.time()
+            self.dump_started_time = self.clock.now()
             self.PLC.cmd_force_move_carriage_left()
             self.send_event_to_app("container_dumped", {"container_type": "plastic"})
         elif container_type == "aluminium":
             logger.info("Команда: сброс алюминия (вправо)")
             with self.state_lock:
                 self.state = AppState.DUMPING_ALUMINUM
-            self.dump_started_time = time.time()
+            self.dump_started_time = self.clock.now()
             self.PLC.cmd_force_move_carriage_right()
             self.send_event_to_app("container_dumped", {"container_type": "aluminium"})
         else:
@@ -598,6 +675,32 @@ class Application:
             self.PLC.cmd_reset_bank_counters()
         self.send_event_to_app("container_unloaded_ack", {"container_type": container_type})
 
+    def handle_swap_model(self, model_path: str):
+        """
+        Обработчик команды swap_model: горячая замена модели в vision.
+
+        Args:
+            model_path: Путь к новой модели на устройстве.
+        """
+        if not model_path:
+            self.send_event_to_app("swap_model_ack", {"error": "model_path_required"})
+            return
+        if "vision" not in self.websocket_server.clients:
+            self.send_event_to_app("swap_model_ack", {"error": "vision_unavailable"})
+            return
+
+        logger.info("Команда: замена модели vision → %s", model_path)
+        self.websocket_server.send_to_client(
+            "vision", json.dumps({"command": "swap_model", "model_path": model_path})
+        )
+        self.send_event_to_app("swap_model_ack", {"model_path": model_path, "status": "forwarded"})
+
+    def handle_dump_flight_recorder(self):
+        """Обработчик команды dump_flight_recorder: сброс последних записей app и vision."""
+        path = self._dump_flight_recorder("request", force=True)
+        logger.info("Команда: сброс самописца → %s", path)
+        self.send_event_to_app("dump_flight_recorder_ack", {"path": str(path)})
+
     def handle_stub_command(self, command_name: str):
         """
         Заглушка для команд, которые пока не реализованы.
@@ -605,7 +708,7 @@ class Application:
         Args:
             command_name: Название команды.
         """
-        logger.debug(f"Заглушка команды: {command_name}")
+        logger.debug("Заглушка команды: %s", command_name)
         self.send_event_to_app(f"{command_name}_ack", {"status": "not_implemented"})
 
     def _save_photo(self, photo_base64: str) -> Path:
@@ -638,6 +741,58 @@ class Application:
 
     # === ОБРАБОТЧИКИ VISION И ERROR ===
 
+    def _send_vision_request(self, vision_cmd: str):
+        """
+        Отправить запрос классификации в vision.
+
+        В JSON режиме запрос получает новый id, ответы с другим id
+        (опоздавшие ответы на прошлые контейнеры) отбрасываются.
+        В строковом режиме старые ответы сбрасываются перед запросом.
+
+        Args:
+            vision_cmd: Строковая команда ("bottle_exist" или "bank_exist").
+        """
+        if self.vision_protocol == PROTOCOL_STRING:
+            self.websocket_server.get_command("vision")
+            self.websocket_server.send_to_client("vision", vision_cmd)
+            return
+
+        self._vision_request_seq += 1
+        self._vision_request_id = str(self._vision_request_seq)
+        self.websocket_server.send_to_client(
+            "vision", build_request(self._vision_request_id, hint=self.current_plc_detection, timeout=self.vision_timeout)
+        )
+
+    def _poll_vision_reply(self) -> bool:
+        """
+        Прочитать ответ vision и сопоставить его с текущим запросом.
+
+        Returns:
+            True если получен ответ на текущий запрос (сохранён в _pending_vision_response).
+        """
+        reply = parse_reply(self.websocket_server.get_command("vision"))
+        if reply is None:
+            return False
+
+        if reply.id is not None and reply.id != self._vision_request_id:
+            logger.info("Vision: ответ на устаревший запрос %s (текущий %s) отброшен",
+                        reply.id, self._vision_request_id)
+            return False
+
+        self._pending_vision_response = reply.result
+        self._pending_vision_confidence = reply.confidence if reply.confidence is not None else 1.0
+
+        if reply.id is None:
+            logger.info("Vision ответил: %s", reply.result)
+        else:
+            latency_ms = (self.clock.now() - self.vision_request_time) * 1000 if self.vision_request_time else 0.0
+            logger.info("Vision ответил: %s (запрос %s, уверенность %s, модель %s мс)%s",
+                        reply.result, reply.id, reply.confidence, reply.model_ms,
+                        f", ошибка: {reply.error}" if reply.error else "")
+            log_timing("request→vision_response", latency_ms,
+                       id=reply.id, model_ms=reply.model_ms, queue_ms=reply.queue_ms)
+        return True
+
     def _handle_vision_response(self, vision_response: str):
         """
         Обработка ответа от vision сервиса (без событий, для тестов).
@@ -659,12 +814,13 @@ class Application:
         else:
             logger.warning(f"Vision: несовпадение! ПЛК: {self.current_plc_detection}, Vision: {vision_response}")
 
-    def _handle_vision_response_with_events(self, vision_response: str):
+    def _handle_vision_response_with_events(self, vision_response: str, confidence: float = 1.0):
         """
         Обработка ответа от vision сервиса с отправкой событий.
 
         Args:
             vision_response: Ответ vision ("bottle", "bank", "none").
+            confidence: Уверенность vision (1.0 для строкового протокола).
         """
         if vision_response == "none":
             logger.info("Vision: контейнер не распознан")
@@ -678,22 +834,22 @@ class Application:
             self.PLC.cmd_radxa_detected_bottle()
             # Устанавливаем флаг начала движения каретки
             self.carriage_moving_bottle = True
-            self.carriage_moving_start_time = time.time()
+            self.carriage_moving_start_time = self.clock.now()
             # Событие: контейнер распознан
             self.send_event_to_app("container_recognized", {
                 "type": "PET",
-                "confidence": 1.0  # TODO: получать от vision
+                "confidence": confidence
             })
         elif self.current_plc_detection == "bank" and vision_response == "bank":
             logger.info("Vision: банка → PLC cmd")
             self.PLC.cmd_radxa_detected_bank()
             # Устанавливаем флаг начала движения каретки
             self.carriage_moving_bank = True
-            self.carriage_moving_start_time = time.time()
+            self.carriage_moving_start_time = self.clock.now()
             # Событие: контейнер распознан
             self.send_event_to_app("container_recognized", {
                 "type": "ALUMINUM",
-                "confidence": 1.0  # TODO: получать от vision
+                "confidence": confidence
             })
         else:
             logger.warning(f"Vision: несовпадение! ПЛК: {self.current_plc_detection}, Vision: {vision_response}")
@@ -733,7 +889,7 @@ class Application:
                 self.state = AppState.IDLE
             self.send_event_to_app("restore_device_ack", {"status": "ok"})
         else:
-            logger.debug(f"ERROR State: команда {app_command} игнорируется")
+            logger.debug("ERROR State: команда %s игнорируется", app_command)
 
 
 if __name__ == "__main__":
@@ -742,17 +898,20 @@ if __name__ == "__main__":
     serial_port = os.getenv('PLC_SERIAL_PORT', '/dev/ttyUSB0')
     baudrate = int(os.getenv('PLC_BAUDRATE', '115200'))
     slave_address = int(os.getenv('PLC_SLAVE_ADDRESS', '2'))
+    vision_protocol = get_settings().vision_protocol
     
-    logger.info(f"Запуск Application с параметрами:")
-    logger.info(f"  serial_port: {serial_port}")
-    logger.info(f"  baudrate: {baudrate}")
-    logger.info(f"  slave_address: {slave_address}")
+    logger.info("Запуск Application с параметрами:")
+    logger.info("  serial_port: %s", serial_port)
+    logger.info("  baudrate: %s", baudrate)
+    logger.info("  slave_address: %s", slave_address)
+    logger.info("  vision_protocol: %s", vision_protocol)
     
     try:
         app = Application(
             serial_port=serial_port,
             baudrate=baudrate,
-            slave_address=slave_address
+            slave_address=slave_address,
+            vision_protocol=vision_protocol
         )
     
         if not app.setup():
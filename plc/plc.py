@@ -59,6 +59,17 @@ class PLC:
             self.modbus_register_bottle_percent.sync_from_device()
             self.modbus_register_bank_percent.sync_from_device()
 
+    def snapshot(self) -> dict:
+        """Значения регистров (для бортового самописца и воспроизведения)."""
+        return {
+            "cmd": self.modbus_register_cmd.get_value(),
+            "status": self.modbus_register_status.get_value(),
+            "bank_counter": self.modbus_register_bank_counter.get_value(),
+            "bottle_counter": self.modbus_register_bottle_counter.get_value(),
+            "bottle_percent": self.modbus_register_bottle_percent.get_value(),
+            "bank_percent": self.modbus_register_bank_percent.get_value(),
+        }
+
     # Команды на получение статуса (регистр 26)
     def get_state_veil(self):
         return self.modbus_register_status.get_bit(0)
@@ -528,3 +528,352 @@ class TestVisionResponseWithEvents:
         assert event["event"] == "container_not_recognized"
         assert event["data"]["plc_type"] == "bottle"
         assert event["data"]["vision_type"] == "bank"
+
+
+class TestVisionProtocol:
+    """Тесты для сопоставления запросов и ответов vision по id."""
+
+    @pytest.fixture
+    def app_with_mocks(self):
+        """Application с замоканными зависимостями."""
+        with patch('plc.application.PLC') as mock_plc, \
+             patch('plc.application.WebSocket') as mock_ws:
+            from plc import Application
+
+            app = Application(
+                serial_port='/dev/ttyUSB0',
+                baudrate=115200,
+                slave_address=2
+            )
+            app.PLC = MagicMock()
+            app.websocket_server = MagicMock()
+            yield app
+
+    def test_request_carries_id_and_timeout(self, app_with_mocks):
+        """Проверить JSON запрос с id, подсказкой ПЛК и таймаутом."""
+        import json
+        app = app_with_mocks
+        app.current_plc_detection = "bank"
+
+        app._send_vision_request("bank_exist")
+        app._send_vision_request("bank_exist")
+
+        client, message = app.websocket_server.send_to_client.call_args[0]
+        request = json.loads(message)
+        assert client == "vision"
+        assert request["command"] == "classify"
+        assert request["id"] == "2" == app._vision_request_id
+        assert request["hint"] == "bank"
+        assert request["timeout_ms"] == 2000
+
+    def test_stale_reply_is_discarded(self, app_with_mocks):
+        """Проверить, что ответ на прошлый запрос не принимается за текущий."""
+        app = app_with_mocks
+        app._vision_request_id = "5"
+        app.vision_request_time = app.clock.now()
+
+        app.websocket_server.get_command.return_value = '{"id": "4", "result": "bank", "confidence": 0.9}'
+        assert not app._poll_vision_reply()
+        assert app._pending_vision_response is None
+
+        app.websocket_server.get_command.return_value = '{"id": "5", "result": "bottle", "confidence": 0.87, "model_ms": 41.0}'
+        assert app._poll_vision_reply()
+        assert app._pending_vision_response == "bottle"
+        assert app._pending_vision_confidence == 0.87
+
+    def test_string_protocol_compatibility(self, app_with_mocks):
+        """Проверить строковый режим: без id, старые ответы сбрасываются перед запросом."""
+        app = app_with_mocks
+        app.vision_protocol = "string"
+
+        app._send_vision_request("bottle_exist")
+        app.websocket_server.get_command.assert_called_with("vision")
+        app.websocket_server.send_to_client.assert_called_with("vision", "bottle_exist")
+
+        app.websocket_server.get_command.return_value = "bank"
+        assert app._poll_vision_reply()
+        assert app._pending_vision_response == "bank"
+        assert app._pending_vision_confidence == 1.0
+
+    def test_protocol_from_env(self, monkeypatch):
+        """Проверить выбор протокола через VISION_PROTOCOL и откат на JSON при неизвестном значении."""
+        from core.config import Settings
+        from plc import Application
+
+        monkeypatch.setenv("VISION_PROTOCOL", " String ")
+        assert Settings.from_env().vision_protocol == "string"
+        monkeypatch.delenv("VISION_PROTOCOL")
+        assert Settings.from_env().vision_protocol == "json"
+
+        with patch('plc.application.PLC'), patch('plc.application.WebSocket'):
+            app = Application(serial_port='/dev/ttyUSB0', baudrate=115200, slave_address=2,
+                              vision_protocol="xml")
+        assert app.vision_protocol == "json"
+
+    def test_photo_reply_is_not_classification(self):
+        """Проверить, что ответы других команд не разбираются как результат."""
+        from core.vision_protocol import VisionReply, parse_reply
+
+        assert parse_reply('{"photo_base64": "..."}') is None
+        assert parse_reply("") is None
+        reply = parse_reply(VisionReply(result="none", id="3", error="deadline_exceeded").to_json())
+        assert reply.id == "3" and reply.error == "deadline_exceeded"
+
+    def test_swap_model_forwarded_to_vision(self, app_with_mocks):
+        """Проверить пересылку команды swap_model в vision."""
+        import json
+        app = app_with_mocks
+        app.websocket_server.clients = {"vision": object()}
+
+        assert app._dispatch_command("swap_model", {"param": "weights/new_model"})
+
+        calls = [call[0] for call in app.websocket_server.send_to_client.call_args_list]
+        assert calls[0] == ("vision", json.dumps({"command": "swap_model", "model_path": "weights/new_model"}))
+        ack = json.loads(calls[1][1])
+        assert ack["event"] == "swap_model_ack"
+        assert ack["data"]["status"] == "forwarded"
+
+
+class TestFlightRecorder:
+    """Тесты бортового самописца и его сброса из Application."""
+
+    @pytest.fixture
+    def app_with_mocks(self, tmp_path):
+        """Application с замоканными зависимостями и самописцем во временной папке."""
+        with patch('plc.application.PLC') as mock_plc, \
+             patch('plc.application.WebSocket') as mock_ws:
+            from plc import Application
+            from core.flight_recorder import FlightRecorder
+
+            app = Application(
+                serial_port='/dev/ttyUSB0',
+                baudrate=115200,
+                slave_address=2,
+                flight_recorder=FlightRecorder("app", capacity=16, directory=tmp_path),
+            )
+            app.PLC = MagicMock()
+            app.websocket_server = MagicMock()
+            yield app
+
+    def test_ring_keeps_latest_entries(self):
+        """Проверить перезапись самых старых записей и фильтр по времени."""
+        from core.flight_recorder import FlightRecorder
+
+        recorder = FlightRecorder("test", capacity=3)
+        for i in range(5):
+            recorder.record("plc", {"status": i})
+
+        assert len(recorder) == 3
+        assert [data["status"] for _, _, data in recorder.entries()] == [2, 3, 4]
+        assert recorder.entries(seconds=0) == []
+
+    def test_dump_jsonl_roundtrip(self, tmp_path):
+        """Проверить формат файла сброса: заголовок и записи."""
+        from core.flight_recorder import FlightRecorder, load_dump
+
+        recorder = FlightRecorder("vision", capacity=8)
+        recorder.record("ws_in", '{"command": "classify", "id": "1"}')
+        recorder.record("inference", {"id": "1", "class": "PET", "confidence": 0.97})
+
+        header, entries = load_dump(recorder.dump("test", path=tmp_path / "dump.jsonl"))
+
+        assert header["process"] == "vision"
+        assert header["reason"] == "test"
+        assert [entry["kind"] for entry in entries] == ["ws_in", "inference"]
+        assert entries[1]["data"]["class"] == "PET"
+        assert entries[0]["t"] <= entries[1]["t"]
+
+    def test_large_messages_compacted(self):
+        """Проверить, что фото в сообщении заменяется длиной, а короткие сообщения не меняются."""
+        import json
+        from core.flight_recorder import MAX_MESSAGE_CHARS, compact_message
+
+        short = '{"command": "get_photo"}'
+        assert compact_message(short) is short
+
+        photo = json.dumps({"photo_base64": "A" * 300_000, "width": 2560})
+        compacted = json.loads(compact_message(photo))
+        assert compacted == {"photo_base64": "<300000 символов>", "width": 2560}
+
+        text = compact_message("x" * (MAX_MESSAGE_CHARS * 2))
+        assert len(text) < MAX_MESSAGE_CHARS + 50 and text.endswith(f"<{MAX_MESSAGE_CHARS * 2} символов>")
+
+    def test_dump_on_virtual_clock_is_deterministic(self, tmp_path):
+        """Проверить, что имя файла и wall_offset берутся из часов самописца."""
+        from datetime import datetime
+        from core.clock import VirtualClock
+        from core.flight_recorder import FlightRecorder, load_dump
+
+        wall = datetime(2025, 11, 11, 10, 48, 52).timestamp()
+        clock = VirtualClock(start=100.0, wall_offset=wall - 100.0)
+        recorder = FlightRecorder("app", capacity=8, directory=tmp_path, clock=clock)
+        recorder.record("plc", {"status": 1})
+
+        path = recorder._write(recorder.entries(), "test", None)
+        header, entries = load_dump(path)
+
+        assert path.name == "app_20251111_104852_000000_test.jsonl"
+        assert header["monotonic"] == 100.0
+        assert header["wall_offset"] == round(wall - 100.0, 6)
+        assert entries[0]["t"] == 100.0
+
+    def test_state_transitions_recorded(self, app_with_mocks):
+        """Проверить запись переходов состояний."""
+        from plc import AppState
+        app = app_with_mocks
+
+        app.state = AppState.WAITING_VISION
+        app.state = AppState.WAITING_VISION
+        app.state = AppState.IDLE
+
+        transitions = [data for _, kind, data in app.recorder.entries() if kind == "state"]
+        assert transitions == [
+            {"from": None, "to": "idle"},
+            {"from": "idle", "to": "waiting_vision"},
+            {"from": "waiting_vision", "to": "idle"},
+        ]
+
+    def test_hardware_error_dumps_app_and_vision(self, app_with_mocks, tmp_path):
+        """Проверить сброс самописцев при hardware_error (повторная ошибка не сбрасывает)."""
+        import json
+        app = app_with_mocks
+        app.websocket_server.clients = {"vision": object()}
+
+        app.send_event_to_app("hardware_error", {"error_code": "weight_error"})
+        app.send_event_to_app("hardware_error", {"error_code": "weight_error"})
+
+        requests = [call[0][1] for call in app.websocket_server.send_to_client.call_args_list
+                    if call[0][0] == "vision"]
+        assert [json.loads(r) for r in requests] == [
+            {"command": "dump_flight_recorder", "reason": "weight_error", "force": False}
+        ]
+        deadline = time.monotonic() + 2
+        while not list(tmp_path.glob("app_*_weight_error.jsonl")) and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert len(list(tmp_path.glob("app_*_weight_error.jsonl"))) == 1
+
+    def test_dump_command_acknowledged(self, app_with_mocks):
+        """Проверить команду dump_flight_recorder и событие с путём файла."""
+        import json
+        app = app_with_mocks
+
+        assert app._dispatch_command("dump_flight_recorder", {})
+
+        ack = json.loads(app.websocket_server.send_to_client.call_args[0][1])
+        assert ack["event"] == "dump_flight_recorder_ack"
+        assert ack["data"]["path"].endswith("_request.jsonl")
+
+
+class TestReplay:
+    """Тесты воспроизведения записей самописца через Application (tools.replay)."""
+
+    VEIL = 1 << 0
+    BOTTLE = 1 << 7
+
+    def _trace(self, reply=None):
+        """Хронология: рука в завесе, бутылка в приёмнике, запрос к vision и ответ."""
+        import json
+
+        def plc(t, status):
+            return {"t": t, "kind": "plc", "data": {"cmd": 0, "status": status, "bank_counter": 0,
+                                                     "bottle_counter": 0, "bottle_percent": 0,
+                                                     "bank_percent": 0}}
+
+        entries = [
+            plc(100.0, 0),
+            plc(100.5, self.VEIL),
+            plc(101.0, self.BOTTLE),
+            {"t": 101.01, "kind": "ws_out", "data": {"client": "vision", "message": json.dumps(
+                {"command": "classify", "id": "7", "hint": "bottle", "timeout_ms": 2000})}},
+        ]
+        if reply is not None:
+            entries.append({"t": 101.01 + reply[0], "kind": "ws_in",
+                            "data": {"client": "vision", "message": json.dumps({"id": "7", **reply[1]})}})
+        entries += [
+            {"t": 101.02, "kind": "state", "data": {"from": "idle", "to": "waiting_vision"}},
+            plc(104.0, 0),
+        ]
+        return sorted(entries, key=lambda entry: entry["t"])
+
+    def test_recognized_bottle_replayed(self):
+        """Проверить решение по записанному ответу vision с записанной задержкой."""
+        from tools.replay import ReplayHarness
+
+        report = ReplayHarness(self._trace(reply=(0.05, {"result": "bottle", "confidence": 0.9}))).run()
+
+        assert [d["outcome"] for d in report["decisions"]] == ["container_recognized"]
+        assert 50 <= report["decision_latency"]["p50_ms"] < 100
+        assert [(tr["from"], tr["to"]) for tr in report["transitions"]] == [
+            ("idle", "waiting_vision"), ("waiting_vision", "idle"),
+        ]
+        assert report["event_counts"]["container_detected"] == 1
+        assert report["unmatched_vision_requests"] == 0
+        assert report["virtual_s"] > report["wall_s"]
+
+    def test_vision_timeout_replayed_deterministically(self):
+        """Проверить таймаут vision на виртуальных часах и одинаковый отчёт при повторе."""
+        from tools.replay import ReplayHarness, compare_reports
+
+        first = ReplayHarness(self._trace()).run()
+        second = ReplayHarness(self._trace()).run()
+
+        assert [d["outcome"] for d in first["decisions"]] == ["container_not_recognized"]
+        assert first["decisions"][0]["latency_ms"] >= 2000
+        assert first["flight_recorder_dumps"] == ["vision_timeout"]
+        assert compare_reports(second, first) == []
+
+        changed = dict(first, events=first["events"][:-1])
+        assert compare_reports(changed, first)
+
+
+class TestVirtualClock:
+    """Тесты Application на виртуальных часах (таймауты без ожидания)."""
+
+    def test_thousand_vision_timeouts(self, tmp_path):
+        """Проверить 1000 таймаутов vision подряд: каждый через 2 с виртуального времени."""
+        from core.clock import VirtualClock
+        from core.flight_recorder import FlightRecorder
+        from plc import AppState
+        from plc.application import Application
+        from tools.replay import TracePLC
+
+        clock = VirtualClock()
+        recorder = FlightRecorder("app", capacity=64, directory=tmp_path, min_dump_interval=1e9, clock=clock)
+        with patch('plc.application.PLC'), patch('plc.application.WebSocket'):
+            app = Application(serial_port="/dev/null", baudrate=9600, slave_address=1,
+                              photos_dir=str(tmp_path), flight_recorder=recorder, clock=clock)
+        app.PLC = TracePLC()
+        app.websocket_server = MagicMock()
+        app.websocket_server.get_command = lambda client_name: ""  # опрашивается каждый цикл
+        app.websocket_server.clients = {}
+
+        veil, bottle = 1 << 0, 1 << 7
+        scenarios = {"done": 0, "waiting_since": None, "durations": []}
+
+        def drive(now):
+            # Рука в завесе → бутылка в приёмнике → vision молчит → таймаут → приёмник пуст
+            status = app.PLC.modbus_register_status
+            if app.state == AppState.WAITING_VISION:
+                if scenarios["waiting_since"] is None:
+                    scenarios["waiting_since"] = now
+                return
+            if scenarios["waiting_since"] is not None:
+                scenarios["durations"].append(now - scenarios["waiting_since"])
+                scenarios["waiting_since"] = None
+                scenarios["done"] += 1
+                status.set_value(0)
+                if scenarios["done"] >= 1000:
+                    app.running = False
+            elif status.get_value() == 0:
+                status.set_value(veil)
+            elif status.get_value() == veil:
+                status.set_value(bottle)
+
+        clock.add_listener(drive)
+        started = time.perf_counter()
+        app.run()
+        wall = time.perf_counter() - started
+
+        assert scenarios["done"] == 1000
+        assert all(2.0 <= duration <= 2.03 for duration in scenarios["durations"])
+        assert clock.now() > 2000.0 > wall
@@ -0,0 +1,63 @@
+"""
+Тесты для core.clock.
+
+Проверяет виртуальные часы: мгновенные sleep и ожидания, слушатели
+сдвига времени и ожидание на Condition.
+"""
+import threading
+import time
+
+from core.clock import SYSTEM_CLOCK, VirtualClock
+
+
+class TestVirtualClock:
+    """Тесты виртуальных часов."""
+
+    def test_sleep_is_instant_and_notifies(self):
+        """Проверить, что sleep сдвигает время без ожидания и вызывает слушателей."""
+        clock = VirtualClock(start=100.0, wall_offset=1_700_000_000.0)
+        ticks = []
+        clock.add_listener(ticks.append)
+
+        started = time.perf_counter()
+        clock.sleep(3600.0)
+        clock.sleep_until(3700.5)
+
+        assert time.perf_counter() - started < 0.5
+        assert clock.now() == 3700.5
+        assert clock.time() == 1_700_000_000.0 + 3700.5
+        assert ticks == [3700.0, 3700.5]
+
+    def test_wait_until_timeout_and_success(self):
+        """Проверить wait_until: таймаут ровно в срок и успех по изменению от слушателя."""
+        clock = VirtualClock()
+        assert not clock.wait_until(lambda: False, timeout=2.0, interval=0.1)
+        assert abs(clock.now() - 2.0) < 1e-9
+
+        state = {"ready": False}
+        clock.add_listener(lambda now: state.update(ready=now >= 2.5))
+        assert clock.wait_until(lambda: state["ready"], timeout=10.0, interval=0.1)
+        assert abs(clock.now() - 2.5) < 1e-6
+
+    def test_wait_for_releases_condition_lock(self):
+        """Проверить, что на время сдвига лок Condition отпускается для слушателей."""
+        clock = VirtualClock(step=0.05)
+        condition = threading.Condition(threading.Lock())
+        state = {"frames": 0}
+
+        def produce(now):
+            with condition:
+                state["frames"] += 1
+                condition.notify_all()
+
+        clock.add_listener(produce)
+        with condition:
+            assert clock.wait_for(condition, lambda: state["frames"] >= 10, timeout=5.0)
+            assert not clock.wait_for(condition, lambda: False, timeout=1.0)
+        assert abs(clock.now() - 1.5) < 1e-6
+
+    def test_system_clock_wait_until(self):
+        """Проверить реальные часы: монотонное время и немедленный успех ожидания."""
+        before = SYSTEM_CLOCK.now()
+        assert SYSTEM_CLOCK.wait_until(lambda: True, timeout=0.0)
+        assert SYSTEM_CLOCK.now() >= before
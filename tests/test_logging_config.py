@@ -0,0 +1,77 @@
+"""
+Тесты для core.logging_config.
+
+Проверяет структурные форматы, ограничение частоты DEBUG записей
+и неблокирующую очередь записей.
+"""
+import json
+import logging
+import queue
+
+from core.logging_config import (
+    JsonFormatter,
+    KeyValueFormatter,
+    NonBlockingQueueHandler,
+    RateLimitFilter,
+)
+
+
+def _record(level=logging.DEBUG, msg="Предсказание: %s (%.3f)", args=("PET", 0.95), name="vision.x", **extra):
+    record = logging.LogRecord(name, level, __file__, 1, msg, args, None)
+    record.__dict__.update(extra)
+    return record
+
+
+class TestFormatters:
+    """Тесты структурных форматов."""
+
+    def test_json_line_with_fields(self):
+        """Проверить JSON запись: сообщение и структурные поля."""
+        line = JsonFormatter().format(_record(logging.INFO, fields={"id": "17", "ms": 41.2}))
+        data = json.loads(line)
+
+        assert data["msg"] == "Предсказание: PET (0.950)"
+        assert data["level"] == "INFO"
+        assert data["logger"] == "vision.x"
+        assert (data["id"], data["ms"]) == ("17", 41.2)
+
+    def test_key_value_quotes_spaces(self):
+        """Проверить формат key=value: строки с пробелами в кавычках."""
+        line = KeyValueFormatter().format(_record(logging.INFO, fields={"metric": "inference"}))
+
+        assert 'msg="Предсказание: PET (0.950)"' in line
+        assert "level=INFO" in line
+        assert line.endswith("metric=inference")
+
+
+class TestRateLimit:
+    """Тесты ограничения частоты DEBUG записей."""
+
+    def test_debug_limited_per_module(self):
+        """Проверить лимит DEBUG по модулю и счётчик пропущенных записей."""
+        limiter = RateLimitFilter(rate=0.001, burst=2)
+
+        passed = [limiter.filter(_record()) for _ in range(5)]
+        assert passed == [True, True, False, False, False]
+        # Другой модуль ограничивается отдельно
+        assert limiter.filter(_record(name="plc.application"))
+
+        warning = _record(logging.WARNING)
+        assert limiter.filter(warning)
+        assert warning.suppressed == 3
+
+
+class TestQueueHandler:
+    """Тесты неблокирующей очереди записей."""
+
+    def test_lazy_and_drops_when_full(self):
+        """Проверить, что запись не форматируется при постановке, а переполнение не блокирует."""
+        handler = NonBlockingQueueHandler(queue.Queue(maxsize=1))
+
+        handler.handle(_record())
+        handler.handle(_record())
+
+        queued = handler.queue.get_nowait()
+        assert queued.msg == "Предсказание: %s (%.3f)"
+        assert queued.args == ("PET", 0.95)
+        assert handler.dropped == 1
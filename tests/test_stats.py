@@ -0,0 +1,34 @@
+"""
+Тесты для core.stats.
+
+Проверяет перцентили по методу nearest-rank и граничные случаи.
+"""
+from core.stats import percentiles
+
+
+class TestPercentiles:
+    """Тесты сводки задержек."""
+
+    def test_nearest_rank(self):
+        """Проверить nearest-rank: ceil(p/100 * n)-й элемент без округления к чётному."""
+        stats = percentiles([6, 2, 4, 1, 5, 3])
+        assert stats["count"] == 6
+        assert stats["p50_ms"] == 3
+        assert stats["max_ms"] == 6
+        assert stats["mean_ms"] == 3.5
+
+        stats = percentiles(list(range(1, 21)))
+        assert stats["p50_ms"] == 10
+        assert stats["p95_ms"] == 19
+        assert stats["p99_ms"] == 20
+
+        stats = percentiles(list(range(1, 101)))
+        assert (stats["p50_ms"], stats["p95_ms"], stats["p99_ms"]) == (50, 95, 99)
+
+    def test_empty_and_single(self):
+        """Проверить пустой список и одно значение."""
+        assert percentiles([]) == {"count": 0}
+
+        stats = percentiles([12.34567])
+        assert stats["count"] == 1
+        assert stats["p50_ms"] == stats["p99_ms"] == stats["max_ms"] == 12.346
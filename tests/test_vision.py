@@ -0,0 +1,1158 @@
+"""
+Тесты для модуля vision.
+
+Проверяет офлайн оценку модели, кэш, анализ кадров и управление
+камерами (без реальной модели и камеры).
+"""
+import time
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+
+class _FakeEngine:
+    """Заглушка InferenceEngine: класс по средней яркости кадра."""
+
+    NAMES = ["CAN", "FOREIGN", "PET"]
+
+    def predict_probs(self, frames, image_size=None):
+        probs = np.zeros((len(frames), 3), dtype=np.float32)
+        for i, frame in enumerate(frames):
+            probs[i, int(frame.mean()) % 3] = 0.9
+            probs[i, (int(frame.mean()) + 1) % 3] = 0.1
+        return probs, self.NAMES
+
+
+class TestEvaluation:
+    """Тесты для vision.evaluate."""
+
+    def test_label_from_file_name(self):
+        """Проверить метку из суффикса имени файла."""
+        from vision.evaluate import label_from_name
+
+        assert label_from_name("20251111_104852_shot2_FOREIGN.jpg") == "FOREIGN"
+        assert label_from_name("val/CAN/0001.jpg") == "CAN"
+        assert label_from_name("real_time/20251111_104852_inf1.jpg") is None
+        assert label_from_name("x.jpg", {"x.jpg": "pet"}) == "PET"
+
+    def test_stats_confusion_and_recall(self):
+        """Проверить матрицу ошибок и precision/recall."""
+        from vision.evaluate import EvaluationStats
+
+        stats = EvaluationStats()
+        stats.add("PET", "PET", 0.95)
+        stats.add("PET", "CAN", 0.55)
+        stats.add("CAN", "CAN", 0.85)
+        stats.add(None, "FOREIGN", 0.7)
+
+        report = stats.report()
+
+        assert report["labeled"] == 3
+        assert report["confusion_matrix"]["rows_true_cols_pred"][2] == [1, 0, 1]
+        assert report["per_class"]["PET"]["recall"] == 0.5
+        assert report["per_class"]["CAN"]["precision"] == 0.5
+        assert report["unlabeled_predictions"]["FOREIGN"] == 1
+        assert sum(b["count"] for b in report["calibration"]["bins"]) == 3
+
+    def test_evaluate_directory(self, tmp_path):
+        """Проверить полный прогон папки с пакетным инференсом."""
+        import cv2
+        from vision.evaluate import evaluate, iter_samples
+
+        # Яркость 2 → PET, 0 → CAN (см. _FakeEngine)
+        for name, value in [("a_PET.jpg", 2), ("b_PET.png", 2), ("c_CAN.png", 0)]:
+            cv2.imwrite(str(tmp_path / name), np.full((40, 60, 3), value, dtype=np.uint8))
+        (tmp_path / "broken_PET.jpg").write_bytes(b"not an image")
+
+        report = evaluate(_FakeEngine(), iter_samples(tmp_path), image_size=32,
+                          batch_size=2, workers=0)
+
+        assert report["performance"]["images"] == 3
+        assert report["performance"]["failed"] == 1
+        assert report["per_class"]["CAN"]["support"] == 1
+        assert report["per_class"]["PET"]["support"] == 2
+
+    def test_benchmark_resolutions(self, tmp_path):
+        """Проверить отчёт точность/задержка по разрешениям."""
+        import cv2
+        from vision.evaluate import benchmark_resolutions
+
+        for name, value in [("a_PET.png", 2), ("b_CAN.png", 0)]:
+            cv2.imwrite(str(tmp_path / name), np.full((40, 60, 3), value, dtype=np.uint8))
+
+        table = benchmark_resolutions(_FakeEngine(), tmp_path, None, [16, 32], batch_size=2, workers=0)
+
+        assert list(table) == ["16", "32"]
+        assert table["32"]["accuracy"] == 1.0
+        assert table["16"]["images"] == 2
+        assert table["16"]["inference_per_image"]["count"] == 2
+
+
+class TestResultCache:
+    """Тесты для vision.result_cache."""
+
+    @staticmethod
+    def _scene(shift: int = 0) -> np.ndarray:
+        """Синтетическая сцена с градиентом и «объектом»."""
+        frame = np.tile(np.linspace(0, 200, 320, dtype=np.uint8), (240, 1))
+        frame = np.dstack([frame] * 3)
+        frame[80:160, 100 + shift:160 + shift] = 255
+        return frame
+
+    def test_hash_tolerates_noise(self):
+        """Проверить, что шум почти не меняет хэш, а новая сцена меняет."""
+        from vision.result_cache import hamming_distance, perceptual_hash
+
+        base = self._scene()
+        noisy = np.clip(base.astype(np.int16) + np.random.randint(-3, 4, base.shape), 0, 255).astype(np.uint8)
+
+        assert hamming_distance(perceptual_hash(base), perceptual_hash(noisy)) <= 4
+        assert hamming_distance(perceptual_hash(base), perceptual_hash(self._scene(shift=120))) > 4
+
+    def test_lookup_hit_and_miss(self):
+        """Проверить попадание по близкому хэшу и промах по далёкому."""
+        from vision.result_cache import ResultCache
+
+        cache = ResultCache(max_size=4, max_distance=2, ttl=60)
+        cache.store(0b1010, ("PET", 0.9))
+
+        assert cache.lookup(0b1011) == ("PET", 0.9)
+        assert cache.lookup(0b0101) is None
+        assert cache.stats() == {"hits": 1, "misses": 1, "hit_rate": 0.5, "size": 1}
+
+    def test_lru_eviction_and_ttl(self):
+        """Проверить вытеснение старых записей и истечение TTL."""
+        from vision.result_cache import ResultCache
+
+        cache = ResultCache(max_size=2, max_distance=0, ttl=60)
+        cache.store(1, "a")
+        cache.store(2, "b")
+        cache.lookup(1)
+        cache.store(3, "c")
+
+        assert cache.lookup(2) is None
+        assert cache.lookup(1) == "a"
+
+        expired = ResultCache(max_size=2, max_distance=0, ttl=0)
+        expired.store(1, "a")
+        assert expired.lookup(1) is None
+        assert expired.stats()["size"] == 0
+
+    def test_engine_predict_uses_cache(self):
+        """Проверить, что повторный кадр не вызывает модель."""
+        from unittest.mock import MagicMock
+        from core.config import Settings
+        from vision.inference_engine import InferenceEngine
+
+        engine = InferenceEngine(Settings(result_cache_size=32, result_cache_ttl=60))
+        result = MagicMock()
+        result.names = {0: "PET"}
+        result.probs.top1 = 0
+        result.probs.top1conf = 0.95
+        engine._model = MagicMock()
+        engine._model.predict.return_value = [result]
+        engine._is_ready = True
+
+        frame = self._scene()
+        assert engine.predict(frame) == ("PET", 0.95)
+        assert engine.predict(frame.copy()) == ("PET", 0.95)
+
+        assert engine._model.predict.call_count == 1
+        assert engine.cache_stats()["hits"] == 1
+
+
+class TestCascade:
+    """Тесты каскада моделей vision.inference_engine."""
+
+    def test_cascade_escalates_when_unsure(self):
+        """Проверить каскад: уверенный ответ первой ступени, сомнение - полная модель."""
+        from types import SimpleNamespace
+        from unittest.mock import MagicMock
+        from core.config import Settings
+        from vision.inference_engine import InferenceEngine
+
+        engine = InferenceEngine(Settings(result_cache_size=0, cascade_confidence=0.8, cascade_margin=0.5))
+        names = {0: "CAN", 1: "FOREIGN", 2: "PET"}
+        stage1_probs = iter([[0.02, 0.03, 0.95], [0.35, 0.05, 0.6]])
+        engine._stage1_model = MagicMock()
+        engine._stage1_model.predict.side_effect = lambda **kwargs: [
+            SimpleNamespace(names=names, probs=SimpleNamespace(data=np.array(next(stage1_probs))))
+        ]
+        full = MagicMock()
+        full.names = {0: "CAN"}
+        full.probs.top1 = 0
+        full.probs.top1conf = 0.7
+        engine._model = MagicMock()
+        engine._model.predict.return_value = [full]
+        engine._is_ready = True
+
+        assert engine.predict(np.zeros((4, 4, 3), dtype=np.uint8)) == ("PET", pytest.approx(0.95))
+        assert engine.predict(np.ones((4, 4, 3), dtype=np.uint8)) == ("CAN", 0.7)
+
+        assert engine._stage1_model.predict.call_args.kwargs["imgsz"] == 320
+        assert engine._model.predict.call_count == 1
+        assert engine.cascade_stats() == {
+            "requests": 2, "answered_stage1": 1, "escalated": 1, "escalation_rate": 0.5,
+        }
+
+    def test_warmup_with_extra_resolution(self, tmp_path):
+        """Проверить прогрев каскада с дополнительным разрешением: каждая модель замеряется."""
+        from types import SimpleNamespace
+        from unittest.mock import MagicMock
+        from core.config import Settings
+        from vision.inference_engine import InferenceEngine
+
+        settings = Settings(result_cache_size=0, cascade_confidence=0.8, cascade_margin=0.5,
+                            cascade_image_size=640, warmup_frames_dir=tmp_path,
+                            camera_width=64, camera_height=48, warmup_runs=2, warmup_max_runs=2)
+        engine = InferenceEngine(settings)
+        confident = [SimpleNamespace(names={0: "CAN", 1: "FOREIGN", 2: "PET"}, probs=SimpleNamespace(
+            data=np.array([0.02, 0.03, 0.95]), top1=2, top1conf=0.95, top5=[2], top5conf=[0.95]))]
+        models = {size: MagicMock() for size in (1280, 960, 640)}
+        for model in models.values():
+            model.predict.return_value = confident
+        engine._model = models[1280]
+        engine._models = dict(models)
+        engine._stage1_model = models[640]
+
+        assert engine.warmup()
+        assert all(latency is not None for latency in engine.resolution_stats().values())
+        assert models[960].predict.call_count == 2
+        assert engine.cascade_stats()["requests"] == 0
+
+
+class TestResolutionSelection:
+    """Тесты выбора разрешения vision.inference_engine."""
+
+    def test_resolution_selected_by_budget(self):
+        """Проверить выбор разрешения по бюджету задержки и модель этого разрешения."""
+        from unittest.mock import MagicMock
+        from core.config import Settings
+        from vision.inference_engine import InferenceEngine, parse_resolution_models
+
+        assert parse_resolution_models("640=w/a, 960=w/b,bad,x=w/c") == {640: Path("w/a"), 960: Path("w/b")}
+
+        engine = InferenceEngine(Settings(result_cache_size=32, result_cache_ttl=60))
+        result = MagicMock()
+        result.names = {0: "CAN"}
+        result.probs.top1 = 0
+        result.probs.top1conf = 0.8
+        full, small = MagicMock(), MagicMock()
+        full.predict.return_value = small.predict.return_value = [result]
+        engine._model = full
+        engine._models = {1280: full, 640: small}
+        engine._latency_ms = {1280: 120.0, 640: 30.0}
+        engine._is_ready = True
+
+        assert engine.resolutions() == [640, 1280]
+        assert engine.select_resolution(None) == 1280
+        assert engine.select_resolution(500) == 1280
+        assert engine.select_resolution(50) == 640
+        assert engine.select_resolution(5) == 640
+
+        frame = TestResultCache._scene()
+        assert engine.predict(frame, image_size=640) == ("CAN", 0.8)
+        assert small.predict.call_args.kwargs["imgsz"] == 640
+        assert full.predict.call_count == 0
+        # Ответ низкого разрешения не кэшируется
+        assert engine.cache_stats()["size"] == 0
+        assert engine.resolution_stats()[640] < 30.0
+
+        # Ответ основного разрешения из кэша не выдаётся запросу другого разрешения
+        assert engine.predict(frame) == ("CAN", 0.8)
+        assert engine.predict(frame, image_size=640) == ("CAN", 0.8)
+        assert (full.predict.call_count, small.predict.call_count) == (1, 2)
+        assert engine.cache_stats() == {"hits": 0, "misses": 1, "hit_rate": 0.0, "size": 1}
+
+
+class TestTestTimeAugmentation:
+    """Тесты TTA vision.inference_engine."""
+
+    def test_tta_only_for_unsure_frames(self):
+        """Проверить TTA: представления без копий, один пакет, усреднение вероятностей."""
+        from types import SimpleNamespace
+        from unittest.mock import MagicMock
+        from core.config import Settings
+        from vision.inference_engine import InferenceEngine, tta_views
+
+        frame = np.arange(40 * 60 * 3, dtype=np.uint8).reshape(40, 60, 3)
+        views = tta_views(frame, crop=0.5)
+        assert all(np.shares_memory(view, frame) for view in views)
+        assert views[0][0, 0].tolist() == frame[0, -1].tolist()
+        assert views[1].shape == (20, 30, 3)
+
+        names = {0: "CAN", 1: "FOREIGN", 2: "PET"}
+
+        def result(probs):
+            return SimpleNamespace(names=names, probs=SimpleNamespace(
+                data=np.array(probs), top1=int(np.argmax(probs)), top1conf=max(probs),
+                top5=[int(np.argmax(probs))], top5conf=[max(probs)]))
+
+        engine = InferenceEngine(Settings(result_cache_size=0, tta_enabled=True, tta_threshold=0.6))
+        engine._model = MagicMock()
+        engine._is_ready = True
+
+        engine._model.predict.side_effect = [[result([0.1, 0.1, 0.8])]]
+        assert engine.predict(frame) == ("PET", 0.8)
+
+        engine._model.predict.side_effect = [
+            [result([0.5, 0.1, 0.4])],
+            [result([0.2, 0.1, 0.7]), result([0.3, 0.1, 0.6]), result([0.2, 0.2, 0.6])],
+        ]
+        assert engine.predict(frame) == ("PET", pytest.approx(0.575))
+
+        batch = engine._model.predict.call_args.kwargs["source"]
+        assert len(batch) == 3
+        stats = engine.tta_stats()
+        assert (stats["requests"], stats["triggered"], stats["changed"]) == (2, 1, 1)
+        assert stats["latency"]["count"] == 1
+
+
+class TestWarmup:
+    """Тесты прогрева vision.inference_engine."""
+
+    def test_warmup_until_latency_stable(self, tmp_path, monkeypatch):
+        """Проверить прогрев записанными кадрами до стабилизации задержки."""
+        import cv2
+        from types import SimpleNamespace
+        from unittest.mock import MagicMock
+        from core.config import Settings
+        from vision import inference_engine
+        from vision.inference_engine import InferenceEngine
+
+        cv2.imwrite(str(tmp_path / "shot_PET.jpg"), np.zeros((60, 80, 3), dtype=np.uint8))
+        settings = Settings(camera_width=64, camera_height=48, warmup_frames_dir=tmp_path, result_cache_size=32,
+                            warmup_runs=2, warmup_window=3, warmup_tolerance=0.05)
+        engine = InferenceEngine(settings)
+
+        result = MagicMock()
+        result.names = {0: "PET"}
+        result.probs.top1 = 0
+        result.probs.top1conf = 0.9
+        # Задержки задаются сдвигом счётчика, а не реальным сном
+        delays = iter([0.06, 0.03, 0.0101, 0.0099, 0.01, 0.01])
+        counter = {"now": 0.0}
+        monkeypatch.setattr(inference_engine, "time", SimpleNamespace(perf_counter=lambda: counter["now"]))
+        shapes = []
+
+        def predict(source, **kwargs):
+            shapes.append(source.shape)
+            counter["now"] += next(delays)
+            return [result]
+
+        engine._model = MagicMock()
+        engine._model.predict.side_effect = predict
+
+        assert engine.warmup()
+        stats = engine.warmup_stats()
+        assert stats["stable"]
+        assert stats["runs"] == 5
+        assert stats["latencies_ms"] == [60.0, 30.0, 10.1, 9.9, 10.0]
+        assert set(shapes) == {(48, 64, 3)}
+        assert engine.is_ready() and engine.cache_stats()["misses"] == 0
+
+
+class TestMotionDetector:
+    """Тесты для vision.frame_analysis.MotionDetector."""
+
+    @staticmethod
+    def _feed(detector, frame, count, start=0.0):
+        """Подать один и тот же кадр count раз, вернуть все события."""
+        events = []
+        for i in range(count):
+            events += detector.update(frame, start + i * 0.033)
+        return events
+
+    def test_empty_scene_becomes_stable(self):
+        """Проверить стабильность пустой сцены без занятости."""
+        from vision.frame_analysis import MotionDetector
+
+        detector = MotionDetector(stable_frames=3)
+        events = self._feed(detector, np.full((90, 160), 50, dtype=np.uint8), 5)
+
+        assert events == ["stable"]
+        assert detector.state.occupied is False
+
+    def test_object_occupies_and_settles(self):
+        """Проверить события при появлении и успокоении объекта."""
+        from vision.frame_analysis import MotionDetector
+
+        detector = MotionDetector(stable_frames=3)
+        empty = np.full((90, 160), 50, dtype=np.uint8)
+        with_object = empty.copy()
+        with_object[30:60, 60:100] = 200
+
+        self._feed(detector, empty, 5)
+        events = self._feed(detector, with_object, 5, start=1.0)
+
+        assert events[:2] == ["unstable", "occupied"]
+        assert events[-1] == "stable"
+        assert detector.state.occupied and detector.state.stable
+        assert detector.state.stable_since > 1.0
+
+        events = self._feed(detector, empty, 5, start=2.0)
+        assert "vacated" in events
+
+    def test_downscale_gray_shape(self):
+        """Проверить размер уменьшенной копии кадра."""
+        from vision.frame_analysis import downscale_gray
+
+        small = downscale_gray(np.zeros((1440, 2560, 3), dtype=np.uint8), width=160)
+
+        assert small.shape == (90, 160)
+        assert small.dtype == np.uint8
+
+
+class _FakeCapture:
+    """Заглушка cv2.VideoCapture: отдаёт кадры из списка, затем последний."""
+
+    def __init__(self, frames):
+        self._frames = list(frames)
+        self._index = 0
+
+    def isOpened(self):
+        return True
+
+    def read(self):
+        frame = self._frames[min(self._index, len(self._frames) - 1)]
+        self._index += 1
+        return True, frame.copy()
+
+    def release(self):
+        pass
+
+
+class TestCameraManagerMotion:
+    """Тесты детектора движения внутри CameraManager."""
+
+    def test_wait_for_stable_frame_skips_empty(self):
+        """Проверить, что возвращается первый стабильный кадр с объектом."""
+        from core.config import Settings
+        from vision.camera_manager import CameraManager
+
+        empty = np.full((180, 320, 3), 40, dtype=np.uint8)
+        with_object = empty.copy()
+        with_object[60:120, 120:200] = 220
+        camera = CameraManager(Settings(stable_frames=3))
+        camera._cap = _FakeCapture([empty] * 10 + [with_object])
+        camera._is_open = True
+
+        events = []
+        camera.add_motion_listener(lambda event, state: events.append(event))
+        camera.start_capture()
+        try:
+            frame, timestamp = camera.wait_for_stable_frame(timeout=2.0)
+        finally:
+            camera.stop_capture()
+
+        assert frame is not None
+        assert frame.mean() > empty.mean()
+        assert "occupied" in events
+        assert camera.get_motion_state().occupied
+
+    def test_stable_frame_timeout_on_virtual_clock(self):
+        """Проверить, что таймаут ожидания стабильного кадра отрабатывает по виртуальным часам."""
+        from core.clock import VirtualClock
+        from core.config import Settings
+        from vision.camera_manager import CameraManager
+
+        clock = VirtualClock()
+        camera = CameraManager(Settings(stable_frames=3), clock=clock)
+
+        started = time.perf_counter()
+        assert camera.wait_for_stable_frame(timeout=30.0) == (None, None)
+        assert time.perf_counter() - started < 5.0
+        assert abs(clock.now() - 30.0) < 1e-6
+
+    def test_stable_wait_bounded_by_deadline(self):
+        """Проверить, что ожидание стабильной сцены занимает лишь долю срока запроса."""
+        import asyncio
+        from unittest.mock import MagicMock
+        from core.clock import VirtualClock
+        from core.config import Settings
+        from vision.inference_service import InferenceClient
+
+        clock = VirtualClock()
+        client = InferenceClient(Settings(stable_wait_timeout=1.0, speculative_inference=False), clock=clock)
+        frame = np.zeros((4, 4, 3), dtype=np.uint8)
+        client._camera = MagicMock()
+        client._camera.wait_for_stable_frame.return_value = (frame, 5.0)
+        client._camera.best_frame.return_value = (frame, 5.0, None)
+
+        asyncio.run(client._acquire_frame(clock.now() + 1.8))
+        asyncio.run(client._acquire_frame(clock.now() + 10.0))
+        asyncio.run(client._acquire_frame(clock.now() - 1.0))
+
+        waits = [call.args[0] for call in client._camera.wait_for_stable_frame.call_args_list]
+        assert waits == [pytest.approx(1.8 * client.STABLE_WAIT_SHARE), 1.0, 0.0]
+
+
+class TestFrameQuality:
+    """Тесты оценки качества кадра и выбора лучшего кадра."""
+
+    @staticmethod
+    def _checkerboard(blur: int = 0) -> np.ndarray:
+        import cv2
+
+        board = (np.indices((240, 320)).sum(axis=0) // 8 % 2 * 160 + 40).astype(np.uint8)
+        frame = np.dstack([board] * 3)
+        if blur:
+            frame = cv2.GaussianBlur(frame, (0, 0), blur)
+        return frame
+
+    def test_sharp_frame_scores_higher(self):
+        """Проверить, что размытый кадр получает меньшую оценку."""
+        from vision.frame_analysis import frame_quality
+
+        sharp = frame_quality(self._checkerboard())
+        blurred = frame_quality(self._checkerboard(blur=4))
+
+        assert sharp.score > blurred.score * 2
+
+    def test_overexposed_frame_penalized(self):
+        """Проверить штраф за пересвет при одинаковой резкости."""
+        from vision.frame_analysis import frame_quality
+
+        normal = frame_quality(self._checkerboard())
+        overexposed = frame_quality(self._checkerboard() + 55)  # 40/200 → 95/255
+
+        assert overexposed.clipped_ratio > 0.4
+        assert overexposed.sharpness == pytest.approx(normal.sharpness, rel=0.01)
+        assert overexposed.score < normal.score * 0.8
+
+    def test_best_frame_picks_sharpest_in_window(self):
+        """Проверить выбор самого резкого кадра в окне."""
+        from core.config import Settings
+        from vision.camera_manager import CameraManager
+        from vision.frame_analysis import frame_quality
+
+        camera = CameraManager(Settings(frame_buffer_size=4))
+        frames = [(self._checkerboard(blur=3), 1.0), (self._checkerboard(), 1.1),
+                  (self._checkerboard(blur=2), 1.2), (self._checkerboard(blur=5), 1.3)]
+        for frame, timestamp in frames:
+            camera._buffer.append((frame, timestamp, frame_quality(frame)))
+
+        _, timestamp, _ = camera.best_frame(window=0.5)
+        assert timestamp == 1.1
+
+        _, timestamp, _ = camera.best_frame(window=0.15)
+        assert timestamp == 1.2
+
+    def test_buffer_holds_best_frame_window(self):
+        """Проверить, что буфер вмещает всё окно выбора лучшего кадра."""
+        from core.config import Settings
+        from vision.camera_manager import CameraManager
+
+        settings = Settings(frame_buffer_size=3, best_frame_window=0.3, camera_fps=30)
+        assert CameraManager.buffer_capacity(settings) == 10
+        assert CameraManager(settings)._buffer.maxlen == 10
+
+        assert CameraManager.buffer_capacity(Settings(frame_buffer_size=3, frame_quality=False)) == 3
+        assert CameraManager.buffer_capacity(Settings(frame_buffer_size=16, best_frame_window=0.1)) == 16
+
+
+class TestCameraGroup:
+    """Тесты для vision.camera_group."""
+
+    @staticmethod
+    def _group(timestamps_per_camera, tolerance=0.02):
+        from core.config import Settings
+        from vision.camera_group import CameraGroup
+
+        group = CameraGroup(Settings(camera_sync_tolerance=tolerance, frame_buffer_size=8),
+                            list(range(len(timestamps_per_camera))))
+        for value, (camera, timestamps) in enumerate(zip(group.cameras, timestamps_per_camera)):
+            for timestamp in timestamps:
+                camera._buffer.append((np.full((4, 4, 3), value, dtype=np.uint8), timestamp, None))
+                camera._last_capture_time = timestamp
+        return group
+
+    def test_frame_set_aligned_to_slowest_camera(self):
+        """Проверить выбор кадров, ближайших к последнему кадру отстающей камеры."""
+        group = self._group([[1.000, 1.033, 1.066], [1.010, 1.045]])
+
+        frame_set = group.get_frame_set(timeout=0)
+
+        assert frame_set.timestamps == [1.033, 1.045]
+        assert frame_set.skew_ms == pytest.approx(12.0)
+        assert [int(frame.mean()) for frame in frame_set.frames] == [0, 1]
+
+    def test_frame_set_outside_tolerance(self):
+        """Проверить отказ, если кадры камер слишком далеко по времени."""
+        group = self._group([[1.0, 1.2], [1.5]])
+
+        assert group.get_frame_set(timeout=0) is None
+        assert group.get_frame_set(timeout=0, reference=1.49) is None
+
+    def test_predict_fuses_views_in_one_batch(self):
+        """Проверить пакетную классификацию и усреднение вероятностей."""
+        from vision.camera_group import FrameSet
+        from vision.inference_engine import InferenceEngine
+
+        class _Engine:
+            CLASS_MAPPING = InferenceEngine.CLASS_MAPPING
+            calls = []
+
+            def predict_probs(self, frames, image_size=None):
+                self.calls.append(len(frames))
+                return np.array([[0.1, 0.2, 0.7], [0.1, 0.8, 0.1]]), ["CAN", "FOREIGN", "PET"]
+
+        engine = _Engine()
+        group = self._group([[1.0], [1.0]])
+
+        class_name, confidence = group.predict(engine, FrameSet([None, None], [1.0, 1.0]))
+
+        assert engine.calls == [2]
+        assert class_name == "NONE"
+        assert confidence == pytest.approx(0.5)
+
+
+class _FakeVideoCapture:
+    """Заглушка cv2.VideoCapture: рабочая камера только с индексом WORKING."""
+
+    WORKING = 2
+    opened = []
+
+    def __init__(self, index):
+        self._index = index
+        self.opened.append(index)
+
+    def isOpened(self):
+        return self._index == self.WORKING
+
+    def set(self, prop, value):
+        return True
+
+    def get(self, prop):
+        import cv2
+        return {cv2.CAP_PROP_FRAME_WIDTH: 2560, cv2.CAP_PROP_FRAME_HEIGHT: 1440,
+                cv2.CAP_PROP_FPS: 30.0}.get(prop, 0)
+
+    def read(self):
+        return True, np.zeros((8, 8, 3), dtype=np.uint8)
+
+    def release(self):
+        pass
+
+
+class TestCameraDiscovery:
+    """Тесты для vision.camera_discovery."""
+
+    @pytest.fixture
+    def fake_cv2(self, monkeypatch):
+        import vision.camera_manager as camera_manager
+
+        _FakeVideoCapture.opened = []
+        monkeypatch.setattr(camera_manager.cv2, "VideoCapture", _FakeVideoCapture)
+        return _FakeVideoCapture
+
+    def test_cold_scan_then_warm_open(self, fake_cv2, tmp_path):
+        """Проверить полный перебор при пустом кэше и одну попытку при тёплом старте."""
+        from core.config import Settings
+        from vision.camera_discovery import CameraDiscovery
+        from vision.camera_manager import CameraManager
+
+        settings = Settings(retry_count=1, retry_delay=0, camera_cache_path=tmp_path / "cache.json")
+
+        cold = CameraDiscovery(settings).open_camera(CameraManager(settings))
+        assert cold.warm is False
+        assert cold.mode["index"] == 2
+        assert fake_cv2.opened == [0, 1, 2]
+
+        fake_cv2.opened = []
+        warm = CameraDiscovery(settings).open_camera(CameraManager(settings))
+        assert warm.warm is True
+        assert fake_cv2.opened == [2]
+
+    def test_stale_cache_falls_back_to_scan(self, fake_cv2, tmp_path):
+        """Проверить полный перебор, если камера сменила индекс."""
+        from core.config import Settings
+        from vision.camera_discovery import CameraDiscovery
+        from vision.camera_manager import CameraManager
+
+        settings = Settings(retry_count=1, retry_delay=0, camera_cache_path=tmp_path / "cache.json")
+        CameraDiscovery(settings).open_camera(CameraManager(settings))
+
+        fake_cv2.WORKING = 3
+        try:
+            result = CameraDiscovery(settings).open_camera(CameraManager(settings))
+        finally:
+            fake_cv2.WORKING = 2
+
+        assert result.warm is False
+        assert result.mode["index"] == 3
+
+    def test_device_key_and_resolve_index(self, tmp_path):
+        """Проверить ключ устройства по стабильной ссылке и обратное разрешение."""
+        from vision.camera_discovery import device_key, resolve_index
+
+        (tmp_path / "video4").touch()
+        by_id = tmp_path / "by-id"
+        by_id.mkdir()
+        (by_id / "usb-Cam_SN123-video-index0").symlink_to(tmp_path / "video4")
+
+        key = device_key(4, v4l_dirs=(str(by_id),))
+
+        assert key.endswith("usb-Cam_SN123-video-index0")
+        assert resolve_index(key) == 4
+        assert device_key(7, v4l_dirs=(str(by_id),)) == "/dev/video7"
+
+
+class TestCameraSupervisor:
+    """Тесты для vision.camera_supervisor."""
+
+    @pytest.fixture
+    def supervisor(self, monkeypatch, tmp_path):
+        import vision.camera_manager as camera_manager
+        from core.config import Settings
+        from vision.camera_discovery import CameraDiscovery
+        from vision.camera_manager import CameraManager
+        from vision.camera_supervisor import CameraSupervisor
+
+        _FakeVideoCapture.opened = []
+        monkeypatch.setattr(camera_manager.cv2, "VideoCapture", _FakeVideoCapture)
+        monkeypatch.setattr(CameraSupervisor, "CHECK_INTERVAL", 0.01)
+        settings = Settings(retry_count=1, retry_delay=0, camera_reopen_delay=0.01,
+                            motion_detection=False, camera_cache_path=tmp_path / "cache.json")
+        supervisor = CameraSupervisor(settings, CameraManager(settings), CameraDiscovery(settings))
+        yield supervisor
+        supervisor.stop()
+
+    def test_camera_ready_in_background(self, supervisor):
+        """Проверить открытие камеры и наличие кадров после старта."""
+        supervisor.start()
+
+        assert supervisor.wait_ready(timeout=2.0)
+        assert supervisor._camera.buffer_size > 0
+
+    def test_reopens_when_capture_stops(self, supervisor):
+        """Проверить переоткрытие камеры после остановки захвата."""
+        supervisor.start()
+        assert supervisor.wait_ready(timeout=2.0)
+
+        supervisor._camera.stop_capture()
+
+        deadline = time.monotonic() + 2.0
+        while not supervisor.is_ready() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert supervisor.is_ready()
+        assert _FakeVideoCapture.opened.count(2) >= 2
+        stats = supervisor.stats()
+        assert stats["recoveries"] == 1
+        assert stats["last_stall_reason"] == "capture_stopped"
+        assert stats["last_recovery_ms"] is not None
+
+    def test_stalled_frames_fail_fast(self, supervisor, monkeypatch):
+        """Проверить отказ is_ready при устаревшем кадре, не дожидаясь watchdog."""
+        supervisor.start()
+        assert supervisor.wait_ready(timeout=2.0)
+
+        supervisor._stop_event.set()  # останавливаем watchdog, камера остаётся
+        supervisor._thread.join()
+        monkeypatch.setattr(supervisor._camera, "_last_capture_time", time.time() - 5)
+        monkeypatch.setattr(supervisor._camera, "is_capturing", lambda: True)
+
+        assert supervisor.is_ready() is False
+        assert supervisor._check_stall() == "frame_stall"
+
+    def test_backoff_is_exponential_and_capped(self, supervisor):
+        """Проверить рост задержки между попытками и её ограничение."""
+        supervisor._settings.camera_reopen_delay = 1.0
+        supervisor._settings.camera_reopen_max_delay = 5.0
+
+        delays = []
+        for attempt in range(1, 6):
+            supervisor._failed_attempts = attempt
+            delays.append(supervisor._backoff_delay())
+
+        assert delays == [1.0, 2.0, 4.0, 5.0, 5.0]
+
+    def test_ready_on_virtual_clock(self, monkeypatch, tmp_path):
+        """Проверить готовность на виртуальных часах: возраст кадра считается по тем же часам."""
+        import vision.camera_manager as camera_manager
+        from core.clock import VirtualClock
+        from core.config import Settings
+        from vision.camera_manager import CameraManager
+        from vision.camera_supervisor import HEALTH_HEALTHY, HEALTH_STARTING, CameraSupervisor
+
+        monkeypatch.setattr(camera_manager.cv2, "VideoCapture", _FakeVideoCapture)
+        clock = VirtualClock()
+        settings = Settings(retry_count=1, retry_delay=0, camera_index=_FakeVideoCapture.WORKING,
+                            motion_detection=False, camera_cache_path=tmp_path / "cache.json")
+        camera = CameraManager(settings, clock=clock)
+        supervisor = CameraSupervisor(settings, camera, clock=clock)
+
+        # Захват без потока: каждый сдвиг часов даёт один кадр
+        monkeypatch.setattr(camera, "start_capture", lambda: setattr(camera, "_capture_running", True) or True)
+        frame = np.zeros((8, 8, 3), dtype=np.uint8)
+
+        def capture(now):
+            if camera.is_capturing():
+                with camera._frame_condition:
+                    camera._buffer.append((frame, clock.time(), None))
+                    camera._last_capture_time = clock.time()
+                camera._frames_captured += 1
+            if supervisor.is_ready() or now > 60.0:
+                supervisor._stop_event.set()
+
+        clock.add_listener(capture)
+        supervisor._health = HEALTH_STARTING
+        supervisor._run()
+
+        assert supervisor.is_ready()
+        assert supervisor.health == HEALTH_HEALTHY
+        assert supervisor.stats()["frame_age_ms"] <= settings.camera_stall_timeout * 1000
+
+
+def _frame_bus_reader(name, queue):
+    """Читатель шины в отдельном процессе: возвращает (seq, сумма кадра)."""
+    from vision.frame_bus import FrameBus
+
+    bus = FrameBus.attach(name)
+    try:
+        frame, _, seq = bus.read_latest()
+        queue.put((seq, int(frame.sum())))
+    finally:
+        bus.close()
+
+
+class TestFrameBus:
+    """Тесты для vision.frame_bus."""
+
+    @pytest.fixture
+    def bus(self):
+        import uuid
+        from vision.frame_bus import FrameBus
+
+        bus = FrameBus.create(f"test_bus_{uuid.uuid4().hex[:8]}", (4, 6, 3), slots=3)
+        yield bus
+        bus.close()
+        bus.unlink()
+
+    def test_publish_and_read_latest(self, bus):
+        """Проверить публикацию и чтение последнего кадра."""
+        assert bus.read_latest() is None
+
+        for value in (1, 2):
+            bus.publish(np.full((4, 6, 3), value, dtype=np.uint8), timestamp=float(value))
+
+        frame, timestamp, seq = bus.read_latest()
+        assert seq == 2
+        assert timestamp == 2.0
+        assert (frame == 2).all()
+
+    def test_view_invalidated_after_overwrite(self, bus):
+        """Проверить, что zero-copy view обнаруживает перезапись слота."""
+        bus.publish(np.zeros((4, 6, 3), dtype=np.uint8), 0.0)
+        view = bus.view_latest()
+        assert view.valid()
+
+        for i in range(bus.slots):
+            bus.publish(np.full((4, 6, 3), 9, dtype=np.uint8), float(i))
+
+        assert not view.valid()
+
+    def test_shape_mismatch_rejected(self, bus):
+        """Проверить отказ при кадре другой формы."""
+        with pytest.raises(ValueError):
+            bus.publish(np.zeros((2, 2, 3), dtype=np.uint8), 0.0)
+
+    def test_reader_in_other_process(self, bus):
+        """Проверить чтение кадра из другого процесса."""
+        import multiprocessing
+
+        bus.publish(np.full((4, 6, 3), 7, dtype=np.uint8), 1.0)
+
+        ctx = multiprocessing.get_context("spawn")
+        queue = ctx.Queue()
+        process = ctx.Process(target=_frame_bus_reader, args=(bus.name, queue))
+        process.start()
+        process.join(timeout=30)
+
+        assert queue.get(timeout=5) == (1, 7 * 4 * 6 * 3)
+
+
+class _SleepEngine:
+    """CPU заглушка движка: «инференс» занимает delay секунд без GIL."""
+
+    CLASS_MAPPING = {"PET": "PET", "CAN": "CAN", "FOREIGN": "NONE"}
+
+    def __init__(self, delay=0.05):
+        self.delay = delay
+        self.ready = False
+
+    def load_model(self):
+        return True
+
+    def warmup(self, runs=None):
+        self.ready = True
+        return True
+
+    def is_ready(self):
+        return self.ready
+
+    def predict(self, frame):
+        time.sleep(self.delay)
+        return "PET", float(frame.mean())
+
+    def predict_batch(self, frames):
+        return [self.predict(frame) for frame in frames]
+
+    def predict_probs(self, frames, image_size=None):
+        time.sleep(self.delay)
+        return np.array([[0.0, 0.0, float(frame.mean())] for frame in frames]), ["CAN", "FOREIGN", "PET"]
+
+
+class TestInferencePool:
+    """Тесты для vision.inference_pool."""
+
+    @staticmethod
+    def _pool(workers=3, queue_size=16, delay=0.05):
+        from core.config import Settings
+        from vision.inference_pool import InferencePool
+
+        pool = InferencePool(Settings(), workers=workers, queue_size=queue_size,
+                             engine_factory=lambda index, settings: _SleepEngine(delay))
+        assert pool.load_model() and pool.warmup()
+        return pool
+
+    def test_requests_run_in_parallel(self):
+        """Проверить параллельное выполнение на нескольких воркерах."""
+        pool = self._pool(workers=3)
+        try:
+            start = time.monotonic()
+            futures = [pool.submit(np.full((2, 2), i, dtype=np.uint8)) for i in range(6)]
+            results = [future.result(timeout=5) for future in futures]
+            elapsed = time.monotonic() - start
+        finally:
+            pool.shutdown()
+
+        assert [result.confidence for result in results] == [float(i) for i in range(6)]
+        assert len({result.request_id for result in results}) == 6
+        assert elapsed < 6 * 0.05 * 0.75
+        stats = pool.stats()
+        assert sum(worker["tasks"] for worker in stats["workers"]) == 6
+        assert all(worker["utilisation"] > 0 for worker in stats["workers"])
+
+    def test_batch_split_keeps_order(self):
+        """Проверить разбиение пакета между воркерами с сохранением порядка."""
+        pool = self._pool(workers=3)
+        try:
+            frames = [np.full((2, 2), i, dtype=np.uint8) for i in range(7)]
+            probs, names = pool.predict_probs(frames)
+        finally:
+            pool.shutdown()
+
+        assert names == ["CAN", "FOREIGN", "PET"]
+        assert probs[:, 2].tolist() == [float(i) for i in range(7)]
+
+    def test_bounded_queue_rejects_overflow(self):
+        """Проверить отказ при заполненной очереди."""
+        import queue
+
+        pool = self._pool(workers=1, queue_size=1, delay=0.2)
+        try:
+            first = pool.submit(np.zeros((2, 2)))
+            time.sleep(0.05)  # воркер взял первое задание
+            pool.submit(np.zeros((2, 2)))
+            with pytest.raises(queue.Full):
+                pool.submit(np.zeros((2, 2)))
+            first.result(timeout=5)
+        finally:
+            pool.shutdown()
+
+    def test_expired_request_skips_engine(self):
+        """Проверить, что просроченное в очереди задание не вызывает модель."""
+        from vision.inference_pool import DeadlineExceeded
+
+        pool = self._pool(workers=1, delay=0.2)
+        try:
+            busy = pool.submit(np.zeros((2, 2)))
+            late = pool.submit(np.zeros((2, 2)), deadline=time.monotonic() + 0.05, request_id="r-late")
+            busy.result(timeout=5)
+            with pytest.raises(DeadlineExceeded) as error:
+                late.result(timeout=5)
+        finally:
+            pool.shutdown()
+
+        assert error.value.request_id == "r-late"
+        worker = pool.stats()["workers"][0]
+        assert worker["tasks"] == 1
+        assert worker["expired"] == 1
+
+    def test_cancelled_request_is_dropped(self):
+        """Проверить снятие ещё не начатого задания через Future.cancel()."""
+        pool = self._pool(workers=1, delay=0.2)
+        try:
+            busy = pool.submit(np.zeros((2, 2)))
+            queued = pool.submit(np.zeros((2, 2)))
+            assert queued.cancel()
+            result = busy.result(timeout=5)
+            pool.predict(np.zeros((2, 2)))   # cancelled задание уже пройдено воркером
+        finally:
+            pool.shutdown()
+
+        assert result.queued_ms >= 0 and result.inference_ms >= 150
+        worker = pool.stats()["workers"][0]
+        assert worker["tasks"] == 2
+        assert worker["cancelled"] == 1
+
+
+class TestStartup:
+    """Тесты для vision.startup_profile и фонового прогрева сервиса."""
+
+    def test_profile_marks_phases_once(self):
+        """Проверить отметки фаз от старта процесса."""
+        from vision.startup_profile import StartupProfile
+
+        profile = StartupProfile()
+        first = profile.mark("imports")
+        time.sleep(0.01)
+        assert profile.mark("imports") == first
+        assert profile.mark("ready") >= first + 10
+        assert list(profile.phases()) == ["imports", "ready"]
+
+    def test_import_breakdown(self):
+        """Проверить разбивку времени импорта по пакетам."""
+        from vision.startup_profile import import_breakdown
+
+        total_ms, packages = import_breakdown("vision.frame_analysis", top=5)
+        names = [name for name, _ in packages]
+        assert total_ms > 0
+        assert "numpy" in names
+
+    def test_classify_while_warming(self):
+        """Проверить немедленный ответ "warming" до загрузки модели."""
+        import asyncio
+        import json
+        from core.config import Settings
+        from vision.inference_service import InferenceClient
+
+        class _Socket:
+            def __init__(self):
+                self.sent = []
+
+            async def send(self, message):
+                self.sent.append(message)
+
+        client = InferenceClient(Settings(motion_detection=False))
+        client._websocket = _Socket()
+        asyncio.run(client._reply_classify({"command": "classify", "id": "7"}))
+
+        reply = json.loads(client._websocket.sent[0])
+        assert reply["id"] == "7"
+        assert reply["result"] == "none"
+        assert reply["error"] == "warming"
+        assert client._status_payload()["model_ready"] is False
+
+    def test_hot_swap_validates_and_drains(self, tmp_path):
+        """Проверить горячую замену: проверка на эталонах, старая модель освобождается после заданий."""
+        import cv2
+        from core.config import Settings
+        from vision.inference_pool import InferencePool
+
+        class _ModelEngine(_SleepEngine):
+            def __init__(self, settings):
+                super().__init__(delay=0.01)
+                self.model = str(settings.model_path)
+                self.busy = 0
+                self.released_while_busy = False
+
+            def predict(self, frame):
+                self.busy += 1
+                time.sleep(self.delay)
+                self.busy -= 1
+                return ("PET" if "good" in self.model else "CAN"), 0.9
+
+            def release(self):
+                self.released_while_busy = self.busy > 0
+                self.ready = False
+
+        for name in ("1_PET.jpg", "2_PET.jpg"):
+            cv2.imwrite(str(tmp_path / name), np.zeros((8, 8, 3), dtype=np.uint8))
+
+        engines = []
+
+        def factory(index, settings):
+            engines.append(_ModelEngine(settings))
+            return engines[-1]
+
+        pool = InferencePool(Settings(model_path="old", model_reference_dir=tmp_path),
+                             workers=2, engine_factory=factory)
+        assert pool.load_model() and pool.warmup()
+        old_engines = list(engines)
+        try:
+            for engine in old_engines:
+                engine.delay = 0.3
+            in_flight = [pool.submit(np.zeros((2, 2))) for _ in range(2)]
+            time.sleep(0.05)
+
+            assert pool.swap_model("good")
+            assert all(future.result(timeout=5).class_name == "CAN" for future in in_flight)
+            assert pool.submit(np.zeros((2, 2))).result(timeout=5).class_name == "PET"
+
+            assert not pool.swap_model_async("bad").result(timeout=5)
+            assert pool.submit(np.zeros((2, 2))).result(timeout=5).class_name == "PET"
+        finally:
+            pool.shutdown()
+
+        assert all(not engine.ready and not engine.released_while_busy for engine in old_engines)
+        stats = pool.stats()
+        assert stats["model_path"] == "good"
+        assert stats["model_swaps"] == 1
+
+    def test_hot_swap_defers_release_after_drain_timeout(self, tmp_path):
+        """Проверить, что движок с незавершённым к таймауту заданием освобождается воркером после него."""
+        import threading
+        import cv2
+        from core.config import Settings
+        from vision.inference_pool import InferencePool
+
+        class _BlockingEngine(_SleepEngine):
+            def __init__(self, settings):
+                super().__init__(delay=0.0)
+                self.model = str(settings.model_path)
+                self.gate = threading.Event()
+                self.gate.set()
+                self.busy = False
+                self.released = False
+                self.released_while_busy = False
+
+            def predict(self, frame):
+                self.busy = True
+                self.gate.wait(timeout=5)
+                self.busy = False
+                return "PET", 0.9
+
+            def release(self):
+                self.released = True
+                self.released_while_busy = self.busy
+
+        cv2.imwrite(str(tmp_path / "1_PET.jpg"), np.zeros((8, 8, 3), dtype=np.uint8))
+        engines = []
+
+        def factory(index, settings):
+            engines.append(_BlockingEngine(settings))
+            return engines[-1]
+
+        pool = InferencePool(Settings(model_path="old", model_reference_dir=tmp_path, inference_queue_timeout=0.05),
+                             workers=1, engine_factory=factory)
+        assert pool.load_model() and pool.warmup()
+        old = engines[0]
+        try:
+            old.gate.clear()
+            in_flight = pool.submit(np.zeros((2, 2)))
+            time.sleep(0.05)
+
+            assert pool.swap_model("new")
+            assert not old.released
+
+            old.gate.set()
+            assert in_flight.result(timeout=5).class_name == "PET"
+            assert pool.submit(np.zeros((2, 2))).result(timeout=5).class_name == "PET"
+        finally:
+            pool.shutdown()
+
+        assert old.released and not old.released_while_busy
+        assert pool._retired == []
@@ -0,0 +1,243 @@
+"""
+Тесты для модуля websocket.
+
+Проверяет журнал событий, повторную отправку при переподключении
+и исходящие очереди клиентов.
+"""
+import asyncio
+import json
+
+import pytest
+from websockets.exceptions import ConnectionClosedOK
+
+from websocket.client_connection import ClientConnection, OVERFLOW_EVICT
+from websocket.event_log import EventLog
+from websocket.server import WebSocket
+
+
+class TestEventLog:
+    """Тесты для EventLog."""
+
+    def test_append_stamps_json(self):
+        """Проверить вставку seq в JSON событие."""
+        log = EventLog(maxlen=4)
+
+        seq, message = log.append('{"event": "receiver_empty", "data": {}}')
+
+        assert seq == 1
+        parsed = json.loads(message)
+        assert parsed["seq"] == 1
+        assert parsed["event"] == "receiver_empty"
+
+    def test_append_plain_string_unchanged(self):
+        """Проверить, что строковое сообщение не изменяется."""
+        log = EventLog(maxlen=4)
+
+        seq, message = log.append("bottle_exist")
+
+        assert seq == 1
+        assert message == "bottle_exist"
+
+    def test_since_returns_missed(self):
+        """Проверить возврат пропущенных событий."""
+        log = EventLog(maxlen=4)
+        for i in range(3):
+            log.append(json.dumps({"event": f"e{i}"}))
+
+        missed = log.since(1)
+
+        assert [json.loads(m)["event"] for m in missed] == ["e1", "e2"]
+        assert log.since(3) == []
+
+    def test_since_overflow_requires_snapshot(self):
+        """Проверить, что вытесненные события требуют снимка состояния."""
+        log = EventLog(maxlen=2)
+        for i in range(5):
+            log.append(json.dumps({"event": f"e{i}"}))
+
+        assert log.since(1) is None
+        assert len(log.since(3)) == 2
+
+    def test_since_future_seq_requires_snapshot(self):
+        """Проверить seq из другой сессии сервера (больше текущего)."""
+        log = EventLog(maxlen=4)
+        log.append("{}")
+
+        assert log.since(100) is None
+
+
+class TestWebSocketResync:
+    """Тесты для регистрации и resync в WebSocket."""
+
+    @pytest.fixture
+    def server(self):
+        """WebSocket сервер без запуска event loop."""
+        return WebSocket(PLC=None, replay_size=2)
+
+    def test_parse_hello_plain(self, server):
+        """Проверить строковую регистрацию."""
+        assert server._parse_hello("vision") == ("vision", None)
+
+    def test_parse_hello_json(self, server):
+        """Проверить JSON регистрацию с last_seq."""
+        assert server._parse_hello('{"client": "app", "last_seq": 7}') == ("app", 7)
+
+    def test_send_to_disconnected_client_is_logged(self, server):
+        """Проверить, что события для отключенного app попадают в журнал."""
+        server.send_to_client("app", '{"event": "receiver_empty"}')
+
+        assert server.get_last_seq("app") == 1
+        assert server.get_last_seq("vision") == 0
+
+    def test_resync_replays_missed(self, server):
+        """Проверить replay пропущенных событий."""
+        server.send_to_client("app", '{"event": "a"}')
+        server.send_to_client("app", '{"event": "b"}')
+
+        messages = server._build_resync("app", 1)
+
+        assert [json.loads(m)["event"] for m in messages] == ["b"]
+
+    def test_resync_sends_snapshot_when_behind(self, server):
+        """Проверить отправку снимка при сильном отставании."""
+        server.set_snapshot_provider("app", lambda: {"state": "idle"})
+        for name in ("a", "b", "c"):
+            server.send_to_client("app", json.dumps({"event": name}))
+
+        messages = server._build_resync("app", 0)
+
+        assert len(messages) == 1
+        snapshot = json.loads(messages[0])
+        assert snapshot["event"] == "state_snapshot"
+        assert snapshot["data"] == {"state": "idle"}
+        assert snapshot["seq"] == 3
+
+    def test_status_does_not_overwrite_reply(self, server):
+        """Проверить, что состояние vision не затирает ожидающий ответ на классификацию."""
+        reply = '{"id": "3", "result": "bottle", "confidence": 0.9}'
+
+        async def scenario():
+            ws = _FakeWebSocket(incoming=["vision", reply, '{"status": "ready", "model_ready": true}'])
+            handler = asyncio.create_task(server._handler(ws))
+            await asyncio.sleep(0.01)
+            received = server.get_command("vision"), server.get_status("vision")
+            await ws.close()
+            await asyncio.wait_for(handler, timeout=1.0)
+            return received
+
+        message, status = asyncio.run(scenario())
+        assert message == reply
+        assert status == {"status": "ready", "model_ready": True}
+        assert server.get_status("vision") is None
+
+    def test_reregistration_closes_old_socket(self, server):
+        """Проверить, что повторная регистрация закрывает старое соединение."""
+        async def scenario():
+            old, new = _FakeWebSocket(incoming=["vision"]), _FakeWebSocket(incoming=["vision"])
+            old_handler = asyncio.create_task(server._handler(old))
+            await asyncio.sleep(0.01)
+            new_handler = asyncio.create_task(server._handler(new))
+            await asyncio.wait_for(old_handler, timeout=1.0)
+
+            registered = server.clients.get("vision") is new
+            await new.close()
+            await asyncio.wait_for(new_handler, timeout=1.0)
+            return old.closed_code, registered
+
+        assert asyncio.run(scenario()) == (1000, True)
+        assert "vision" not in server.clients
+
+
+class _FakeWebSocket:
+    """Заглушка соединения: записывает отправленное, может «зависать»."""
+
+    def __init__(self, stall: bool = False, incoming=()):
+        self.sent = []
+        self.closed_code = None
+        self._stall = stall
+        self._incoming = list(incoming)
+        self._closed = asyncio.Event()
+
+    async def recv(self):
+        if self._incoming:
+            return self._incoming.pop(0)
+        await self._closed.wait()
+        raise ConnectionClosedOK(None, None)
+
+    async def send(self, message):
+        if self._stall:
+            await asyncio.sleep(3600)
+        self.sent.append(message)
+
+    async def close(self, code=1000, reason=""):
+        self.closed_code = code
+        self._closed.set()
+
+
+class TestClientConnection:
+    """Тесты для ClientConnection."""
+
+    def test_messages_delivered_in_order(self):
+        """Проверить доставку сообщений в порядке постановки."""
+        async def scenario():
+            ws = _FakeWebSocket()
+            conn = ClientConnection("vision", ws)
+            conn.start()
+            for i in range(3):
+                conn.enqueue(f"m{i}")
+            await asyncio.sleep(0.01)
+            await conn.stop()
+            return ws.sent, conn.stats()
+
+        sent, stats = asyncio.run(scenario())
+
+        assert sent == ["m0", "m1", "m2"]
+        assert stats["sent"] == 3
+        assert stats["dropped"] == 0
+
+    def test_drop_oldest_on_overflow(self):
+        """Проверить вытеснение старых сообщений у медленного клиента."""
+        async def scenario():
+            conn = ClientConnection("monitor", _FakeWebSocket(stall=True), max_queue=2)
+            for i in range(5):
+                conn.enqueue(f"m{i}")
+            return [m for m, _ in conn._queue], conn.stats()
+
+        queued, stats = asyncio.run(scenario())
+
+        assert queued == ["m3", "m4"]
+        assert stats["dropped"] == 3
+
+    def test_evict_on_overflow(self):
+        """Проверить отключение клиента при переполнении (политика evict)."""
+        evicted = []
+
+        async def scenario():
+            ws = _FakeWebSocket(stall=True)
+            conn = ClientConnection(
+                "app", ws, max_queue=1, overflow=OVERFLOW_EVICT,
+                on_evict=lambda c, reason: evicted.append(reason),
+            )
+            conn.enqueue("a")
+            accepted = conn.enqueue("b")
+            await asyncio.sleep(0)
+            return accepted, conn.closed, ws.closed_code
+
+        accepted, closed, code = asyncio.run(scenario())
+
+        assert accepted is False
+        assert closed is True
+        assert code == 1013
+        assert evicted == ["send queue overflow"]
+
+    def test_stalled_send_evicts(self):
+        """Проверить отключение клиента при зависшей отправке."""
+        async def scenario():
+            ws = _FakeWebSocket(stall=True)
+            conn = ClientConnection("monitor", ws, send_timeout=0.05)
+            conn.start()
+            conn.enqueue("a")
+            await asyncio.sleep(0.2)
+            return conn.closed
+
+        assert asyncio.run(scenario()) is True
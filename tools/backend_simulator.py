@@ -35,6 +35,7 @@ EVENT_DESCRIPTIONS = {
     "device_info": "ℹ️ Информация об устройстве",
     "photo_ready": "📷 Фото готово",
     "restore_device_ack": "🔧 Устройство восстановлено",
+    "state_snapshot": "🔄 Снимок состояния",
 }
 
 
@@ -60,6 +61,7 @@ class BackendSimulator:
         self.events: List[dict] = []
         self.ws: Optional[websockets.WebSocketClientProtocol] = None
         self._running = False
+        self.last_seq: Optional[int] = None  # Номер последнего полученного события
 
     async def connect(self) -> bool:
         """
@@ -71,7 +73,11 @@ class BackendSimulator:
         try:
             print(f"[Simulator] Подключение к {self.uri}...")
             self.ws = await websockets.connect(self.uri)
-            await self.ws.send("app")
+            if self.last_seq is None:
+                await self.ws.send("app")
+            else:
+                # Переподключение: сервер дошлёт пропущенные события
+                await self.ws.send(json.dumps({"client": "app", "last_seq": self.last_seq}))
             print("[Simulator] Подключено, зарегистрирован как 'app'")
             return True
         except Exception as e:
@@ -117,6 +123,14 @@ class BackendSimulator:
             message = await asyncio.wait_for(self.ws.recv(), timeout=timeout)
             try:
                 event = json.loads(message)
+                seq = event.get("seq")
+                if seq is not None:
+                    # Снимок состояния сбрасывает нумерацию (например, после рестарта сервера)
+                    if event.get("event") != "state_snapshot" and \
+                            self.last_seq is not None and seq <= self.last_seq:
+                        # Дубликат после replay
+                        return None
+                    self.last_seq = seq
                 self.events.append(event)
                 return event
             except json.JSONDecodeError:
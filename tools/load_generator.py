@@ -0,0 +1,574 @@
+#!/usr/bin/env python3
+"""
+Load Generator - нагрузочный тест WebSocket сервера и state machine.
+
+Поднимает локально Application + WebSocket сервер с заглушкой ПЛК
+и подключает к нему симулированных клиентов:
+- "app"        — отправляет смесь команд (не чаще заданной частоты)
+- "vision"     — заглушка инференса (ответ "bottle"/"bank" и фото)
+- "monitor_N"  — получают broadcast (часть может «зависать»)
+
+Дополнительно заглушка ПЛК имитирует поток контейнеров (завеса 1→0),
+что прогоняет полный цикл WAITING_VISION → container_recognized.
+
+Результат (JSON): p50/p95/p99 round-trip по командам, задержка решения
+по контейнерам, задержка broadcast, пропускная способность, ошибки.
+
+Использование:
+    python -m tools.load_generator
+    python -m tools.load_generator --duration 30 --rate 20 --monitors 8 --slow-monitors 2
+    python -m tools.load_generator --mix get_device_info:5,get_photo:1,dump_container:1 -o report.json
+"""
+import argparse
+import asyncio
+import base64
+import json
+import random
+import tempfile
+import threading
+import time
+from collections import defaultdict, deque
+from typing import Optional
+
+import websockets
+from websockets.exceptions import ConnectionClosed
+
+from core.logging_config import get_logger
+from core.stats import percentiles
+
+logger = get_logger(__name__)
+
+# Команда app → событие, которое считается ответом
+COMMAND_RESPONSES = {
+    "get_device_info": ("get_device_info", "device_info"),
+    "get_photo": ("get_photo", "photo_ready"),
+    "dump_container": ("dump_container:plastic", "container_dumped"),
+    "container_unloaded": ("container_unloaded:plastic", "container_unloaded_ack"),
+}
+
+# Биты статусного регистра (см. plc/plc.py)
+BIT_VEIL = 0
+BIT_LEFT_SENSOR = 1
+BIT_CENTER_SENSOR = 2
+BIT_RIGHT_SENSOR = 3
+BIT_BANK_EXIST = 6
+BIT_BOTTLE_EXIST = 7
+
+
+class StubPLC:
+    """
+    Заглушка ПЛК с минимальной физикой автомата.
+
+    - cmd_force_move_carriage_* → через carriage_delay срабатывает датчик каретки
+    - cmd_radxa_detected_* → через carriage_delay приёмник освобождается
+    - insert_container() → завеса пересекается и освобождается, появляется контейнер
+    """
+
+    def __init__(self, carriage_delay: float = 0.2):
+        self._bits = defaultdict(int)
+        self._lock = threading.Lock()
+        self._carriage_delay = carriage_delay
+        self.bottle_count = 0
+        self.bank_count = 0
+
+    # === Статус ===
+
+    def _get(self, bit: int) -> int:
+        with self._lock:
+            return self._bits[bit]
+
+    def _set(self, bit: int, value: int) -> None:
+        with self._lock:
+            self._bits[bit] = value
+
+    def _set_later(self, bit: int, value: int, delay: float) -> None:
+        timer = threading.Timer(delay, self._set, args=(bit, value))
+        timer.daemon = True
+        timer.start()
+
+    def update_data(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def get_state_veil(self):
+        return self._get(BIT_VEIL)
+
+    def get_state_left_sensor_carriage(self):
+        return self._get(BIT_LEFT_SENSOR)
+
+    def get_state_center_sensor_carriage(self):
+        return self._get(BIT_CENTER_SENSOR)
+
+    def get_state_right_sensor_carriage(self):
+        return self._get(BIT_RIGHT_SENSOR)
+
+    def get_bank_exist(self):
+        return self._get(BIT_BANK_EXIST)
+
+    def get_bottle_exist(self):
+        return self._get(BIT_BOTTLE_EXIST)
+
+    def get_state_weight_error(self):
+        return 0
+
+    def get_weight_too_small(self):
+        return 0
+
+    def get_left_movement_error(self):
+        return 0
+
+    def get_right_movement_error(self):
+        return 0
+
+    def get_bottle_count(self):
+        return self.bottle_count
+
+    def get_bank_count(self):
+        return self.bank_count
+
+    def get_bottle_fill_percent(self):
+        return 0
+
+    def get_bank_fill_percent(self):
+        return 0
+
+    # === Команды ===
+
+    def cmd_force_move_carriage_left(self):
+        self._set_later(BIT_LEFT_SENSOR, 1, self._carriage_delay)
+
+    def cmd_force_move_carriage_right(self):
+        self._set_later(BIT_RIGHT_SENSOR, 1, self._carriage_delay)
+
+    def cmd_full_clear_register(self):
+        self._set(BIT_LEFT_SENSOR, 0)
+        self._set(BIT_RIGHT_SENSOR, 0)
+
+    def cmd_radxa_detected_bottle(self):
+        self.bottle_count += 1
+        self._set_later(BIT_BOTTLE_EXIST, 0, self._carriage_delay)
+
+    def cmd_radxa_detected_bank(self):
+        self.bank_count += 1
+        self._set_later(BIT_BANK_EXIST, 0, self._carriage_delay)
+
+    def cmd_radxa_stop_detected_bottle(self):
+        pass
+
+    def cmd_radxa_stop_detected_bank(self):
+        pass
+
+    def cmd_reset_bottle_counters(self):
+        self.bottle_count = 0
+
+    def cmd_reset_bank_counters(self):
+        self.bank_count = 0
+
+    def cmd_weight_error_reset(self):
+        pass
+
+    def cmd_reset_weight_reading(self):
+        pass
+
+    # === Симуляция ===
+
+    def insert_container(self, kind: str = "bottle", veil_time: float = 0.05) -> bool:
+        """
+        Вложить контейнер: завеса пересечена на veil_time, затем контейнер в приёмнике.
+
+        Returns:
+            False если приёмник ещё занят предыдущим контейнером.
+        """
+        if self.get_bottle_exist() or self.get_bank_exist() or self.get_state_veil():
+            return False
+        self._set(BIT_VEIL, 1)
+        time.sleep(veil_time)
+        self._set(BIT_BOTTLE_EXIST if kind == "bottle" else BIT_BANK_EXIST, 1)
+        self._set(BIT_VEIL, 0)
+        return True
+
+
+def parse_mix(text: str) -> dict:
+    """
+    Разобрать смесь команд "get_device_info:5,get_photo:1".
+
+    Returns:
+        Словарь {команда: вес}.
+    """
+    mix = {}
+    for item in text.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        name, _, weight = item.partition(":")
+        if name not in COMMAND_RESPONSES:
+            raise ValueError(f"Неизвестная команда в смеси: {name}")
+        mix[name] = float(weight) if weight else 1.0
+    return mix
+
+
+class LoadGenerator:
+    """
+    Нагрузочный прогон против локального Application.
+
+    Использование:
+        generator = LoadGenerator(port=8790, duration=10, rate=10)
+        report = generator.run()
+    """
+
+    def __init__(
+        self,
+        host: str = "localhost",
+        port: int = 8790,
+        duration: float = 10.0,
+        rate: float = 10.0,
+        mix: Optional[dict] = None,
+        container_rate: float = 1.0,
+        monitors: int = 4,
+        slow_monitors: int = 0,
+        broadcast_rate: float = 20.0,
+        vision_latency_ms: float = 30.0,
+        response_timeout: float = 3.0,
+        seed: int = 0,
+    ):
+        self.host = host
+        self.port = port
+        self.duration = duration
+        self.rate = rate
+        self.mix = mix or {"get_device_info": 5, "get_photo": 1, "dump_container": 1}
+        self.container_rate = container_rate
+        self.monitors = monitors
+        self.slow_monitors = slow_monitors
+        self.broadcast_rate = broadcast_rate
+        self.vision_latency_ms = vision_latency_ms
+        self.response_timeout = response_timeout
+        self._random = random.Random(seed)
+
+        self.uri = f"ws://{host}:{port}"
+        self.plc: Optional[StubPLC] = None
+        self.app = None
+
+        # Ожидаемый ответ на текущую команду app: (событие, future)
+        self._waiter: Optional[tuple] = None
+        self._latencies = defaultdict(list)
+        self._sent = defaultdict(int)
+        self._errors = defaultdict(int)
+        self._events = defaultdict(int)
+        self._containers_pending: deque = deque()
+        self._container_latencies = []
+        self._containers_inserted = 0
+        self._broadcast_latencies = []
+        self._broadcasts_sent = 0
+        self._vision_requests = 0
+        self._stop = False
+
+    def run(self) -> dict:
+        """Запустить Application, выполнить прогон и вернуть отчёт."""
+        # Импорт здесь: Application настраивает логирование при импорте
+        from plc.application import Application
+        from websocket import WebSocket
+
+        with tempfile.TemporaryDirectory(prefix="loadgen_photos_") as photos_dir:
+            self.plc = StubPLC()
+            self.app = Application(
+                serial_port=None, baudrate=0, slave_address=0,
+                web_socket_port=self.port, web_socket_host=self.host,
+                photos_dir=photos_dir,
+            )
+            self.app.PLC = self.plc
+            self.app.websocket_server = WebSocket(self.plc, self.host, self.port)
+            self.app.websocket_server.set_snapshot_provider("app", self.app.get_state_snapshot)
+            self.app.websocket_server.start()
+
+            app_thread = threading.Thread(target=self.app.run, name="Application", daemon=True)
+            app_thread.start()
+            try:
+                return asyncio.run(self._run_clients())
+            finally:
+                self.app.running = False
+                app_thread.join(timeout=2.0)
+                self.app.websocket_server.stop()
+
+    async def _connect(self, name: str, attempts: int = 50):
+        """Подключиться к серверу (с ожиданием его запуска)."""
+        for _ in range(attempts):
+            try:
+                ws = await websockets.connect(self.uri, max_size=None)
+                await ws.send(name)
+                return ws
+            except OSError:
+                await asyncio.sleep(0.1)
+        raise ConnectionError(f"Сервер {self.uri} недоступен")
+
+    async def _run_clients(self) -> dict:
+        vision = await self._connect("vision")
+        app = await self._connect("app")
+        monitors = [await self._connect(f"monitor_{i}") for i in range(self.monitors)]
+        slow = [await self._connect(f"slow_monitor_{i}") for i in range(self.slow_monitors)]
+        for ws in slow:
+            # «Зависший» клиент: не читает сокет
+            ws.transport.pause_reading()
+        await asyncio.sleep(0.2)
+
+        started = time.perf_counter()
+        tasks = [
+            asyncio.create_task(self._vision_stub(vision)),
+            asyncio.create_task(self._app_receiver(app)),
+            *[asyncio.create_task(self._monitor_receiver(ws)) for ws in monitors],
+        ]
+        producers = [
+            asyncio.create_task(self._app_sender(app)),
+            asyncio.create_task(self._container_feeder()),
+            asyncio.create_task(self._broadcaster()),
+        ]
+
+        await asyncio.sleep(self.duration)
+        self._stop = True
+        await asyncio.gather(*producers, return_exceptions=True)
+        # Даём дойти последним ответам
+        await asyncio.sleep(min(self.response_timeout, 1.0))
+        elapsed = time.perf_counter() - started
+
+        client_stats = self.app.websocket_server.get_client_stats()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for ws in [vision, app, *monitors, *slow]:
+            try:
+                await asyncio.wait_for(ws.close(), timeout=0.5)
+            except Exception:
+                pass
+
+        return self._report(elapsed, client_stats)
+
+    # === Клиенты ===
+
+    async def _vision_stub(self, ws) -> None:
+        """Заглушка vision: отвечает на запросы инференса и фото."""
+        photo = base64.b64encode(b"\xff\xd8" + b"\x00" * 2048 + b"\xff\xd9").decode()
+        try:
+            while True:
+                message = await ws.recv()
+                if message.startswith("{"):
+                    request = json.loads(message)
+                    command = request.get("command")
+                    if command == "get_photo":
+                        response = json.dumps({"photo_base64": photo})
+                    elif command == "classify":
+                        result = "bank" if request.get("hint") == "bank" else "bottle"
+                        response = json.dumps({"id": request.get("id"), "result": result, "confidence": 1.0})
+                    else:
+                        continue  # broadcast и прочее
+                elif message == "bottle_exist":
+                    response = "bottle"
+                elif message == "bank_exist":
+                    response = "bank"
+                else:
+                    continue
+                self._vision_requests += 1
+                if self.vision_latency_ms > 0:
+                    await asyncio.sleep(self.vision_latency_ms / 1000)
+                await ws.send(response)
+        except (ConnectionClosed, asyncio.CancelledError):
+            pass
+
+    async def _app_sender(self, ws) -> None:
+        """
+        Отправка команд app с частотой не выше rate.
+
+        Application обрабатывает команды app по одной (однослотовый буфер),
+        поэтому следующая команда уходит после ответа или таймаута —
+        так round-trip измеряется без путаницы между запросами.
+        """
+        names = list(self.mix)
+        weights = [self.mix[n] for n in names]
+        interval = 1.0 / self.rate if self.rate > 0 else None
+        loop = asyncio.get_running_loop()
+        next_send = time.perf_counter()
+        while not self._stop and interval:
+            name = self._random.choices(names, weights)[0]
+            message, response_event = COMMAND_RESPONSES[name]
+            future = loop.create_future()
+            self._waiter = (response_event, future)
+            self._sent[name] += 1
+            sent_at = time.perf_counter()
+            try:
+                await ws.send(message)
+                received_at = await asyncio.wait_for(future, timeout=self.response_timeout)
+                self._latencies[name].append((received_at - sent_at) * 1000)
+            except asyncio.TimeoutError:
+                self._errors[f"{name}_timeout"] += 1
+            except ConnectionClosed:
+                self._errors["connection_closed"] += 1
+                return
+            finally:
+                self._waiter = None
+            next_send = max(next_send + interval, time.perf_counter())
+            await asyncio.sleep(max(0.0, next_send - time.perf_counter()))
+
+    async def _app_receiver(self, ws) -> None:
+        """Приём событий app и сопоставление с запросами."""
+        try:
+            while True:
+                message = await ws.recv()
+                received = time.perf_counter()
+                try:
+                    event = json.loads(message).get("event", "")
+                except (json.JSONDecodeError, AttributeError):
+                    continue
+                if event == "heartbeat":
+                    continue
+                self._events[event] += 1
+
+                if self._waiter and self._waiter[0] == event and not self._waiter[1].done():
+                    self._waiter[1].set_result(received)
+
+                if event in ("container_recognized", "container_not_recognized") and self._containers_pending:
+                    inserted_at = self._containers_pending.popleft()
+                    if event == "container_recognized":
+                        self._container_latencies.append((received - inserted_at) * 1000)
+                    else:
+                        self._errors["container_not_recognized"] += 1
+        except (ConnectionClosed, asyncio.CancelledError):
+            pass
+
+    async def _container_feeder(self) -> None:
+        """Имитация потока контейнеров через заглушку ПЛК."""
+        if self.container_rate <= 0:
+            return
+        interval = 1.0 / self.container_rate
+        while not self._stop:
+            kind = self._random.choice(("bottle", "bank"))
+            inserted = await asyncio.to_thread(self.plc.insert_container, kind)
+            if inserted:
+                self._containers_inserted += 1
+                self._containers_pending.append(time.perf_counter())
+            await asyncio.sleep(interval)
+
+    async def _broadcaster(self) -> None:
+        """Периодический broadcast для оценки задержки доставки мониторам."""
+        if self.broadcast_rate <= 0 or not (self.monitors or self.slow_monitors):
+            return
+        interval = 1.0 / self.broadcast_rate
+        while not self._stop:
+            self.app.websocket_server.broadcast(json.dumps({
+                "event": "heartbeat",
+                "sent": time.perf_counter(),
+            }))
+            self._broadcasts_sent += 1
+            await asyncio.sleep(interval)
+
+    async def _monitor_receiver(self, ws) -> None:
+        """Мониторинговый клиент: измеряет задержку broadcast."""
+        try:
+            while True:
+                message = await ws.recv()
+                received = time.perf_counter()
+                try:
+                    data = json.loads(message)
+                except json.JSONDecodeError:
+                    continue
+                if data.get("event") == "heartbeat":
+                    self._broadcast_latencies.append((received - data["sent"]) * 1000)
+        except (ConnectionClosed, asyncio.CancelledError):
+            pass
+
+    # === Отчёт ===
+
+    def _report(self, elapsed: float, client_stats: dict) -> dict:
+        commands = {}
+        for name in self.mix:
+            commands[name] = {
+                "sent": self._sent[name],
+                "errors": self._errors.get(f"{name}_timeout", 0),
+                "latency": percentiles(self._latencies[name]),
+            }
+
+        total_answered = sum(len(v) for v in self._latencies.values())
+        return {
+            "config": {
+                "duration_s": self.duration,
+                "max_rate_per_s": self.rate,
+                "mix": self.mix,
+                "container_rate_per_s": self.container_rate,
+                "monitors": self.monitors,
+                "slow_monitors": self.slow_monitors,
+                "broadcast_rate_per_s": self.broadcast_rate,
+                "vision_latency_ms": self.vision_latency_ms,
+            },
+            "elapsed_s": round(elapsed, 3),
+            "throughput": {
+                "commands_sent_per_s": round(sum(self._sent.values()) / elapsed, 2),
+                "responses_per_s": round(total_answered / elapsed, 2),
+                "events_per_s": round(sum(self._events.values()) / elapsed, 2),
+            },
+            "commands": commands,
+            "containers": {
+                "inserted": self._containers_inserted,
+                "vision_requests": self._vision_requests,
+                "not_recognized": self._errors.get("container_not_recognized", 0),
+                "unanswered": len(self._containers_pending),
+                "decision_latency": percentiles(self._container_latencies),
+            },
+            "broadcast": {
+                "sent": self._broadcasts_sent,
+                "latency": percentiles(self._broadcast_latencies),
+            },
+            "errors": dict(self._errors),
+            "events": dict(self._events),
+            "server_queues": client_stats,
+        }
+
+
+def parse_args():
+    """Парсинг аргументов командной строки."""
+    parser = argparse.ArgumentParser(
+        description="Нагрузочный тест WebSocket сервера и state machine (заглушки ПЛК и vision)"
+    )
+    parser.add_argument("--host", type=str, default="localhost", help="Хост сервера (по умолчанию: localhost)")
+    parser.add_argument("--port", type=int, default=8790, help="Порт сервера (по умолчанию: 8790)")
+    parser.add_argument("--duration", type=float, default=10.0, help="Длительность прогона, сек")
+    parser.add_argument("--rate", type=float, default=10.0, help="Максимум команд app в секунду")
+    parser.add_argument("--mix", type=str, default="get_device_info:5,get_photo:1,dump_container:1",
+                        help="Смесь команд с весами")
+    parser.add_argument("--container-rate", type=float, default=1.0, help="Контейнеров в секунду (0 - выкл)")
+    parser.add_argument("--monitors", type=int, default=4, help="Количество мониторинговых клиентов")
+    parser.add_argument("--slow-monitors", type=int, default=0, help="Количество «зависших» клиентов")
+    parser.add_argument("--broadcast-rate", type=float, default=20.0, help="Broadcast сообщений в секунду")
+    parser.add_argument("--vision-latency-ms", type=float, default=30.0, help="Задержка заглушки vision, мс")
+    parser.add_argument("--timeout", type=float, default=3.0, help="Таймаут ответа на команду, сек")
+    parser.add_argument("--seed", type=int, default=0, help="Seed генератора смеси команд")
+    parser.add_argument("-o", "--output", type=str, help="Файл для JSON отчёта (по умолчанию stdout)")
+    return parser.parse_args()
+
+
+def main():
+    """Точка входа."""
+    args = parse_args()
+    generator = LoadGenerator(
+        host=args.host,
+        port=args.port,
+        duration=args.duration,
+        rate=args.rate,
+        mix=parse_mix(args.mix),
+        container_rate=args.container_rate,
+        monitors=args.monitors,
+        slow_monitors=args.slow_monitors,
+        broadcast_rate=args.broadcast_rate,
+        vision_latency_ms=args.vision_latency_ms,
+        response_timeout=args.timeout,
+        seed=args.seed,
+    )
+    report = json.dumps(generator.run(), indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(report)
+        logger.info("Отчёт сохранён: %s", args.output)
+    else:
+        print(report)
+
+
+if __name__ == "__main__":
+    main()
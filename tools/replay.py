@@ -0,0 +1,556 @@
+#!/usr/bin/env python3
+"""
+Replay - воспроизведение записанной работы автомата через Application.
+
+Берёт файлы бортового самописца app (см. core/flight_recorder.py) и
+прогоняет через настоящий Application.run():
+- снимки ПЛК подаются в регистры заглушки ПЛК в записанные моменты
+- команды app подаются в записанные моменты
+- ответы vision подаются на новые запросы с записанной задержкой
+  (запрос → ответ), id ответа подменяется на id нового запроса
+
+Таймауты считаются по виртуальным часам (core/clock.py): sleep() сдвигает
+время мгновенно, а в IDLE без активных таймеров время сразу переносится
+к следующей записи. Поэтому прогон идёт быстрее реального времени и
+детерминированно: один и тот же файл даёт один и тот же отчёт.
+
+Результат (JSON): события app, переходы состояний, решения по контейнерам
+с задержкой (вход в WAITING_VISION → решение), счётчики событий,
+сравнение переходов с записанными и ускорение относительно реального времени.
+
+Использование:
+    python -m tools.replay flight_records/app_20251111_104852_vision_timeout.jsonl
+    python -m tools.replay flight_records/app_*.jsonl -o report.json
+    python -m tools.replay flight_records/app_*.jsonl --baseline report.json
+"""
+import argparse
+import heapq
+import json
+import logging
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter, deque
+from pathlib import Path
+from typing import Optional
+
+from core.clock import VirtualClock
+from core.flight_recorder import KIND_PLC, KIND_STATE, KIND_WS_IN, KIND_WS_OUT, FlightRecorder, load_dump
+from core.logging_config import get_logger, setup_logging
+from core.stats import percentiles
+from core.vision_protocol import CLASSIFY_COMMAND, PROTOCOL_JSON, parse_reply
+from plc.application import Application, AppState
+from plc.modbus_register import ModbusRegister
+from plc.plc import PLC
+
+logger = get_logger(__name__)
+
+# Запросы классификации строкового протокола
+STRING_REQUESTS = ("bottle_exist", "bank_exist")
+
+# События app, которыми заканчивается ожидание vision
+DECISION_EVENTS = ("container_recognized", "container_not_recognized")
+
+
+class _MemorySlave:
+    """Modbus slave в памяти: holding регистры без устройства."""
+
+    def __init__(self):
+        self._values: dict[int, int] = {}
+
+    def set_values(self, block: str, address: int, value: int) -> None:
+        self._values[address] = value
+
+    def get_values(self, block: str, address: int, size: int = 1) -> tuple:
+        return tuple(self._values.get(address + i, 0) for i in range(size))
+
+
+class TracePLC(PLC):
+    """
+    ПЛК, регистры которого заполняются из записанных снимков.
+
+    Методы get_*/cmd_* унаследованы от PLC, поэтому Application видит
+    те же биты статуса, что и в работе. Регистр команд (cmd) не
+    перезаписывается снимками: его меняет сам Application.
+    """
+
+    def __init__(self, cmd_register: int = 25, status_register: int = 26, speed: int = 500):
+        self.cmd_register = cmd_register
+        self.status_register = status_register
+        self.slave = _MemorySlave()
+
+        self.modbus_register_cmd = ModbusRegister(self.slave, self.cmd_register)
+        self.modbus_register_status = ModbusRegister(self.slave, self.status_register)
+        self.modbus_register_speed = ModbusRegister(self.slave, 24)
+        self.modbus_register_bank_counter = ModbusRegister(self.slave, 20)
+        self.modbus_register_bottle_counter = ModbusRegister(self.slave, 21)
+        self.modbus_register_bottle_percent = ModbusRegister(self.slave, 22)
+        self.modbus_register_bank_percent = ModbusRegister(self.slave, 23)
+        self.modbus_register_speed.set_value(speed)
+
+        self._modbus_lock = threading.Lock()
+
+        # Поля снимка (PLC.snapshot), которые приходят с устройства
+        self._inputs = {
+            "status": self.modbus_register_status,
+            "bank_counter": self.modbus_register_bank_counter,
+            "bottle_counter": self.modbus_register_bottle_counter,
+            "bottle_percent": self.modbus_register_bottle_percent,
+            "bank_percent": self.modbus_register_bank_percent,
+        }
+
+    def stop(self):
+        pass
+
+    def update_data(self):
+        """Данные подаются через apply(), синхронизировать нечего."""
+
+    def apply(self, snapshot: dict) -> None:
+        """
+        Записать снимок ПЛК в регистры.
+
+        Args:
+            snapshot: Снимок из самописца (PLC.snapshot()).
+        """
+        with self._modbus_lock:
+            for key, register in self._inputs.items():
+                if key in snapshot:
+                    register.set_value(snapshot[key])
+
+
+class TraceWebSocket:
+    """
+    Заглушка WebSocket сервера с тем же однослотовым буфером команд.
+
+    Исходящие сообщения сохраняются с виртуальным временем, запросы
+    к vision передаются харнессу для подачи записанного ответа.
+    """
+
+    def __init__(self, harness: "ReplayHarness"):
+        self._harness = harness
+        self.clients = {"app": None, "vision": None}
+        self.client_messages: dict[str, str] = {}
+        self.sent: list[tuple[float, str, str]] = []
+
+    def deliver(self, client_name: str, message: str) -> None:
+        """Положить входящее сообщение клиента (перезаписывает непрочитанное)."""
+        self.client_messages[client_name] = message
+
+    def get_command(self, client_name: str) -> str:
+        return self.client_messages.pop(client_name, "")
+
+    def send_to_client(self, client_name: str, message: str) -> bool:
+        self.sent.append((self._harness.clock.now(), client_name, message))
+        if client_name == "vision":
+            self._harness.on_vision_request(message)
+        return True
+
+    def broadcast(self, message: str) -> None:
+        self.sent.append((self._harness.clock.now(), "*", message))
+
+    def set_snapshot_provider(self, client_name, provider):
+        pass
+
+    def set_flight_recorder(self, recorder):
+        pass
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+
+class _ReplayRecorder(FlightRecorder):
+    """Самописец воспроизведения: переходы сохраняются, файлы не пишутся."""
+
+    def __init__(self, capacity: int, clock: VirtualClock):
+        super().__init__("replay", capacity=capacity, clock=clock)
+        self.dump_reasons: list[str] = []
+
+    def dump_async(self, reason: str, seconds: Optional[float] = None, force: bool = False) -> Optional[Path]:
+        self.dump_reasons.append(reason)
+        return None
+
+
+def _is_classify_request(message: str) -> bool:
+    """Запрос классификации (JSON classify или строковый bottle_exist/bank_exist)."""
+    if message in STRING_REQUESTS:
+        return True
+    if message.startswith("{"):
+        try:
+            return json.loads(message).get("command") == CLASSIFY_COMMAND
+        except (json.JSONDecodeError, AttributeError):
+            return False
+    return False
+
+
+def _request_id(message: str) -> Optional[str]:
+    """id JSON запроса классификации (None для строкового протокола)."""
+    if not message.startswith("{"):
+        return None
+    request_id = json.loads(message).get("id")
+    return str(request_id) if request_id is not None else None
+
+
+def load_trace(paths: list[Path]) -> list[dict]:
+    """
+    Прочитать файлы самописца app в одну хронологию.
+
+    Пересекающиеся сбросы склеиваются без повторов, файлы других
+    процессов (vision) пропускаются.
+
+    Args:
+        paths: JSONL файлы самописца.
+
+    Returns:
+        Записи {"t", "kind", "data"} по возрастанию t.
+    """
+    seen = set()
+    entries = []
+    for path in paths:
+        header, items = load_dump(path)
+        if header.get("process", "app") != "app":
+            logger.warning(f"{path}: самописец процесса {header.get('process')} пропущен")
+            continue
+        for entry in items:
+            key = (entry["t"], entry["kind"], json.dumps(entry["data"], sort_keys=True))
+            if key not in seen:
+                seen.add(key)
+                entries.append(entry)
+    entries.sort(key=lambda entry: entry["t"])
+    return entries
+
+
+def plan_vision_replies(entries: list[dict]) -> tuple[list[Optional[tuple[float, str]]], list[tuple[float, str]]]:
+    """
+    Сопоставить записанные запросы классификации с ответами vision.
+
+    JSON ответы сопоставляются по id, строковые - с последним
+    неотвеченным строковым запросом.
+
+    Args:
+        entries: Хронология самописца app.
+
+    Returns:
+        Кортеж (план, прочие): план - по элементу на каждый записанный
+        запрос: (задержка в секундах, ответ) или None, если ответа не было;
+        прочие - сообщения vision, не являющиеся ответами на классификацию
+        (например, фото), с записанным временем.
+    """
+    requests: list[list] = []          # [t, id, ответ]
+    by_id: dict[str, list] = {}
+    unanswered_strings: deque = deque()
+    other: list[tuple[float, str]] = []
+
+    for entry in entries:
+        data = entry["data"] or {}
+        if data.get("client") != "vision":
+            continue
+        message = data.get("message") or ""
+        if entry["kind"] == KIND_WS_OUT and _is_classify_request(message):
+            request = [entry["t"], _request_id(message), None]
+            requests.append(request)
+            if request[1] is None:
+                unanswered_strings.append(request)
+            else:
+                by_id[request[1]] = request
+        elif entry["kind"] == KIND_WS_IN:
+            reply = parse_reply(message)
+            if reply is None:
+                other.append((entry["t"], message))
+                continue
+            if reply.id is not None:
+                request = by_id.pop(reply.id, None)
+            else:
+                request = unanswered_strings.popleft() if unanswered_strings else None
+            if request is not None and request[2] is None:
+                request[2] = (entry["t"] - request[0], message)
+
+    return [request[2] for request in requests], other
+
+
+class _ReplayClock(VirtualClock):
+    """Виртуальные часы, у которых длину sleep() выбирает харнесс."""
+
+    def __init__(self, start: float, harness: "ReplayHarness"):
+        super().__init__(start)
+        self._harness = harness
+
+    def sleep(self, seconds: float) -> None:
+        self.advance(self._harness.sleep_span(seconds))
+
+
+class ReplayHarness:
+    """
+    Прогон записанной хронологии через Application на виртуальных часах.
+
+    Использование:
+        harness = ReplayHarness(load_trace([Path("flight_records/app_...jsonl")]))
+        report = harness.run()
+    """
+
+    def __init__(
+        self,
+        entries: list[dict],
+        vision_protocol: str = PROTOCOL_JSON,
+        tail: float = 5.0,
+        max_skip: float = 1.0,
+    ):
+        """
+        Args:
+            entries: Хронология самописца app (load_trace).
+            vision_protocol: Протокол запросов к vision в воспроизведении.
+            tail: Сколько секунд прогонять после последней записи (таймауты).
+            max_skip: Максимальный сдвиг времени за один sleep() в IDLE.
+        """
+        if not entries:
+            raise ValueError("Пустая хронология: нечего воспроизводить")
+        self.entries = entries
+        self.vision_protocol = vision_protocol
+        self.tail = tail
+        self.max_skip = max_skip
+
+        self.start = entries[0]["t"]
+        self.end = entries[-1]["t"] + tail
+        self.clock = _ReplayClock(self.start, self)
+        self.app: Optional[Application] = None
+        self.plc: Optional[TracePLC] = None
+        self.websocket: Optional[TraceWebSocket] = None
+        self.recorder: Optional[_ReplayRecorder] = None
+
+        # Входы: (t, порядковый номер, клиент или None для ПЛК, данные)
+        self._inputs: list[tuple] = []
+        self._seq = 0
+        self._vision_plan: deque = deque()
+        self.unmatched_requests = 0
+
+    # === Подача записанных входов ===
+
+    def _push(self, t: float, client: Optional[str], data) -> None:
+        heapq.heappush(self._inputs, (t, self._seq, client, data))
+        self._seq += 1
+
+    def _schedule(self) -> None:
+        """Разложить хронологию на входы Application."""
+        plan, other = plan_vision_replies(self.entries)
+        self._vision_plan = deque(plan)
+        for t, message in other:
+            self._push(t, "vision", message)
+
+        last_snapshot = None
+        for entry in self.entries:
+            data = entry["data"]
+            if entry["kind"] == KIND_PLC and data != last_snapshot:
+                # Повторяющиеся снимки ничего не меняют
+                self._push(entry["t"], None, data)
+                last_snapshot = data
+            elif entry["kind"] == KIND_WS_IN and data.get("client") == "app":
+                self._push(entry["t"], "app", data.get("message") or "")
+
+    def on_vision_request(self, message: str) -> None:
+        """Новый запрос классификации → записанный ответ с записанной задержкой."""
+        if not _is_classify_request(message):
+            return
+        if not self._vision_plan:
+            self.unmatched_requests += 1
+            return
+        planned = self._vision_plan.popleft()
+        if planned is None:
+            return  # vision не ответил: повторяем таймаут
+        latency, recorded = planned
+        reply = parse_reply(recorded)
+        request_id = _request_id(message)
+        if request_id is not None:
+            reply.id = request_id
+            text = reply.to_json()
+        else:
+            text = reply.result
+        self._push(self.clock.now() + latency, "vision", text)
+
+    def _on_tick(self, now: float) -> None:
+        """Слушатель часов: подать наступившие входы, остановить прогон в конце."""
+        while self._inputs and self._inputs[0][0] <= now:
+            _, _, client, data = heapq.heappop(self._inputs)
+            if client is None:
+                self.plc.apply(data)
+            else:
+                self.websocket.deliver(client, data)
+        if now >= self.end:
+            self.app.running = False
+
+    def _idle(self) -> bool:
+        """Нет ожиданий и таймеров: до следующего входа Application ничего не сделает."""
+        app = self.app
+        return (
+            app.state == AppState.IDLE
+            and not app.carriage_moving_bottle
+            and not app.carriage_moving_bank
+            and not self.websocket.client_messages
+        )
+
+    def sleep_span(self, seconds: float) -> float:
+        """Длина sleep() Application: в IDLE время переносится к следующему входу."""
+        if self._idle():
+            next_t = self._inputs[0][0] if self._inputs else self.end
+            seconds = max(seconds, min(next_t - self.clock.now(), self.max_skip))
+        return seconds
+
+    # === Прогон ===
+
+    def run(self) -> dict:
+        """Воспроизвести хронологию и вернуть отчёт."""
+        self._schedule()
+        self.recorder = _ReplayRecorder(capacity=len(self.entries) * 4 + 1024, clock=self.clock)
+
+        with tempfile.TemporaryDirectory(prefix="replay_photos_") as photos_dir:
+            self.app = Application(
+                serial_port=None, baudrate=0, slave_address=0,
+                photos_dir=photos_dir, vision_protocol=self.vision_protocol,
+                flight_recorder=self.recorder, clock=self.clock,
+            )
+            self.plc = TracePLC()
+            self.websocket = TraceWebSocket(self)
+            self.app.PLC = self.plc
+            self.app.websocket_server = self.websocket
+            self.clock.add_listener(self._on_tick)
+
+            # Начальное состояние ПЛК - входы в момент начала записи
+            self._on_tick(self.start)
+            started = time.perf_counter()
+            self.app.run()
+            wall = time.perf_counter() - started
+
+        return self._report(wall)
+
+    # === Отчёт ===
+
+    def _relative(self, t: float) -> float:
+        return round(t - self.start, 6)
+
+    def _report(self, wall: float) -> dict:
+        events = []
+        for t, client, message in self.websocket.sent:
+            if client != "app":
+                continue
+            event = json.loads(message)
+            events.append({"t": self._relative(t), "event": event["event"], "data": event["data"]})
+
+        transitions = [
+            {"t": self._relative(t), "from": data["from"], "to": data["to"]}
+            for t, kind, data in self.recorder.entries()
+            if kind == KIND_STATE and data["from"] is not None
+        ]
+        recorded = [
+            (entry["data"]["from"], entry["data"]["to"])
+            for entry in self.entries
+            if entry["kind"] == KIND_STATE
+        ]
+
+        decisions = self._decisions(transitions, events)
+        virtual = self.clock.now() - self.start
+        return {
+            "entries": len(self.entries),
+            "virtual_s": round(virtual, 3),
+            "wall_s": round(wall, 3),
+            "speedup": round(virtual / wall, 1) if wall > 0 else None,
+            "events": events,
+            "transitions": transitions,
+            "decisions": decisions,
+            "decision_latency": percentiles([d["latency_ms"] for d in decisions]),
+            "event_counts": dict(Counter(event["event"] for event in events)),
+            "recorded_transitions": len(recorded),
+            "transitions_match": recorded == [(tr["from"], tr["to"]) for tr in transitions],
+            "unmatched_vision_requests": self.unmatched_requests,
+            "flight_recorder_dumps": list(self.recorder.dump_reasons),
+        }
+
+    @staticmethod
+    def _decisions(transitions: list[dict], events: list[dict]) -> list[dict]:
+        """Решения по контейнерам: выход из WAITING_VISION и событие решения."""
+        decisions = []
+        entered = None
+        for transition in transitions:
+            if transition["to"] == AppState.WAITING_VISION.value:
+                entered = transition["t"]
+            elif transition["from"] == AppState.WAITING_VISION.value and entered is not None:
+                outcome = next(
+                    (event for event in events
+                     if entered <= event["t"] <= transition["t"] and event["event"] in DECISION_EVENTS),
+                    None,
+                )
+                decisions.append({
+                    "t": entered,
+                    "latency_ms": round((transition["t"] - entered) * 1000, 3),
+                    "outcome": outcome["event"] if outcome else None,
+                    "data": outcome["data"] if outcome else {},
+                })
+                entered = None
+        return decisions
+
+
+def compare_reports(report: dict, baseline: dict) -> list[str]:
+    """
+    Сравнить события и переходы двух отчётов.
+
+    Args:
+        report: Отчёт текущего прогона.
+        baseline: Эталонный отчёт.
+
+    Returns:
+        Список расхождений (пустой, если поведение совпало).
+    """
+    differences = []
+    for key in ("transitions", "events"):
+        current, expected = report.get(key, []), baseline.get(key, [])
+        for index, (got, want) in enumerate(zip(current, expected)):
+            if got != want:
+                differences.append(f"{key}[{index}]: {json.dumps(got, ensure_ascii=False)} "
+                                   f"(эталон {json.dumps(want, ensure_ascii=False)})")
+                break
+        if len(current) != len(expected):
+            differences.append(f"{key}: {len(current)} записей (эталон {len(expected)})")
+    return differences
+
+
+def parse_args():
+    """Парсинг аргументов командной строки."""
+    parser = argparse.ArgumentParser(
+        description="Воспроизведение записей самописца app через Application на виртуальных часах"
+    )
+    parser.add_argument("files", type=Path, nargs="+", help="JSONL файлы самописца app")
+    parser.add_argument("--protocol", choices=("json", "string"), default=PROTOCOL_JSON,
+                        help="Протокол запросов к vision (по умолчанию: json)")
+    parser.add_argument("--tail", type=float, default=5.0, help="Прогон после последней записи, сек")
+    parser.add_argument("--baseline", type=Path, help="Эталонный отчёт: расхождения → код выхода 1")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Логи Application (по умолчанию только WARNING)")
+    parser.add_argument("-o", "--output", type=str, help="Файл для JSON отчёта (по умолчанию stdout)")
+    return parser.parse_args()
+
+
+def main():
+    """Точка входа."""
+    args = parse_args()
+    setup_logging(None if args.verbose else logging.WARNING, async_mode=False)
+
+    harness = ReplayHarness(load_trace(args.files), vision_protocol=args.protocol, tail=args.tail)
+    report = harness.run()
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+        logger.warning(f"Отчёт сохранён: {args.output}")
+    else:
+        print(text)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            differences = compare_reports(report, json.load(f))
+        for line in differences:
+            print(f"РАСХОЖДЕНИЕ {line}", file=sys.stderr)
+        sys.exit(1 if differences else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+"""
+CameraDiscovery - поиск камеры с персистентным кэшем.
+
+Обеспечивает:
+- Ключ устройства по /dev/v4l/by-id (серийный номер) или by-path
+- Кэш рабочего индекса, fourcc, разрешения и fps в JSON файле
+- Быстрое открытие по кэшу (одна попытка) и полный перебор только при промахе
+- Замер времени холодного и тёплого старта
+"""
+import json
+import re
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+from core.config import Settings
+from core.logging_config import get_logger
+from vision.camera_manager import CameraManager
+
+logger = get_logger(__name__)
+
+# Каталоги udev со стабильными именами камер (в порядке предпочтения)
+V4L_DIRS = ("/dev/v4l/by-id", "/dev/v4l/by-path")
+
+
+def device_key(index: int, v4l_dirs: tuple = V4L_DIRS) -> str:
+    """
+    Получить стабильный ключ устройства для индекса камеры.
+
+    Args:
+        index: Индекс камеры (/dev/videoN).
+        v4l_dirs: Каталоги со стабильными ссылками на устройства.
+
+    Returns:
+        Путь ссылки by-id/by-path или "/dev/videoN", если ссылок нет.
+    """
+    for base in v4l_dirs:
+        directory = Path(base)
+        if not directory.is_dir():
+            continue
+        for link in sorted(directory.iterdir()):
+            try:
+                if link.resolve().name == f"video{index}":
+                    return str(link)
+            except OSError:
+                continue
+    return f"/dev/video{index}"
+
+
+def resolve_index(key: str) -> Optional[int]:
+    """
+    Получить текущий индекс камеры по ключу устройства.
+
+    Индекс USB камеры может измениться после переподключения, а ссылка
+    by-id остаётся прежней.
+
+    Args:
+        key: Ключ устройства (см. device_key).
+
+    Returns:
+        Индекс или None, если устройство не найдено.
+    """
+    try:
+        target = Path(key).resolve(strict=True)
+    except (OSError, RuntimeError):
+        return None
+    match = re.fullmatch(r"video(\d+)", target.name)
+    return int(match.group(1)) if match else None
+
+
+@dataclass
+class DiscoveryResult:
+    """Результат поиска камеры."""
+
+    key: str
+    mode: dict
+    warm: bool
+    elapsed_ms: float
+
+
+class CameraDiscovery:
+    """
+    Открытие камеры через кэш найденных устройств.
+
+    Использование:
+        discovery = CameraDiscovery(settings)
+        result = discovery.open_camera(camera_manager)
+        if result:
+            print(result.warm, result.elapsed_ms)
+    """
+
+    def __init__(self, settings: Settings, cache_path: Optional[Path] = None):
+        """
+        Инициализация.
+
+        Args:
+            settings: Настройки приложения.
+            cache_path: Путь к JSON кэшу. Если None, берётся из настроек.
+        """
+        self._settings = settings
+        self._cache_path = Path(cache_path or settings.camera_cache_path)
+        self._cache = self._load()
+
+    def open_camera(self, camera: CameraManager) -> Optional[DiscoveryResult]:
+        """
+        Открыть камеру: сначала по кэшу, при промахе - полным перебором.
+
+        Args:
+            camera: Менеджер камеры (закрытый).
+
+        Returns:
+            DiscoveryResult или None, если камера не найдена.
+        """
+        start = time.perf_counter()
+
+        result = self._open_cached(camera, start)
+        if result is None:
+            result = self._open_scan(camera, start)
+        if result is None:
+            return None
+
+        timings = self._cache.setdefault("timings", {})
+        timings["warm_ms" if result.warm else "cold_ms"] = round(result.elapsed_ms, 1)
+        self._cache["last_key"] = result.key
+        self._cache.setdefault("cameras", {})[result.key] = {
+            **result.mode,
+            "requested": self._requested_mode(),
+            "validated_at": time.time(),
+        }
+        self._save()
+
+        logger.info(
+            "Камера %s (индекс %s) открыта за %.0f мс (%s старт; последние: cold=%s мс, warm=%s мс)",
+            result.key, result.mode['index'], result.elapsed_ms, "warm" if result.warm else "cold",
+            timings.get("cold_ms"), timings.get("warm_ms"),
+        )
+        return result
+
+    def invalidate(self) -> None:
+        """Сбросить кэш (следующее открытие выполнит полный перебор)."""
+        self._cache.pop("last_key", None)
+        self._cache["cameras"] = {}
+        self._save()
+
+    def _open_cached(self, camera: CameraManager, start: float) -> Optional[DiscoveryResult]:
+        """Одна быстрая попытка открыть камеру из кэша с проверкой режима."""
+        key = self._cache.get("last_key")
+        entry = self._cache.get("cameras", {}).get(key) if key else None
+        if not entry or entry.get("requested") != self._requested_mode():
+            return None
+
+        index = resolve_index(key) if key.startswith("/dev/v4l/") else None
+        if index is None:
+            index = entry["index"]
+
+        if not camera.open(camera_index=index, fast=True):
+            logger.info("Кэш камеры устарел (%s, индекс %s), полный перебор", key, index)
+            return None
+
+        mode = camera.mode
+        if (mode["width"], mode["height"]) != (entry["width"], entry["height"]):
+            logger.info("Режим камеры изменился: %sx%s вместо %sx%s, полный перебор",
+                        mode['width'], mode['height'], entry['width'], entry['height'])
+            camera.close()
+            return None
+
+        return DiscoveryResult(key, mode, True, (time.perf_counter() - start) * 1000)
+
+    def _open_scan(self, camera: CameraManager, start: float) -> Optional[DiscoveryResult]:
+        """Полный перебор индексов камер."""
+        for index in range(self._settings.camera_scan_max):
+            logger.debug("Попытка открыть камеру с индексом %s...", index)
+            if camera.open(camera_index=index):
+                return DiscoveryResult(device_key(index), camera.mode, False,
+                                       (time.perf_counter() - start) * 1000)
+            # Сбрасываем состояние камеры перед следующей попыткой
+            camera.close()
+
+        logger.error(f"Не удалось открыть камеру ни с одним индексом (0-{self._settings.camera_scan_max - 1})")
+        return None
+
+    def _requested_mode(self) -> dict:
+        """Запрошенный в настройках режим: при его изменении кэш не используется."""
+        return {
+            "fourcc": self._settings.camera_fourcc,
+            "width": self._settings.camera_width,
+            "height": self._settings.camera_height,
+            "fps": self._settings.camera_fps,
+        }
+
+    def _load(self) -> dict:
+        """Загрузить кэш с диска (пустой при отсутствии или ошибке)."""
+        try:
+            with open(self._cache_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.warning(f"Не удалось прочитать кэш камер {self._cache_path}: {e}")
+            return {}
+
+    def _save(self) -> None:
+        """Сохранить кэш атомарно (через временный файл)."""
+        try:
+            self._cache_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self._cache_path.with_suffix(self._cache_path.suffix + ".tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self._cache, f, ensure_ascii=False, indent=2)
+            tmp_path.replace(self._cache_path)
+        except OSError as e:
+            logger.warning(f"Не удалось сохранить кэш камер {self._cache_path}: {e}")
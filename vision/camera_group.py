@@ -0,0 +1,181 @@
+"""
+CameraGroup - несколько камер (ракурсов) с синхронизированной выборкой кадров.
+
+Обеспечивает:
+- Открытие N камер, у каждой свой поток захвата и кольцевой буфер
+- Выборку набора кадров, снятых в пределах допуска по времени
+- Классификацию набора одним пакетом с усреднением вероятностей
+"""
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+
+from core.clock import SYSTEM_CLOCK, Clock
+from core.config import Settings
+from core.logging_config import get_logger
+from vision.camera_manager import CameraManager
+
+logger = get_logger(__name__)
+
+
+@dataclass
+class FrameSet:
+    """Набор кадров с разных камер, выровненных по времени."""
+
+    frames: list
+    timestamps: list
+
+    @property
+    def skew_ms(self) -> float:
+        """Разброс времени захвата кадров набора в миллисекундах."""
+        return (max(self.timestamps) - min(self.timestamps)) * 1000
+
+
+class CameraGroup:
+    """
+    Группа камер с выровненным по времени захватом.
+
+    Использование:
+        group = CameraGroup(settings, [0, 2])
+        if group.open():
+            group.start_capture()
+            frame_set = group.get_frame_set()
+            class_name, confidence = group.predict(engine, frame_set)
+            group.close()
+    """
+
+    def __init__(self, settings: Settings, camera_indices: list[int], clock: Optional[Clock] = None):
+        """
+        Инициализация группы.
+
+        Args:
+            settings: Настройки приложения.
+            camera_indices: Индексы камер; первая - основная.
+            clock: Часы камер и ожидания синхронных кадров (по умолчанию реальные).
+        """
+        if not camera_indices:
+            raise ValueError("CameraGroup требует хотя бы одну камеру")
+
+        self._settings = settings
+        self._indices = list(camera_indices)
+        self._tolerance = settings.camera_sync_tolerance
+        self._clock = clock if clock is not None else SYSTEM_CLOCK
+        self._cameras = [CameraManager(settings, clock=self._clock) for _ in self._indices]
+
+    @property
+    def cameras(self) -> list[CameraManager]:
+        """Менеджеры камер в порядке индексов."""
+        return list(self._cameras)
+
+    @property
+    def primary(self) -> CameraManager:
+        """Основная камера (первая в группе)."""
+        return self._cameras[0]
+
+    def open(self) -> bool:
+        """
+        Открыть все камеры группы.
+
+        Returns:
+            True если открыты все камеры. Иначе уже открытые закрываются.
+        """
+        for index, camera in zip(self._indices, self._cameras):
+            if camera.is_open():
+                continue
+            if not camera.open(camera_index=index):
+                logger.error(f"Не удалось открыть камеру {index} из группы {self._indices}")
+                self.close()
+                return False
+
+        logger.info("Группа камер открыта: %s", self._indices)
+        return True
+
+    def start_capture(self) -> bool:
+        """Запустить потоки захвата всех камер."""
+        return all(camera.start_capture() for camera in self._cameras)
+
+    def stop_capture(self) -> None:
+        """Остановить потоки захвата всех камер."""
+        for camera in self._cameras:
+            camera.stop_capture()
+
+    def close(self) -> None:
+        """Закрыть все камеры группы."""
+        for camera in self._cameras:
+            camera.close()
+
+    def is_open(self) -> bool:
+        """Проверить, открыты ли все камеры группы."""
+        return all(camera.is_open() for camera in self._cameras)
+
+    def get_frame_set(self, timeout: float = 0.5, reference: Optional[float] = None) -> Optional[FrameSet]:
+        """
+        Получить набор кадров со всех камер, снятых почти одновременно.
+
+        Опорное время - заданное reference или последний кадр самой
+        «отстающей» камеры; с каждой камеры берётся кадр, ближайший к нему.
+        Если разброс превышает допуск, ожидаются новые кадры до таймаута.
+
+        Args:
+            timeout: Максимальное время ожидания в секундах.
+            reference: Опорное время (например, время выбранного кадра основной камеры).
+
+        Returns:
+            FrameSet или None, если выровнять кадры не удалось.
+        """
+        deadline = self._clock.now() + timeout
+
+        while True:
+            latest = [camera.last_capture_time for camera in self._cameras]
+            if all(timestamp is not None for timestamp in latest):
+                target = reference if reference is not None else min(latest)
+                nearest = [camera.get_frame_near(target) for camera in self._cameras]
+                timestamps = [timestamp for _, timestamp in nearest]
+                if all(timestamp is not None and abs(timestamp - target) <= self._tolerance
+                       for timestamp in timestamps):
+                    return FrameSet([frame for frame, _ in nearest], timestamps)
+
+            if self._clock.now() >= deadline:
+                logger.warning(f"Не удалось выровнять кадры камер {self._indices} "
+                               f"в пределах {self._tolerance * 1000:.0f} мс")
+                return None
+            self._clock.sleep(0.005)
+
+    def predict(self, engine, frame_set: FrameSet, image_size: Optional[int] = None) -> tuple[str, float]:
+        """
+        Классифицировать набор кадров одним пакетом.
+
+        Вероятности классов усредняются по ракурсам: объект, который
+        с одной стороны похож на бутылку, а сбоку явно посторонний,
+        получает заметную вероятность FOREIGN.
+
+        Args:
+            engine: InferenceEngine.
+            frame_set: Набор кадров.
+            image_size: Разрешение входа. Если None, image_size из настроек движка.
+
+        Returns:
+            Кортеж (class_name, confidence) как у InferenceEngine.predict.
+        """
+        probs, names = engine.predict_probs(frame_set.frames, image_size=image_size)
+        if probs is None:
+            return "NONE", 0.0
+        return self.fuse(probs, names, engine.CLASS_MAPPING)
+
+    @staticmethod
+    def fuse(probs: np.ndarray, names: list[str], class_mapping: dict) -> tuple[str, float]:
+        """
+        Объединить вероятности нескольких ракурсов.
+
+        Args:
+            probs: Матрица вероятностей (views, classes).
+            names: Исходные имена классов модели.
+            class_mapping: Маппинг имён классов на выходные значения.
+
+        Returns:
+            Кортеж (class_name, confidence).
+        """
+        mean = probs.mean(axis=0)
+        idx = int(mean.argmax())
+        return class_mapping.get(names[idx].upper(), "NONE"), float(mean[idx])
@@ -5,16 +5,26 @@ CameraManager - управление камерой с буферизацией
 - Открытие/закрытие камеры с retry
 - Фоновый захват кадров в кольцевой буфер
 - Thread-safe доступ к последнему кадру
+- Детектор движения/занятости на уменьшенной копии кадра
+- Оценку качества каждого кадра и выбор лучшего за окно времени
+- Публикацию кадров в шину разделяемой памяти для других процессов
 """
+import dataclasses
+import math
 import threading
-import time
 from collections import deque
-from typing import Optional
+from typing import Callable, Optional
 
 import cv2
 import numpy as np
 
+from core.clock import SYSTEM_CLOCK, Clock
 from core.config import Settings
+from core.logging_config import get_logger
+from vision.frame_analysis import FrameQuality, MotionDetector, MotionState, downscale_gray, frame_quality
+from vision.frame_bus import FrameBus
+
+logger = get_logger(__name__)
 
 
 class CameraManager:
@@ -32,20 +42,43 @@ class CameraManager:
             manager.close()
     """
 
-    def __init__(self, settings: Settings):
+    def __init__(self, settings: Settings, clock: Optional[Clock] = None):
         """
         Инициализация менеджера камеры.
 
         Args:
             settings: Настройки приложения.
+            clock: Часы для пауз, ожиданий и отметок кадров (по умолчанию реальные).
         """
         self._settings = settings
+        self._clock = clock if clock is not None else SYSTEM_CLOCK
         self._cap: Optional[cv2.VideoCapture] = None
         self._is_open = False
+        self._camera_index: Optional[int] = None
+        self._mode: Optional[dict] = None
 
-        # Буфер кадров
-        self._buffer: deque = deque(maxlen=settings.frame_buffer_size)
+        # Буфер кадров: элементы (frame, timestamp, FrameQuality или None)
+        self._buffer: deque = deque(maxlen=self.buffer_capacity(settings))
         self._buffer_lock = threading.Lock()
+        self._frame_condition = threading.Condition(self._buffer_lock)
+
+        # Детектор движения (обновляется только потоком захвата)
+        self._motion: Optional[MotionDetector] = None
+        if settings.motion_detection:
+            self._motion = MotionDetector(
+                pixel_threshold=settings.motion_pixel_threshold,
+                motion_ratio=settings.motion_ratio,
+                occupancy_ratio=settings.occupancy_ratio,
+                stable_frames=settings.stable_frames,
+            )
+        self._motion_state = MotionState()
+        self._stable_frame: Optional[tuple[np.ndarray, float]] = None
+        self._motion_listeners: list[Callable[[str, MotionState], None]] = []
+
+        # Шина кадров (создаётся потоком захвата по первому кадру)
+        self._frame_bus: Optional[FrameBus] = None
+        self._frame_bus_owner_name: Optional[str] = None
+        self._frame_bus_error = False
 
         # Поток захвата
         self._capture_thread: Optional[threading.Thread] = None
@@ -56,12 +89,13 @@ class CameraManager:
         self._frames_captured = 0
         self._last_capture_time: Optional[float] = None
 
-    def open(self, camera_index: Optional[int] = None) -> bool:
+    def open(self, camera_index: Optional[int] = None, fast: bool = False) -> bool:
         """
         Открыть камеру с retry при ошибке.
 
         Args:
             camera_index: Индекс камеры. Если None, используется из настроек.
+            fast: Одна попытка без пауз (проверка закэшированной камеры).
 
         Returns:
             True если камера успешно открыта, False иначе.
@@ -71,17 +105,20 @@ class CameraManager:
 
         # Используем переданный индекс или из настроек
         idx = camera_index if camera_index is not None else self._settings.camera_index
+        self._camera_index = idx
+        attempts = 1 if fast else self._settings.retry_count
+        retry_delay = 0.0 if fast else self._settings.retry_delay
 
-        for attempt in range(1, self._settings.retry_count + 1):
+        for attempt in range(1, attempts + 1):
             try:
                 self._cap = cv2.VideoCapture(idx)
 
                 if not self._cap.isOpened():
-                    print(f"[CameraManager] Попытка {attempt}/{self._settings.retry_count}: "
-                          f"не удалось открыть камеру {idx}")
+                    logger.warning(f"Попытка {attempt}/{attempts}: "
+                                   f"не удалось открыть камеру {idx}")
                     self._cap.release()
                     self._cap = None
-                    time.sleep(self._settings.retry_delay)
+                    self._clock.sleep(retry_delay)
                     continue
 
                 # Настройка камеры
@@ -92,7 +129,8 @@ class CameraManager:
                 self._cap.set(cv2.CAP_PROP_FPS, self._settings.camera_fps)
 
                 # Даем камере время на инициализацию
-                time.sleep(0.1)
+                if not fast:
+                    self._clock.sleep(0.1)
 
                 # Проверка захвата тестового кадра (несколько попыток)
                 test_frame = None
@@ -100,14 +138,14 @@ class CameraManager:
                     ret, test_frame = self._cap.read()
                     if ret and test_frame is not None and test_frame.size > 0:
                         break
-                    time.sleep(0.1)  # Небольшая задержка между попытками
+                    self._clock.sleep(0.1)  # Небольшая задержка между попытками
                 
                 if test_frame is None or test_frame.size == 0:
-                    print(f"[CameraManager] Попытка {attempt}/{self._settings.retry_count}: "
-                          f"не удалось захватить тестовый кадр (индекс {idx})")
+                    logger.warning(f"Попытка {attempt}/{attempts}: "
+                                   f"не удалось захватить тестовый кадр (индекс {idx})")
                     self._cap.release()
                     self._cap = None
-                    time.sleep(self._settings.retry_delay)
+                    self._clock.sleep(retry_delay)
                     continue
 
                 # Успешно
@@ -117,18 +155,25 @@ class CameraManager:
                 if actual_fps <= 0:
                     actual_fps = self._settings.camera_fps
 
-                print(f"[CameraManager] Камера открыта: {actual_width}x{actual_height} @ {actual_fps:.1f} fps")
+                logger.info("Камера открыта: %sx%s @ %.1f fps", actual_width, actual_height, actual_fps)
+                self._mode = {
+                    "index": idx,
+                    "fourcc": self._settings.camera_fourcc,
+                    "width": actual_width,
+                    "height": actual_height,
+                    "fps": actual_fps,
+                }
                 self._is_open = True
                 return True
 
             except Exception as e:
-                print(f"[CameraManager] Попытка {attempt}/{self._settings.retry_count}: ошибка - {e}")
+                logger.warning(f"Попытка {attempt}/{attempts}: ошибка - {e}")
                 if self._cap:
                     self._cap.release()
                     self._cap = None
-                time.sleep(self._settings.retry_delay)
+                self._clock.sleep(retry_delay)
 
-        print(f"[CameraManager] Не удалось открыть камеру после {self._settings.retry_count} попыток")
+        logger.error(f"Не удалось открыть камеру после {attempts} попыток")
         return False
 
     def close(self) -> None:
@@ -141,12 +186,16 @@ class CameraManager:
 
         self._is_open = False
         self._clear_buffer()
-        print("[CameraManager] Камера закрыта")
+        logger.info("Камера закрыта")
 
     def is_open(self) -> bool:
         """Проверить, открыта ли камера."""
         return self._is_open and self._cap is not None and self._cap.isOpened()
 
+    def is_capturing(self) -> bool:
+        """Проверить, работает ли фоновый поток захвата."""
+        return self._capture_running
+
     def start_capture(self) -> bool:
         """
         Запустить фоновый поток захвата кадров.
@@ -155,7 +204,7 @@ class CameraManager:
             True если поток запущен, False если камера не открыта.
         """
         if not self.is_open():
-            print("[CameraManager] Невозможно запустить захват: камера не открыта")
+            logger.error("Невозможно запустить захват: камера не открыта")
             return False
 
         if self._capture_running:
@@ -165,11 +214,11 @@ class CameraManager:
         self._capture_running = True
         self._capture_thread = threading.Thread(
             target=self._capture_loop,
-            name="CameraCapture",
+            name=f"CameraCapture-{self._camera_index}",
             daemon=True
         )
         self._capture_thread.start()
-        print("[CameraManager] Фоновый захват запущен")
+        logger.info("Фоновый захват запущен")
         return True
 
     def stop_capture(self) -> None:
@@ -184,7 +233,7 @@ class CameraManager:
             self._capture_thread.join(timeout=2.0)
 
         self._capture_thread = None
-        print(f"[CameraManager] Фоновый захват остановлен (захвачено кадров: {self._frames_captured})")
+        logger.info("Фоновый захват остановлен (захвачено кадров: %s)", self._frames_captured)
 
     def get_frame(self) -> Optional[np.ndarray]:
         """
@@ -196,7 +245,34 @@ class CameraManager:
         with self._buffer_lock:
             if not self._buffer:
                 return None
-            return self._buffer[-1].copy()
+            return self._buffer[-1][0].copy()
+
+    def best_frame(self, window: float, since: Optional[float] = None) -> tuple[Optional[np.ndarray], Optional[float], Optional[FrameQuality]]:
+        """
+        Выбрать самый качественный кадр из буфера за последние window секунд.
+
+        Args:
+            window: Окно в секундах, отсчитываемое от последнего кадра.
+            since: Не брать кадры, захваченные раньше этого времени.
+
+        Returns:
+            Кортеж (кадр, timestamp, качество) или (None, None, None).
+            Если оценка качества выключена, возвращается последний кадр окна.
+        """
+        with self._buffer_lock:
+            if not self._buffer:
+                return None, None, None
+            newest = self._buffer[-1][1]
+            start = newest - window
+            if since is not None:
+                start = max(start, since)
+            candidates = [entry for entry in self._buffer if entry[1] >= start] or [self._buffer[-1]]
+            best = max(
+                candidates,
+                key=lambda entry: (entry[2].score if entry[2] is not None else 0.0, entry[1]),
+            )
+            frame, timestamp, quality = best
+            return frame.copy(), timestamp, quality
 
     def get_frame_with_timestamp(self) -> tuple[Optional[np.ndarray], Optional[float]]:
         """
@@ -208,7 +284,84 @@ class CameraManager:
         with self._buffer_lock:
             if not self._buffer:
                 return None, None
-            return self._buffer[-1].copy(), self._last_capture_time
+            frame, timestamp, _ = self._buffer[-1]
+            return frame.copy(), timestamp
+
+    def get_frame_near(self, timestamp: float) -> tuple[Optional[np.ndarray], Optional[float]]:
+        """
+        Получить кадр из буфера, захваченный ближе всего к заданному времени.
+
+        Args:
+            timestamp: Целевое время (clock.time()).
+
+        Returns:
+            Кортеж (кадр, timestamp) или (None, None) если буфер пуст.
+        """
+        with self._buffer_lock:
+            if not self._buffer:
+                return None, None
+            frame, frame_time, _ = min(self._buffer, key=lambda entry: abs(entry[1] - timestamp))
+            return frame.copy(), frame_time
+
+    @property
+    def last_capture_time(self) -> Optional[float]:
+        """Время захвата последнего кадра (None если буфер пуст)."""
+        with self._buffer_lock:
+            return self._last_capture_time
+
+    def get_motion_state(self) -> MotionState:
+        """
+        Получить состояние сцены по последнему кадру.
+
+        Returns:
+            Копия MotionState (occupied/stable всегда False, если детектор выключен).
+        """
+        with self._buffer_lock:
+            return dataclasses.replace(self._motion_state)
+
+    def add_motion_listener(self, callback: Callable[[str, MotionState], None]) -> None:
+        """
+        Подписаться на события детектора движения.
+
+        Callback вызывается в потоке захвата и не должен блокировать его.
+
+        Args:
+            callback: Функция (event, state), event - "occupied", "vacated",
+                "stable" или "unstable".
+        """
+        self._motion_listeners.append(callback)
+
+    def reset_background(self) -> None:
+        """Считать текущую сцену пустой камерой (переобучить фон)."""
+        if self._motion is not None:
+            self._motion.reset_background()
+
+    def wait_for_stable_frame(self, timeout: float) -> tuple[Optional[np.ndarray], Optional[float]]:
+        """
+        Дождаться стабильной сцены с объектом и вернуть её первый стабильный кадр.
+
+        Пустые кадры пропускаются: ожидание продолжается, пока камера не станет
+        занята и сцена не успокоится.
+
+        Args:
+            timeout: Максимальное время ожидания в секундах.
+
+        Returns:
+            Кортеж (кадр, timestamp) или (None, None) по таймауту
+            или если детектор выключен.
+        """
+        if self._motion is None:
+            return None, None
+
+        def ready() -> bool:
+            state = self._motion_state
+            return state.stable and state.occupied and self._stable_frame is not None
+
+        with self._frame_condition:
+            if not self._clock.wait_for(self._frame_condition, ready, timeout=timeout):
+                return None, None
+            frame, timestamp = self._stable_frame
+            return frame.copy(), timestamp
 
     def capture_single_frame(self) -> Optional[np.ndarray]:
         """
@@ -226,15 +379,48 @@ class CameraManager:
             if ret and frame is not None:
                 return frame.copy()
         except Exception as e:
-            print(f"[CameraManager] Ошибка при захвате кадра: {e}")
+            logger.error(f"Ошибка при захвате кадра: {e}")
 
         return None
 
+    @property
+    def frame_bus_name(self) -> Optional[str]:
+        """Имя сегмента шины кадров этой камеры (None если шина выключена)."""
+        if not self._settings.frame_bus_name:
+            return None
+        return f"{self._settings.frame_bus_name}_cam{self._camera_index}"
+
+    def release_frame_bus(self) -> None:
+        """Закрыть и удалить шину кадров (читатели должны переподключиться)."""
+        bus, self._frame_bus = self._frame_bus, None
+        if bus is not None:
+            bus.close()
+            bus.unlink()
+
+    @property
+    def mode(self) -> Optional[dict]:
+        """Фактический режим открытой камеры: index, fourcc, width, height, fps."""
+        return dict(self._mode) if self._is_open and self._mode else None
+
     @property
     def frames_captured(self) -> int:
         """Количество захваченных кадров с момента запуска."""
         return self._frames_captured
 
+    @staticmethod
+    def buffer_capacity(settings: Settings) -> int:
+        """
+        Ёмкость буфера кадров.
+
+        С оценкой качества буфер должен вмещать всё окно best_frame_window
+        при camera_fps (ceil(window * fps) + 1 кадров), иначе лучший кадр
+        выбирается из меньшего окна. frame_buffer_size - нижняя граница.
+        """
+        capacity = settings.frame_buffer_size
+        if settings.frame_quality and settings.best_frame_window > 0 and settings.camera_fps > 0:
+            capacity = max(capacity, math.ceil(round(settings.best_frame_window * settings.camera_fps, 6)) + 1)
+        return max(1, capacity)
+
     @property
     def buffer_size(self) -> int:
         """Текущий размер буфера."""
@@ -249,7 +435,7 @@ class CameraManager:
         while self._capture_running and not self._capture_stop_event.is_set():
             try:
                 if not self._cap or not self._cap.isOpened():
-                    print("[CameraManager] Камера отключена, останавливаем захват")
+                    logger.warning("Камера отключена, останавливаем захват")
                     break
 
                 ret, frame = self._cap.read()
@@ -257,32 +443,80 @@ class CameraManager:
                 if not ret or frame is None:
                     consecutive_failures += 1
                     if consecutive_failures >= max_failures:
-                        print(f"[CameraManager] Слишком много ошибок захвата ({max_failures}), останавливаем")
+                        logger.error(f"Слишком много ошибок захвата ({max_failures}), останавливаем")
                         break
-                    time.sleep(0.01)
+                    self._clock.sleep(0.01)
                     continue
 
                 # Успешный захват
                 consecutive_failures = 0
-                capture_time = time.time()
+                capture_time = self._clock.time()
+
+                events = []
+                if self._motion is not None:
+                    events = self._motion.update(downscale_gray(frame), capture_time)
+                quality = frame_quality(frame, self._settings.quality_roi) if self._settings.frame_quality else None
 
-                with self._buffer_lock:
-                    self._buffer.append(frame)
+                with self._frame_condition:
+                    self._buffer.append((frame, capture_time, quality))
                     self._last_capture_time = capture_time
+                    if self._motion is not None:
+                        self._motion_state = dataclasses.replace(self._motion.state)
+                        if "stable" in events or ("occupied" in events and self._motion_state.stable):
+                            self._stable_frame = (frame, capture_time)
+                        elif "unstable" in events:
+                            self._stable_frame = None
+                    self._frame_condition.notify_all()
 
                 self._frames_captured += 1
+                if self._settings.frame_bus_name:
+                    self._publish_to_bus(frame, capture_time)
+                if events:
+                    self._notify_motion(events)
 
             except Exception as e:
-                print(f"[CameraManager] Ошибка в цикле захвата: {e}")
+                logger.error(f"Ошибка в цикле захвата: {e}")
                 consecutive_failures += 1
                 if consecutive_failures >= max_failures:
                     break
-                time.sleep(0.01)
+                self._clock.sleep(0.01)
 
         self._capture_running = False
 
+    def _publish_to_bus(self, frame: np.ndarray, timestamp: float) -> None:
+        """Опубликовать кадр в шину, пересоздав её при смене камеры или разрешения."""
+        name = self.frame_bus_name
+        bus = self._frame_bus
+        if bus is None or bus.shape != frame.shape or self._frame_bus_owner_name != name:
+            if self._frame_bus_error:
+                return
+            self.release_frame_bus()
+            try:
+                bus = FrameBus.create(name, frame.shape, self._settings.frame_bus_slots)
+            except Exception as e:
+                logger.error(f"Не удалось создать шину кадров {name}: {e}")
+                self._frame_bus_error = True
+                return
+            self._frame_bus = bus
+            self._frame_bus_owner_name = name
+            logger.info("Шина кадров %s: %s, слотов %s", name, frame.shape, bus.slots)
+
+        bus.publish(frame, timestamp)
+
+    def _notify_motion(self, events: list[str]) -> None:
+        """Вызвать подписчиков детектора движения."""
+        state = self.get_motion_state()
+        for event in events:
+            for callback in list(self._motion_listeners):
+                try:
+                    callback(event, state)
+                except Exception as e:
+                    logger.error(f"Ошибка в обработчике события {event}: {e}")
+
     def _clear_buffer(self) -> None:
         """Очистить буфер кадров."""
         with self._buffer_lock:
             self._buffer.clear()
             self._last_capture_time = None
+            self._stable_frame = None
+            self._motion_state = MotionState()
@@ -0,0 +1,282 @@
+"""
+CameraSupervisor - владелец жизненного цикла камеры.
+
+Обеспечивает:
+- Открытие камеры и запуск захвата в фоне, независимо от WebSocket соединения
+- Watchdog: возраст последнего кадра и фактический fps
+- Переоткрытие камеры с экспоненциальной задержкой при остановке или зависании
+- Состояние здоровья и метрики восстановления
+"""
+import threading
+from collections import deque
+from typing import Optional, Union
+
+from core.clock import SYSTEM_CLOCK, Clock
+from core.config import Settings
+from core.logging_config import get_logger
+from vision.camera_discovery import CameraDiscovery
+from vision.camera_group import CameraGroup
+from vision.camera_manager import CameraManager
+
+logger = get_logger(__name__)
+
+# Состояния здоровья камеры
+HEALTH_STARTING = "starting"
+HEALTH_HEALTHY = "healthy"
+HEALTH_DEGRADED = "degraded"      # кадры идут, но fps ниже минимума
+HEALTH_RECOVERING = "recovering"  # захват остановился или завис, идёт переоткрытие
+HEALTH_STOPPED = "stopped"
+
+
+class CameraSupervisor:
+    """
+    Фоновый супервизор камеры (или группы камер).
+
+    Камера живёт всё время работы сервиса: переподключение WebSocket
+    не закрывает её, буфер остаётся «тёплым». Если кадры перестают
+    поступать дольше camera_stall_timeout, камера переоткрывается
+    с экспоненциально растущей задержкой между попытками.
+
+    Использование:
+        supervisor = CameraSupervisor(settings, camera, discovery)
+        supervisor.start()
+        ...
+        if supervisor.is_ready():
+            frame = camera.get_frame()
+        ...
+        supervisor.stop()
+    """
+
+    # Период проверки состояния камеры (сек)
+    CHECK_INTERVAL = 0.2
+
+    # Окно расчёта fps (сек)
+    FPS_WINDOW = 2.0
+
+    def __init__(
+        self,
+        settings: Settings,
+        camera: Union[CameraManager, CameraGroup],
+        discovery: Optional[CameraDiscovery] = None,
+        clock: Optional[Clock] = None,
+    ):
+        """
+        Инициализация супервизора.
+
+        Args:
+            settings: Настройки приложения.
+            camera: Менеджер камеры или группа камер.
+            discovery: Поиск камеры по кэшу (только для одиночной камеры).
+            clock: Часы watchdog (те же, что у камер; по умолчанию реальные).
+        """
+        self._settings = settings
+        self._clock = clock if clock is not None else SYSTEM_CLOCK
+        self._camera = camera
+        self._cameras = camera.cameras if isinstance(camera, CameraGroup) else [camera]
+        self._discovery = discovery
+
+        self._thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+        self._ready_event = threading.Event()
+
+        # Состояние и метрики (пишет только поток супервизора)
+        self._health = HEALTH_STOPPED
+        self._fps_samples: deque = deque(maxlen=max(2, int(self.FPS_WINDOW / self.CHECK_INTERVAL) + 1))
+        self._fps = 0.0
+        self._failed_attempts = 0
+        self._stall_started: Optional[float] = None
+        self._last_stall_reason: Optional[str] = None
+        self._recoveries = 0
+        self._recovery_times_ms: deque = deque(maxlen=50)
+
+    def start(self) -> None:
+        """Запустить фоновый поток супервизора (повторный вызов игнорируется)."""
+        if self._thread and self._thread.is_alive():
+            return
+
+        self._stop_event.clear()
+        self._health = HEALTH_STARTING
+        self._thread = threading.Thread(target=self._run, name="CameraSupervisor", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Остановить супервизор и закрыть камеру."""
+        self._stop_event.set()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=5.0)
+        self._thread = None
+        self._ready_event.clear()
+        self._camera.close()
+        for camera in self._cameras:
+            camera.release_frame_bus()
+        self._health = HEALTH_STOPPED
+
+    @property
+    def health(self) -> str:
+        """Текущее состояние здоровья камеры (HEALTH_*)."""
+        return self._health
+
+    def is_ready(self) -> bool:
+        """
+        Камера готова отдавать свежие кадры.
+
+        Проверяется сразу, без ожидания очередной проверки watchdog:
+        запрос во время восстановления получает отказ немедленно.
+        """
+        if not self._ready_event.is_set() or self._health == HEALTH_RECOVERING:
+            return False
+        if not all(camera.is_capturing() for camera in self._cameras):
+            return False
+        frame_age = self._frame_age()
+        return frame_age is not None and frame_age <= self._settings.camera_stall_timeout
+
+    def wait_ready(self, timeout: float) -> bool:
+        """
+        Дождаться готовности камеры.
+
+        Args:
+            timeout: Максимальное время ожидания в секундах.
+
+        Returns:
+            True если камера готова.
+        """
+        return self._clock.wait_event(self._ready_event, timeout) and self.is_ready()
+
+    def stats(self) -> dict:
+        """Метрики камеры: здоровье, fps, возраст кадра, восстановления."""
+        frame_age = self._frame_age()
+        recovery_times = list(self._recovery_times_ms)
+        return {
+            "health": self._health,
+            "fps": round(self._fps, 1),
+            "frame_age_ms": round(frame_age * 1000, 1) if frame_age is not None else None,
+            "recoveries": self._recoveries,
+            "failed_attempts": self._failed_attempts,
+            "last_stall_reason": self._last_stall_reason,
+            "last_recovery_ms": recovery_times[-1] if recovery_times else None,
+            "max_recovery_ms": max(recovery_times) if recovery_times else None,
+        }
+
+    def _run(self) -> None:
+        """Основной цикл watchdog: проверка кадров и восстановление."""
+        while not self._stop_event.is_set():
+            reason = self._check_stall()
+            if reason is not None:
+                self._begin_recovery(reason)
+                if not self._reopen():
+                    self._failed_attempts += 1
+                    delay = self._backoff_delay()
+                    logger.warning(f"Камера не восстановлена (попытка {self._failed_attempts}), "
+                                   f"повтор через {delay:.1f} сек")
+                    self._clock.wait_event(self._stop_event, delay)
+                    continue
+                self._finish_recovery()
+            else:
+                self._update_fps()
+            self._clock.wait_event(self._stop_event, self.CHECK_INTERVAL)
+
+    def _check_stall(self) -> Optional[str]:
+        """
+        Проверить, поступают ли кадры.
+
+        Returns:
+            Причина остановки или None, если камера работает.
+        """
+        if not all(camera.is_open() and camera.is_capturing() for camera in self._cameras):
+            return "capture_stopped"
+        frame_age = self._frame_age()
+        if frame_age is None or frame_age > self._settings.camera_stall_timeout:
+            return "frame_stall"
+        return None
+
+    def _begin_recovery(self, reason: str) -> None:
+        """Зафиксировать начало восстановления."""
+        self._ready_event.clear()
+        if self._stall_started is None:
+            self._stall_started = self._clock.now()
+            if self._health != HEALTH_STARTING:
+                self._last_stall_reason = reason
+                logger.warning(f"Камера: {reason}, переоткрытие")
+        if self._health != HEALTH_STARTING:
+            self._health = HEALTH_RECOVERING
+
+    def _finish_recovery(self) -> None:
+        """Зафиксировать успешное восстановление и его длительность."""
+        elapsed_ms = (self._clock.now() - self._stall_started) * 1000
+        if self._health == HEALTH_RECOVERING:
+            self._recoveries += 1
+            self._recovery_times_ms.append(round(elapsed_ms, 1))
+            logger.info("Камера восстановлена за %.0f мс (попыток: %d)",
+                        elapsed_ms, self._failed_attempts + 1)
+        self._stall_started = None
+        self._failed_attempts = 0
+        self._fps_samples.clear()
+        self._health = HEALTH_HEALTHY
+        self._ready_event.set()
+
+    def _backoff_delay(self) -> float:
+        """Экспоненциальная задержка перед следующей попыткой."""
+        delay = self._settings.camera_reopen_delay * (2 ** (self._failed_attempts - 1))
+        return min(delay, self._settings.camera_reopen_max_delay)
+
+    def _update_fps(self) -> None:
+        """Обновить fps по счётчику кадров и состояние healthy/degraded."""
+        now = self._clock.now()
+        frames = min(camera.frames_captured for camera in self._cameras)
+        self._fps_samples.append((now, frames))
+
+        oldest_time, oldest_frames = self._fps_samples[0]
+        if now - oldest_time < self.FPS_WINDOW / 2:
+            return
+        self._fps = (frames - oldest_frames) / (now - oldest_time)
+
+        health = HEALTH_DEGRADED if self._fps < self._settings.camera_min_fps else HEALTH_HEALTHY
+        if health != self._health:
+            logger.warning(f"Камера: {health} (fps {self._fps:.1f})")
+            self._health = health
+
+    def _frame_age(self) -> Optional[float]:
+        """Возраст самого старого из последних кадров камер (сек)."""
+        timestamps = [camera.last_capture_time for camera in self._cameras]
+        if any(timestamp is None for timestamp in timestamps):
+            return None
+        return self._clock.time() - min(timestamps)
+
+    def _reopen(self) -> bool:
+        """
+        Закрыть и заново открыть камеру, запустить захват.
+
+        Returns:
+            True если захват запущен и получен первый кадр.
+        """
+        self._camera.close()
+        start = self._clock.now()
+
+        if self._discovery is not None and isinstance(self._camera, CameraManager):
+            discovered = self._discovery.open_camera(self._camera)
+            if discovered is None:
+                return False
+            self._settings.camera_index = discovered.mode["index"]
+        elif not self._camera.open():
+            return False
+
+        if not self._camera.start_capture():
+            logger.error("Не удалось запустить захват кадров")
+            self._camera.close()
+            return False
+
+        if not self._wait_first_frame(timeout=max(2.0, self._settings.camera_stall_timeout)):
+            logger.error("Захват запущен, но кадры не поступают")
+            self._camera.close()
+            return False
+
+        logger.info("Камера готова за %.0f мс", (self._clock.now() - start) * 1000)
+        return True
+
+    def _wait_first_frame(self, timeout: float) -> bool:
+        """Дождаться первого кадра в буфере (всех камер группы)."""
+        def ready() -> bool:
+            return all(camera.last_capture_time is not None for camera in self._cameras)
+
+        self._clock.wait_until(lambda: ready() or self._stop_event.is_set(), timeout=timeout)
+        return ready() and not self._stop_event.is_set()
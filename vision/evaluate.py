@@ -0,0 +1,494 @@
+#!/usr/bin/env python3
+"""
+Оценка модели на офлайн наборе кадров.
+
+Прогоняет папку с изображениями или архив кадров (tar/zip) через
+пул процессов (декодирование + уменьшение) и пакетный инференс
+InferenceEngine. Результат (JSON):
+- матрица ошибок по классам CAN/FOREIGN/PET
+- precision/recall/F1 по классам
+- калибровка уверенности (reliability bins, ECE)
+- пропускная способность и задержки (декодирование, инференс)
+
+Метка кадра берётся из имени файла (…_PET.jpg), из имени родительской
+папки (val/CAN/…) или из CSV файла `имя,класс` (--labels).
+
+Использование:
+    python -m vision.evaluate real_time/ -o report.json
+    python -m vision.evaluate frames.tar.gz --batch 16 --workers 6
+    python -m vision.evaluate val/ --model weights/new_model --predictions preds.csv
+    python -m vision.evaluate val/ --resolutions 640,960,1280   # точность/задержка по разрешениям
+"""
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import tarfile
+import time
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator, Optional, Union
+
+os.environ.setdefault("OPENCV_LOG_LEVEL", "ERROR")
+
+import cv2
+import numpy as np
+
+from core.config import Settings, get_settings
+from core.logging_config import get_logger, setup_logging
+from core.stats import percentiles
+
+logger = get_logger(__name__)
+
+# Классы модели (порядок строк/столбцов матрицы ошибок)
+CLASSES = ("CAN", "FOREIGN", "PET")
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp"}
+CALIBRATION_BINS = 10
+
+
+@dataclass
+class Sample:
+    """Один кадр набора: имя, метка (или None) и источник данных."""
+    name: str
+    label: Optional[str]
+    payload: Union[str, bytes]  # путь к файлу или байты из архива
+
+
+def label_from_name(name: str, labels: Optional[dict] = None) -> Optional[str]:
+    """
+    Определить класс кадра.
+
+    Args:
+        name: Относительный путь кадра ("val/CAN/1.jpg", "…_shot2_PET.jpg").
+        labels: Явные метки {имя файла: класс} (приоритетнее имени).
+
+    Returns:
+        Класс из CLASSES или None, если метка неизвестна.
+    """
+    path = Path(name)
+    if labels:
+        label = labels.get(path.name) or labels.get(name)
+        if label:
+            label = label.strip().upper()
+            return label if label in CLASSES else None
+
+    token = path.stem.rsplit("_", 1)[-1].upper()
+    if token in CLASSES:
+        return token
+    for parent in reversed(path.parent.parts):
+        if parent.upper() in CLASSES:
+            return parent.upper()
+    return None
+
+
+def iter_samples(source: Path, labels: Optional[dict] = None) -> Iterator[Sample]:
+    """
+    Потоково перечислить кадры папки или архива.
+
+    Args:
+        source: Папка, .tar/.tar.gz/.tgz или .zip.
+        labels: Явные метки (см. label_from_name).
+
+    Yields:
+        Sample в детерминированном порядке.
+    """
+    if source.is_dir():
+        for path in sorted(source.rglob("*")):
+            if path.suffix.lower() in IMAGE_EXTENSIONS:
+                name = str(path.relative_to(source))
+                yield Sample(name, label_from_name(name, labels), str(path))
+        return
+
+    if zipfile.is_zipfile(source):
+        with zipfile.ZipFile(source) as archive:
+            for info in archive.infolist():
+                if not info.is_dir() and Path(info.filename).suffix.lower() in IMAGE_EXTENSIONS:
+                    yield Sample(info.filename, label_from_name(info.filename, labels), archive.read(info))
+        return
+
+    if tarfile.is_tarfile(source):
+        # Потоковый режим: архив читается последовательно, без распаковки на диск
+        with tarfile.open(source, mode="r|*") as archive:
+            for member in archive:
+                if member.isfile() and Path(member.name).suffix.lower() in IMAGE_EXTENSIONS:
+                    data = archive.extractfile(member).read()
+                    yield Sample(member.name, label_from_name(member.name, labels), data)
+        return
+
+    raise ValueError(f"Неподдерживаемый источник: {source}")
+
+
+def load_labels(path: Path) -> dict:
+    """Загрузить CSV `имя,класс` (заголовок не обязателен)."""
+    labels = {}
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.reader(f):
+            if len(row) >= 2 and row[1].strip().upper() in CLASSES:
+                labels[row[0].strip()] = row[1].strip().upper()
+    return labels
+
+
+def decode_frame(payload: Union[str, bytes], short_side: int) -> tuple[Optional[np.ndarray], float]:
+    """
+    Декодировать кадр и уменьшить до short_side по меньшей стороне.
+
+    Выполняется в процессе пула: в основной процесс передаётся уже
+    уменьшенный кадр (модель всё равно масштабирует вход до image_size).
+
+    Args:
+        payload: Путь к файлу или байты изображения.
+        short_side: Целевая меньшая сторона (обычно image_size).
+
+    Returns:
+        Кортеж (кадр BGR или None, время декодирования в мс).
+    """
+    start = time.perf_counter()
+    if isinstance(payload, bytes):
+        frame = cv2.imdecode(np.frombuffer(payload, dtype=np.uint8), cv2.IMREAD_COLOR)
+    else:
+        frame = cv2.imread(payload, cv2.IMREAD_COLOR)
+
+    if frame is not None:
+        height, width = frame.shape[:2]
+        scale = short_side / min(height, width)
+        if scale < 1.0:
+            size = (max(1, round(width * scale)), max(1, round(height * scale)))
+            frame = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+
+    return frame, (time.perf_counter() - start) * 1000
+
+
+def decode_stream(samples: Iterator[Sample], short_side: int, workers: int,
+                  prefetch: int = 4) -> Iterator[tuple[Sample, Optional[np.ndarray], float]]:
+    """
+    Декодировать кадры в пуле процессов с ограниченным окном.
+
+    В полёте не более workers * prefetch кадров, поэтому память
+    не растёт на наборах из десятков тысяч изображений. Порядок сохраняется.
+
+    Args:
+        samples: Источник кадров.
+        short_side: Целевая меньшая сторона.
+        workers: Число процессов (0 - декодирование в текущем процессе).
+        prefetch: Кадров в очереди на процесс.
+
+    Yields:
+        Кортежи (sample, кадр или None, время декодирования в мс).
+    """
+    if workers <= 0:
+        for sample in samples:
+            frame, decode_ms = decode_frame(sample.payload, short_side)
+            yield sample, frame, decode_ms
+        return
+
+    # spawn: дочерние процессы не наследуют состояние модели/NPU
+    context = multiprocessing.get_context("spawn")
+    window = max(1, workers * prefetch)
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        pending: deque = deque()
+        for sample in samples:
+            pending.append((sample, pool.submit(decode_frame, sample.payload, short_side)))
+            if len(pending) >= window:
+                done_sample, future = pending.popleft()
+                yield (done_sample, *future.result())
+        while pending:
+            done_sample, future = pending.popleft()
+            yield (done_sample, *future.result())
+
+
+class EvaluationStats:
+    """
+    Накопитель метрик качества: матрица ошибок, калибровка, распределение.
+
+    Использование:
+        stats = EvaluationStats()
+        stats.add("PET", "PET", 0.97)
+        report = stats.report()
+    """
+
+    def __init__(self, classes: tuple = CLASSES, bins: int = CALIBRATION_BINS):
+        self.classes = classes
+        self._index = {name: i for i, name in enumerate(classes)}
+        self.confusion = np.zeros((len(classes), len(classes)), dtype=np.int64)
+        self._bins = bins
+        self._bin_count = np.zeros(bins, dtype=np.int64)
+        self._bin_correct = np.zeros(bins, dtype=np.int64)
+        self._bin_confidence = np.zeros(bins, dtype=np.float64)
+        self.unlabeled = {name: 0 for name in classes}
+
+    def add(self, label: Optional[str], predicted: str, confidence: float) -> None:
+        """
+        Учесть одно предсказание.
+
+        Args:
+            label: Истинный класс (None - кадр без метки).
+            predicted: Предсказанный класс (из CLASSES).
+            confidence: Уверенность top-1.
+        """
+        if predicted not in self._index:
+            return
+        if label is None:
+            self.unlabeled[predicted] += 1
+            return
+
+        self.confusion[self._index[label], self._index[predicted]] += 1
+        b = min(self._bins - 1, int(confidence * self._bins))
+        self._bin_count[b] += 1
+        self._bin_correct[b] += int(label == predicted)
+        self._bin_confidence[b] += confidence
+
+    def report(self) -> dict:
+        """Сформировать отчёт по накопленным предсказаниям."""
+        total = int(self.confusion.sum())
+        correct = int(np.trace(self.confusion))
+        per_class = {}
+        for i, name in enumerate(self.classes):
+            tp = int(self.confusion[i, i])
+            predicted = int(self.confusion[:, i].sum())
+            support = int(self.confusion[i, :].sum())
+            precision = tp / predicted if predicted else 0.0
+            recall = tp / support if support else 0.0
+            f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+            per_class[name] = {
+                "precision": round(precision, 4),
+                "recall": round(recall, 4),
+                "f1": round(f1, 4),
+                "support": support,
+            }
+
+        bins = []
+        ece = 0.0
+        for b in range(self._bins):
+            count = int(self._bin_count[b])
+            if not count:
+                continue
+            accuracy = self._bin_correct[b] / count
+            mean_conf = self._bin_confidence[b] / count
+            ece += count / total * abs(accuracy - mean_conf)
+            bins.append({
+                "range": [round(b / self._bins, 2), round((b + 1) / self._bins, 2)],
+                "count": count,
+                "accuracy": round(float(accuracy), 4),
+                "mean_confidence": round(float(mean_conf), 4),
+            })
+
+        return {
+            "labeled": total,
+            "accuracy": round(correct / total, 4) if total else None,
+            "confusion_matrix": {
+                "labels": list(self.classes),
+                "rows_true_cols_pred": self.confusion.tolist(),
+            },
+            "per_class": per_class,
+            "calibration": {"bins": bins, "ece": round(ece, 4) if total else None},
+            "unlabeled_predictions": self.unlabeled,
+        }
+
+
+def evaluate(engine, samples: Iterator[Sample], image_size: int, batch_size: int = 8,
+             workers: int = 4, predictions_path: Optional[Path] = None) -> dict:
+    """
+    Прогнать набор кадров через модель и собрать отчёт.
+
+    Args:
+        engine: Готовый InferenceEngine (или объект с predict_probs).
+        samples: Источник кадров.
+        batch_size: Размер пакета инференса.
+        workers: Процессы декодирования.
+        image_size: Размер входа модели (и меньшая сторона при декодировании).
+        predictions_path: CSV для предсказаний по каждому кадру.
+
+    Returns:
+        Отчёт (качество + производительность).
+    """
+    stats = EvaluationStats()
+    decode_ms, batch_ms, image_ms = [], [], []
+    failed = 0
+    processed = 0
+
+    writer = None
+    predictions_file = None
+    if predictions_path:
+        predictions_file = open(predictions_path, "w", newline="", encoding="utf-8")
+        writer = csv.writer(predictions_file)
+        writer.writerow(["name", "label", "predicted", "confidence"])
+
+    def run_batch(batch: list) -> None:
+        nonlocal failed, processed
+        start = time.perf_counter()
+        probs, names = engine.predict_probs([frame for _, frame in batch], image_size=image_size)
+        elapsed = (time.perf_counter() - start) * 1000
+        if probs is None:
+            failed += len(batch)
+            return
+        batch_ms.append(elapsed)
+        image_ms.extend([elapsed / len(batch)] * len(batch))
+
+        top1 = probs.argmax(axis=1)
+        for (sample, _), idx, row in zip(batch, top1, probs):
+            predicted = names[int(idx)].upper()
+            confidence = float(row[idx])
+            stats.add(sample.label, predicted, confidence)
+            processed += 1
+            if writer:
+                writer.writerow([sample.name, sample.label or "", predicted, f"{confidence:.4f}"])
+
+    started = time.perf_counter()
+    batch = []
+    try:
+        for sample, frame, elapsed in decode_stream(samples, image_size, workers):
+            decode_ms.append(elapsed)
+            if frame is None:
+                failed += 1
+                logger.warning(f"Не удалось декодировать: {sample.name}")
+                continue
+            batch.append((sample, frame))
+            if len(batch) >= batch_size:
+                run_batch(batch)
+                batch = []
+                if processed % (batch_size * 50) == 0:
+                    logger.info("Обработано: %s", processed)
+        if batch:
+            run_batch(batch)
+    finally:
+        if predictions_file:
+            predictions_file.close()
+    wall = time.perf_counter() - started
+
+    report = stats.report()
+    report["performance"] = {
+        "images": processed,
+        "failed": failed,
+        "wall_time_s": round(wall, 3),
+        "images_per_s": round(processed / wall, 2) if wall > 0 else None,
+        "batch_size": batch_size,
+        "decode_workers": workers,
+        "decode": percentiles(decode_ms),
+        "inference_per_batch": percentiles(batch_ms),
+        "inference_per_image": percentiles(image_ms),
+    }
+    return report
+
+
+def benchmark_resolutions(engine, source: Path, labels: Optional[dict], resolutions: list[int],
+                          batch_size: int = 8, workers: int = 4) -> dict:
+    """
+    Компромисс точность/задержка по разрешениям входа.
+
+    Каждое разрешение прогоняется по всему набору отдельно
+    (для экспортированного разрешения - своей моделью).
+
+    Args:
+        engine: Готовый InferenceEngine или InferencePool.
+        source: Папка с кадрами или архив.
+        labels: Метки из CSV (или None - метка из имени файла).
+        resolutions: Разрешения входа.
+        batch_size: Размер пакета инференса.
+        workers: Процессы декодирования.
+
+    Returns:
+        Словарь {разрешение: точность, ECE и задержка на кадр}.
+    """
+    table = {}
+    for size in resolutions:
+        logger.info("Разрешение %s px...", size)
+        report = evaluate(engine, iter_samples(source, labels), image_size=size,
+                          batch_size=batch_size, workers=workers)
+        performance = report["performance"]
+        table[str(size)] = {
+            "accuracy": report["accuracy"],
+            "ece": report["calibration"]["ece"],
+            "images": performance["images"],
+            "images_per_s": performance["images_per_s"],
+            "inference_per_image": performance["inference_per_image"],
+        }
+    return table
+
+
+def parse_args():
+    """Парсинг аргументов командной строки."""
+    parser = argparse.ArgumentParser(description="Оценка модели на офлайн наборе кадров")
+    parser.add_argument("source", type=Path, help="Папка с кадрами или архив (.tar, .tar.gz, .zip)")
+    parser.add_argument("--model", type=Path, help="Путь к модели (переопределяет .env)")
+    parser.add_argument("--imgsz", type=int, help="Размер входа модели (переопределяет .env)")
+    parser.add_argument("--batch", type=int, default=8, help="Размер пакета инференса")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) - 1),
+                        help="Процессы декодирования (0 - без пула)")
+    parser.add_argument("--engines", type=int, default=1,
+                        help="Экземпляров модели (пул инференса, пакет делится между ними)")
+    parser.add_argument("--labels", type=Path, help="CSV с метками: имя,класс")
+    parser.add_argument("--predictions", type=Path, help="CSV для предсказаний по кадрам")
+    parser.add_argument("--resolutions", type=str,
+                        help="Сравнить разрешения входа, например 640,960,1280 (точность/задержка)")
+    parser.add_argument("-o", "--output", type=Path, help="Файл для JSON отчёта (по умолчанию stdout)")
+    return parser.parse_args()
+
+
+def main():
+    """Точка входа."""
+    from vision.inference_engine import InferenceEngine
+    from vision.inference_pool import InferencePool
+
+    setup_logging()
+    args = parse_args()
+    settings: Settings = get_settings()
+    if args.model:
+        settings.model_path = args.model
+    if args.imgsz:
+        settings.image_size = args.imgsz
+
+    if args.engines > 1:
+        engine = InferencePool(settings, workers=args.engines)
+    else:
+        engine = InferenceEngine(settings)
+    if not engine.load_model() or not engine.warmup():
+        raise SystemExit(1)
+
+    labels = load_labels(args.labels) if args.labels else None
+    if args.resolutions:
+        resolutions = [int(size) for size in args.resolutions.split(",") if size.strip()]
+        report = {
+            "model_path": str(settings.model_path),
+            "source": str(args.source),
+            "resolutions": benchmark_resolutions(engine, args.source, labels, resolutions,
+                                                 batch_size=args.batch, workers=args.workers),
+        }
+        if args.engines > 1:
+            engine.shutdown()
+        _write_report(report, args.output)
+        return
+
+    report = evaluate(
+        engine,
+        iter_samples(args.source, labels),
+        image_size=settings.image_size,
+        batch_size=args.batch,
+        workers=args.workers,
+        predictions_path=args.predictions,
+    )
+    report["model_path"] = str(settings.model_path)
+    report["image_size"] = settings.image_size
+    report["source"] = str(args.source)
+    if args.engines > 1:
+        report["inference_pool"] = engine.stats()
+        engine.shutdown()
+
+    _write_report(report, args.output)
+
+
+def _write_report(report: dict, output: Optional[Path]) -> None:
+    """Записать JSON отчёт в файл или stdout."""
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if output:
+        output.write_text(text, encoding="utf-8")
+        logger.info("Отчёт сохранён: %s", output)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+"""
+Дешёвый анализ кадров на потоке захвата.
+
+Обеспечивает:
+- Уменьшенную grayscale копию кадра (прореживание + INTER_AREA)
+- MotionDetector: разность кадров и фоновая модель пустой камеры,
+  события занятости ("occupied"/"vacated") и стабильности ("stable"/"unstable")
+- Оценку качества кадра: резкость (дисперсия Лапласиана) и экспозиция
+"""
+from dataclasses import dataclass
+from typing import Optional
+
+import cv2
+import numpy as np
+
+
+def downscale_gray(frame: np.ndarray, width: int = 160) -> np.ndarray:
+    """
+    Получить уменьшенную grayscale копию кадра.
+
+    Кадр сначала прореживается срезом (без копирования полного кадра),
+    затем уменьшается INTER_AREA до заданной ширины.
+
+    Args:
+        frame: Изображение BGR (или grayscale).
+        width: Ширина результата в пикселях.
+
+    Returns:
+        Изображение uint8 (height, width).
+    """
+    height, frame_width = frame.shape[:2]
+    step = max(1, frame_width // (width * 2))
+    small = frame[::step, ::step]
+    if small.ndim == 3:
+        small = cv2.cvtColor(np.ascontiguousarray(small), cv2.COLOR_BGR2GRAY)
+    out_height = max(1, round(height * width / frame_width))
+    return cv2.resize(small, (width, out_height), interpolation=cv2.INTER_AREA)
+
+
+@dataclass
+class FrameQuality:
+    """Оценка качества кадра."""
+
+    sharpness: float
+    brightness: float
+    clipped_ratio: float
+    score: float
+
+
+def frame_quality(frame: np.ndarray, roi: float = 0.6, width: int = 320) -> FrameQuality:
+    """
+    Оценить резкость и экспозицию центральной области кадра.
+
+    Центральная область (доля roi по каждой стороне) прореживается срезом
+    примерно до заданной ширины. Резкость - дисперсия Лапласиана,
+    экспозиция штрафуется за пересвеченные/провалившиеся пиксели и
+    отклонение средней яркости от середины диапазона.
+
+    Args:
+        frame: Изображение BGR (или grayscale).
+        roi: Доля кадра по каждой стороне (0-1], центрированная.
+        width: Примерная ширина анализируемой области в пикселях.
+
+    Returns:
+        FrameQuality, score - итоговая оценка (больше - лучше).
+    """
+    height, frame_width = frame.shape[:2]
+    margin_y = int(height * (1 - roi) / 2)
+    margin_x = int(frame_width * (1 - roi) / 2)
+    region = frame[margin_y:height - margin_y, margin_x:frame_width - margin_x]
+
+    step = max(1, region.shape[1] // width)
+    region = region[::step, ::step]
+    if region.ndim == 3:
+        region = cv2.cvtColor(np.ascontiguousarray(region), cv2.COLOR_BGR2GRAY)
+
+    sharpness = float(cv2.Laplacian(region, cv2.CV_32F).var())
+    brightness = float(region.mean())
+    clipped = float(np.count_nonzero((region <= 5) | (region >= 250))) / region.size
+
+    exposure = max(0.0, 1.0 - abs(brightness - 128.0) / 128.0) * (1.0 - clipped)
+    return FrameQuality(sharpness, brightness, clipped, sharpness * (0.5 + 0.5 * exposure))
+
+
+@dataclass
+class MotionState:
+    """Состояние сцены по последнему кадру."""
+
+    occupied: bool = False
+    stable: bool = False
+    motion_ratio: float = 0.0
+    occupancy_ratio: float = 0.0
+    timestamp: Optional[float] = None
+    # Время первого стабильного кадра текущего периода стабильности
+    stable_since: Optional[float] = None
+
+
+class MotionDetector:
+    """
+    Детектор движения и занятости камеры по уменьшенным кадрам.
+
+    Движение - доля пикселей, изменившихся относительно предыдущего кадра.
+    Занятость - доля пикселей, отличающихся от фона (пустой камеры).
+    Фон медленно подстраивается только пока камера пуста и сцена стабильна,
+    поэтому долго лежащий объект не «растворяется» в фоне.
+
+    Использование:
+        detector = MotionDetector()
+        events = detector.update(downscale_gray(frame), timestamp)
+        if "stable" in events and detector.state.occupied:
+            ...
+    """
+
+    def __init__(
+        self,
+        pixel_threshold: int = 25,
+        motion_ratio: float = 0.005,
+        occupancy_ratio: float = 0.02,
+        stable_frames: int = 5,
+        learning_rate: float = 0.05,
+    ):
+        """
+        Инициализация детектора.
+
+        Args:
+            pixel_threshold: Порог изменения яркости пикселя (0-255).
+            motion_ratio: Доля изменившихся пикселей, считающаяся движением.
+            occupancy_ratio: Доля отличающихся от фона пикселей для занятости.
+            stable_frames: Сколько кадров подряд без движения нужно для стабильности.
+            learning_rate: Скорость подстройки фона.
+        """
+        self._pixel_threshold = pixel_threshold
+        self._motion_ratio = motion_ratio
+        self._occupancy_ratio = occupancy_ratio
+        self._stable_frames = stable_frames
+        self._learning_rate = learning_rate
+
+        self._background: Optional[np.ndarray] = None
+        self._previous: Optional[np.ndarray] = None
+        self._still_count = 0
+        self.state = MotionState()
+
+    def reset_background(self) -> None:
+        """Сбросить фон: следующий кадр станет новым фоном пустой камеры."""
+        self._background = None
+
+    def update(self, gray: np.ndarray, timestamp: float) -> list[str]:
+        """
+        Обработать очередной уменьшенный кадр.
+
+        Args:
+            gray: Уменьшенный grayscale кадр (см. downscale_gray).
+            timestamp: Время захвата кадра.
+
+        Returns:
+            Список событий: "occupied", "vacated", "stable", "unstable".
+        """
+        events = []
+        state = self.state
+
+        if self._background is None or self._background.shape != gray.shape:
+            self._background = gray.astype(np.float32)
+            self._previous = None
+
+        if self._previous is None:
+            motion = 1.0
+        else:
+            motion = float(np.count_nonzero(cv2.absdiff(gray, self._previous) > self._pixel_threshold)) / gray.size
+        self._previous = gray
+
+        background_diff = np.abs(gray.astype(np.float32) - self._background) > self._pixel_threshold
+        occupancy = float(np.count_nonzero(background_diff)) / gray.size
+
+        # Стабильность: N кадров подряд без движения
+        self._still_count = self._still_count + 1 if motion < self._motion_ratio else 0
+        stable = self._still_count >= self._stable_frames
+        if stable and not state.stable:
+            state.stable_since = timestamp
+            events.append("stable")
+        elif not stable and state.stable:
+            state.stable_since = None
+            events.append("unstable")
+
+        # Занятость с гистерезисом, чтобы не дребезжать на границе порога
+        if not state.occupied and occupancy >= self._occupancy_ratio:
+            state.occupied = True
+            events.append("occupied")
+        elif state.occupied and occupancy < self._occupancy_ratio / 2:
+            state.occupied = False
+            events.append("vacated")
+
+        if stable and not state.occupied:
+            cv2.accumulateWeighted(gray, self._background, self._learning_rate)
+
+        state.stable = stable
+        state.motion_ratio = motion
+        state.occupancy_ratio = occupancy
+        state.timestamp = timestamp
+        return events
@@ -0,0 +1,303 @@
+"""
+FrameBus - кольцевой буфер кадров в разделяемой памяти между процессами.
+
+Обеспечивает:
+- Один писатель (поток захвата CameraManager), любое число читателей-процессов
+- Чтение без блокировок по протоколу seqlock (номер версии на слот)
+- Доступ к кадру без копирования (view на разделяемую память)
+
+Раскладка сегмента:
+    header  uint64[8]       magic, slots, height, width, channels, published, 0, 0
+    seqs    uint64[slots]   версия слота: нечётная - идёт запись, чётная - кадр целый
+    times   float64[slots]  время захвата кадра
+    frames  uint8[slots, height, width, channels]
+
+Использование:
+    python -m vision.frame_bus vision_frames_cam0   # читатель: fps и задержка
+"""
+import argparse
+import sys
+import time
+from dataclasses import dataclass
+from multiprocessing import resource_tracker, shared_memory
+from typing import Optional
+
+import numpy as np
+
+MAGIC = 0x46524D42555331  # "FRMBUS1"
+HEADER_FIELDS = 8
+_ALIGN = 64
+
+
+def _aligned(offset: int) -> int:
+    """Выровнять смещение по границе кэш-линии."""
+    return (offset + _ALIGN - 1) // _ALIGN * _ALIGN
+
+
+@dataclass
+class FrameView:
+    """
+    Кадр из шины без копирования.
+
+    Данные остаются в разделяемой памяти и могут быть перезаписаны писателем
+    через slots - 1 кадров. После обработки проверьте valid(): если False,
+    кадр был перезаписан во время чтения и результат нужно отбросить.
+    """
+
+    array: np.ndarray
+    timestamp: float
+    seq: int
+    _bus: "FrameBus"
+    _slot: int
+    _version: int
+
+    def valid(self) -> bool:
+        """Кадр не был перезаписан с момента получения."""
+        return int(self._bus._seqs[self._slot]) == self._version
+
+
+class FrameBus:
+    """
+    Кольцевой буфер кадров фиксированного размера в multiprocessing.shared_memory.
+
+    Использование (писатель):
+        bus = FrameBus.create("vision_frames_cam0", frame.shape, slots=8)
+        bus.publish(frame, time.time())
+        ...
+        bus.close()
+        bus.unlink()
+
+    Использование (читатель, другой процесс):
+        bus = FrameBus.attach("vision_frames_cam0")
+        view = bus.view_latest()
+        result = process(view.array)
+        if view.valid():
+            ...
+    """
+
+    def __init__(self, shm: shared_memory.SharedMemory, owner: bool):
+        """
+        Инициализация поверх существующего сегмента (используйте create/attach).
+
+        Args:
+            shm: Сегмент разделяемой памяти.
+            owner: Процесс-создатель (писатель).
+        """
+        self._shm = shm
+        self._owner = owner
+        self._header = np.ndarray((HEADER_FIELDS,), dtype=np.uint64, buffer=shm.buf)
+        if int(self._header[0]) != MAGIC:
+            raise ValueError(f"Сегмент {shm.name} не является FrameBus")
+
+        slots, height, width, channels = (int(value) for value in self._header[1:5])
+        self.slots = slots
+        self.shape = (height, width, channels) if channels else (height, width)
+
+        offset = _aligned(HEADER_FIELDS * 8)
+        self._seqs = np.ndarray((slots,), dtype=np.uint64, buffer=shm.buf, offset=offset)
+        offset = _aligned(offset + slots * 8)
+        self._times = np.ndarray((slots,), dtype=np.float64, buffer=shm.buf, offset=offset)
+        offset = _aligned(offset + slots * 8)
+        self._frames = np.ndarray((slots, *self.shape), dtype=np.uint8, buffer=shm.buf, offset=offset)
+
+    @staticmethod
+    def segment_size(shape: tuple, slots: int) -> int:
+        """Размер сегмента в байтах для заданной формы кадра."""
+        offset = _aligned(HEADER_FIELDS * 8)
+        offset = _aligned(offset + slots * 8)
+        offset = _aligned(offset + slots * 8)
+        return offset + slots * int(np.prod(shape))
+
+    @classmethod
+    def create(cls, name: str, shape: tuple, slots: int = 8) -> "FrameBus":
+        """
+        Создать шину (писатель). Оставшийся от прошлого запуска сегмент удаляется.
+
+        Args:
+            name: Имя сегмента разделяемой памяти.
+            shape: Форма кадра (height, width[, channels]), dtype uint8.
+            slots: Количество слотов кольцевого буфера.
+
+        Returns:
+            FrameBus.
+        """
+        size = cls.segment_size(shape, slots)
+        try:
+            shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            stale = shared_memory.SharedMemory(name=name)
+            stale.close()
+            stale.unlink()
+            shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+
+        header = np.ndarray((HEADER_FIELDS,), dtype=np.uint64, buffer=shm.buf)
+        height, width = shape[:2]
+        channels = shape[2] if len(shape) == 3 else 0
+        header[:] = [0, slots, height, width, channels, 0, 0, 0]
+        header[0] = MAGIC  # последним: читатель не увидит полузаполненный заголовок
+        del header
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name: str) -> "FrameBus":
+        """
+        Подключиться к существующей шине (читатель).
+
+        Args:
+            name: Имя сегмента.
+
+        Returns:
+            FrameBus.
+
+        Raises:
+            FileNotFoundError: Если писатель ещё не создал шину.
+        """
+        shm = shared_memory.SharedMemory(name=name)
+        # До Python 3.13 resource_tracker читателя удаляет сегмент при выходе
+        # процесса; владельцем сегмента остаётся писатель
+        if sys.version_info < (3, 13):
+            resource_tracker.unregister(shm._name, "shared_memory")
+        return cls(shm, owner=False)
+
+    @property
+    def name(self) -> str:
+        """Имя сегмента разделяемой памяти."""
+        return self._shm.name
+
+    @property
+    def published(self) -> int:
+        """Количество опубликованных кадров (номер последнего кадра)."""
+        return int(self._header[5])
+
+    def publish(self, frame: np.ndarray, timestamp: float) -> int:
+        """
+        Опубликовать кадр (только один писатель).
+
+        Args:
+            frame: Кадр формы shape, dtype uint8.
+            timestamp: Время захвата.
+
+        Returns:
+            Номер опубликованного кадра.
+        """
+        if frame.shape != self.shape:
+            raise ValueError(f"Форма кадра {frame.shape} не совпадает с шиной {self.shape}")
+
+        seq = self.published + 1
+        slot = seq % self.slots
+        version = int(self._seqs[slot])
+
+        self._seqs[slot] = version + 1          # нечётная: идёт запись
+        np.copyto(self._frames[slot], frame)
+        self._times[slot] = timestamp
+        self._seqs[slot] = version + 2          # чётная: кадр целый
+        self._header[5] = seq
+        return seq
+
+    def view_latest(self) -> Optional[FrameView]:
+        """
+        Получить последний кадр без копирования.
+
+        Returns:
+            FrameView или None, если кадров ещё нет.
+        """
+        for _ in range(self.slots):
+            seq = self.published
+            if seq == 0:
+                return None
+            slot = seq % self.slots
+            version = int(self._seqs[slot])
+            if version % 2:
+                continue  # писатель как раз перезаписывает этот слот
+            timestamp = float(self._times[slot])
+            if int(self._seqs[slot]) != version:
+                continue
+            return FrameView(self._frames[slot], timestamp, seq, self, slot, version)
+        return None
+
+    def read_latest(self) -> Optional[tuple[np.ndarray, float, int]]:
+        """
+        Получить копию последнего кадра, гарантированно целую.
+
+        Returns:
+            Кортеж (кадр, timestamp, номер кадра) или None.
+        """
+        for _ in range(self.slots):
+            view = self.view_latest()
+            if view is None:
+                return None
+            frame = view.array.copy()
+            if view.valid():
+                return frame, view.timestamp, view.seq
+        return None
+
+    def wait_for_new(self, last_seq: int, timeout: float, poll: float = 0.001) -> bool:
+        """
+        Дождаться кадра новее last_seq (опрос счётчика, без блокировок).
+
+        Args:
+            last_seq: Номер последнего обработанного кадра.
+            timeout: Максимальное время ожидания в секундах.
+            poll: Период опроса.
+
+        Returns:
+            True если появился новый кадр.
+        """
+        deadline = time.monotonic() + timeout
+        while self.published <= last_seq:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(poll)
+        return True
+
+    def close(self) -> None:
+        """Отключиться от сегмента (view на кадры становятся недействительными)."""
+        self._header = self._seqs = self._times = self._frames = None
+        self._shm.close()
+
+    def unlink(self) -> None:
+        """Удалить сегмент (только писатель)."""
+        if self._owner:
+            try:
+                self._shm.unlink()
+            except FileNotFoundError:
+                pass
+
+
+def main():
+    """Читатель шины: печатает fps и задержку доставки кадров."""
+    parser = argparse.ArgumentParser(description="Монитор FrameBus (читатель)")
+    parser.add_argument("name", help="Имя сегмента, например vision_frames_cam0")
+    parser.add_argument("--seconds", type=float, default=10.0, help="Длительность замера")
+    args = parser.parse_args()
+
+    bus = FrameBus.attach(args.name)
+    print(f"Подключено к {bus.name}: {bus.shape}, слотов {bus.slots}")
+
+    last_seq, received, torn, latencies = bus.published, 0, 0, []
+    deadline = time.monotonic() + args.seconds
+    try:
+        while time.monotonic() < deadline:
+            if not bus.wait_for_new(last_seq, timeout=1.0):
+                continue
+            view = bus.view_latest()
+            if view is None:
+                continue
+            _ = float(view.array[::64, ::64].mean())  # «обработка» без копии
+            if not view.valid():
+                torn += 1
+                continue
+            latencies.append((time.time() - view.timestamp) * 1000)
+            received += 1
+            last_seq = view.seq
+    finally:
+        bus.close()
+
+    fps = received / args.seconds
+    mean_latency = sum(latencies) / len(latencies) if latencies else 0.0
+    print(f"Кадров: {received} ({fps:.1f} fps), перезаписано при чтении: {torn}, "
+          f"средняя задержка: {mean_latency:.2f} мс")
+
+
+if __name__ == "__main__":
+    main()
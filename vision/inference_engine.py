@@ -3,10 +3,15 @@ InferenceEngine - обёртка над YOLO моделью для класси
 
 Обеспечивает:
 - Загрузку модели один раз при старте
-- Прогрев модели для стабильного времени инференса
-- Единый интерфейс для предсказаний
+- Прогрев записанными кадрами по рабочему пути до стабилизации задержки
+- Единый интерфейс для предсказаний (одиночных и пакетных)
+- Кэш результатов для повторяющихся (статичных) сцен
+- Каскад: быстрая модель низкого разрешения, полная модель только при сомнении
+- Выбор разрешения входа на каждый запрос по бюджету задержки
+- TTA (отражение/обрезка одним пакетом) для кадров с низкой уверенностью
 """
 import time
+from collections import deque
 from pathlib import Path
 from typing import Optional
 
@@ -14,6 +19,8 @@ import numpy as np
 
 from core.config import Settings
 from core.logging_config import get_logger
+from core.stats import percentiles
+from vision.result_cache import ResultCache, perceptual_hash
 
 logger = get_logger(__name__)
 
@@ -37,6 +44,21 @@ class InferenceEngine:
         "FOREIGN": "NONE",
     }
 
+    # Как часто логировать метрики кэша (в количестве обращений)
+    CACHE_STATS_INTERVAL = 100
+
+    # Как часто логировать метрики каскада (в количестве запросов)
+    CASCADE_STATS_INTERVAL = 100
+
+    # Как часто логировать метрики TTA (в количестве срабатываний)
+    TTA_STATS_INTERVAL = 50
+
+    # Вес нового замера в скользящей оценке задержки разрешения
+    LATENCY_EMA_ALPHA = 0.2
+
+    # Сколько последних задержек TTA хранить для перцентилей
+    TTA_LATENCY_WINDOW = 256
+
     def __init__(self, settings: Settings):
         """
         Инициализация движка.
@@ -46,8 +68,34 @@ class InferenceEngine:
         """
         self._settings = settings
         self._model = None
+        self._stage1_model = None
         self._is_ready = False
 
+        # Модели по разрешению входа (включая основную для image_size)
+        # и скользящая оценка их задержки
+        self._models: dict[int, object] = {}
+        self._latency_ms: dict[int, float] = {}
+
+        # Метрики каскада: ответы первой ступени и эскалации на полную модель
+        self._cascade_answered = 0
+        self._cascade_escalated = 0
+        self._warmup_latencies: list[float] = []
+        self._warmup_stable = False
+
+        # Метрики TTA: запросы полной модели, срабатывания, смена ответа, задержка пакета
+        self._tta_requests = 0
+        self._tta_triggered = 0
+        self._tta_changed = 0
+        self._tta_latencies: deque = deque(maxlen=self.TTA_LATENCY_WINDOW)
+
+        self._cache: Optional[ResultCache] = None
+        if settings.result_cache_size > 0:
+            self._cache = ResultCache(
+                max_size=settings.result_cache_size,
+                max_distance=settings.result_cache_max_distance,
+                ttl=settings.result_cache_ttl,
+            )
+
     def load_model(self) -> bool:
         """
         Загрузить YOLO модель.
@@ -64,13 +112,37 @@ class InferenceEngine:
                 logger.error(f"Модель не найдена: {model_path}")
                 return False
 
-            logger.info(f"Загрузка модели из {model_path}...")
+            logger.info("Загрузка модели из %s...", model_path)
             start = time.perf_counter()
 
             self._model = YOLO(str(model_path), task="classify")
 
             elapsed = time.perf_counter() - start
-            logger.info(f"Модель загружена за {elapsed:.2f} сек")
+            logger.info("Модель загружена за %.2f сек", elapsed)
+
+            self._models = {self._settings.image_size: self._model}
+            self._latency_ms = {}
+            for size, path in parse_resolution_models(self._settings.resolution_models).items():
+                if size in self._models:
+                    continue
+                if not path.exists():
+                    logger.error(f"Модель для {size} px не найдена: {path}, разрешение пропущено")
+                    continue
+                self._models[size] = YOLO(str(path), task="classify")
+                logger.info("Разрешение %s px: %s", size, path)
+
+            cascade_path = self._settings.cascade_model_path
+            cascade_size = self._settings.cascade_image_size
+            if cascade_path:
+                if Path(cascade_path).exists():
+                    self._stage1_model = YOLO(str(cascade_path), task="classify")
+                    logger.info("Каскад: первая ступень %s (%s px)", cascade_path, cascade_size)
+                else:
+                    logger.error(f"Модель первой ступени не найдена: {cascade_path}, каскад выключен")
+            elif cascade_size != self._settings.image_size and cascade_size in self._models:
+                # Экспорт низкого разрешения служит и первой ступенью каскада
+                self._stage1_model = self._models[cascade_size]
+                logger.info("Каскад: первая ступень - модель %s px", cascade_size)
             return True
 
         except Exception as e:
@@ -79,10 +151,17 @@ class InferenceEngine:
 
     def warmup(self, runs: Optional[int] = None) -> bool:
         """
-        Прогреть модель для стабильного времени инференса.
+        Прогреть модель по рабочему пути до стабилизации задержки.
+
+        Записанные кадры (warmup_frames_dir) приводятся к разрешению
+        камеры и проходят тот же путь, что и запросы: предобработка,
+        модель, постобработка (без кэша результатов). Модель считается
+        готовой, когда задержка последних warmup_window запусков
+        отличается от их медианы не больше чем на warmup_tolerance,
+        но не раньше runs запусков и не позже warmup_max_runs.
 
         Args:
-            runs: Количество прогревочных запусков. Если None, берётся из настроек.
+            runs: Минимальное количество прогревочных запусков. Если None, берётся из настроек.
 
         Returns:
             True если прогрев успешен.
@@ -91,39 +170,147 @@ class InferenceEngine:
             logger.error("Невозможно прогреть: модель не загружена")
             return False
 
-        warmup_runs = runs if runs is not None else self._settings.warmup_runs
-        if warmup_runs <= 0:
+        min_runs = runs if runs is not None else self._settings.warmup_runs
+        if min_runs <= 0:
             self._is_ready = True
             return True
 
-        logger.info(f"Прогрев модели ({warmup_runs} запусков)...")
-        imgsz = self._settings.image_size
+        frames = self._load_warmup_frames()
+        max_runs = max(min_runs, self._settings.warmup_max_runs)
+        logger.info("Прогрев модели (%s кадров, %s-%s запусков)...", len(frames), min_runs, max_runs)
 
+        self._warmup_latencies = []
+        self._warmup_stable = False
         try:
-            for i in range(1, warmup_runs + 1):
-                # Генерируем случайное изображение
-                dummy = np.random.randint(0, 255, size=(imgsz, imgsz, 3), dtype=np.uint8)
-
+            for i in range(max_runs):
+                # С каскадом прогревается худший случай: обе ступени
                 start = time.perf_counter()
-                self._model.predict(source=dummy, imgsz=imgsz, verbose=False)
+                self._predict_frame(frames[i % len(frames)], escalate=True)
                 elapsed_ms = (time.perf_counter() - start) * 1000
-
-                logger.debug(f"Прогрев #{i}: {elapsed_ms:.1f} мс")
-
-            self._is_ready = True
-            logger.info("Прогрев завершён, модель готова")
-            return True
+                self._warmup_latencies.append(round(elapsed_ms, 2))
+                logger.debug("Прогрев #%d: %.1f мс", i + 1, elapsed_ms)
+
+                if i + 1 >= min_runs and self._latency_stable():
+                    self._warmup_stable = True
+                    break
+
+            # Остальные разрешения: оценка их задержки для выбора по бюджету
+            # (тоже худший путь: уверенная первая ступень не должна пропустить модель)
+            for size in self.resolutions():
+                if size == self._settings.image_size:
+                    continue
+                for i in range(min_runs):
+                    self._predict_frame(frames[i % len(frames)], escalate=True, image_size=size)
+                logger.info("Прогрев %s px: %s мс", size, self._latency_ms.get(size))
 
         except Exception as e:
             logger.error(f"Ошибка при прогреве: {e}")
             return False
 
-    def predict(self, frame: np.ndarray) -> tuple[str, float]:
+        self._cascade_answered = self._cascade_escalated = 0
+        self._tta_requests = self._tta_triggered = self._tta_changed = 0
+        self._tta_latencies.clear()
+        if self._warmup_stable:
+            logger.info("Прогрев завершён за %s запусков, задержка %.1f мс, модель готова",
+                        len(self._warmup_latencies), self._warmup_latencies[-1])
+        else:
+            logger.warning(f"Задержка не стабилизировалась за {max_runs} запусков "
+                           f"(последние: {self._warmup_latencies[-self._settings.warmup_window:]} мс), "
+                           f"модель считается готовой")
+        self._is_ready = True
+        return True
+
+    def release(self) -> None:
+        """Освободить модель (после горячей замены)."""
+        self._is_ready = False
+        self._model = None
+        self._stage1_model = None
+        self._models = {}
+        if self._cache is not None:
+            self._cache.clear()
+
+    def resolutions(self) -> list[int]:
+        """Доступные разрешения входа по возрастанию."""
+        return sorted(self._models)
+
+    def resolution_stats(self) -> dict[int, Optional[float]]:
+        """Оценка задержки модели по разрешениям, мс (None - ещё не замерялась)."""
+        return {size: self._latency_ms.get(size) for size in self.resolutions()}
+
+    def select_resolution(self, budget_ms: Optional[float] = None) -> int:
+        """
+        Выбрать разрешение входа под бюджет задержки.
+
+        Берётся наибольшее разрешение, оценка задержки которого укладывается
+        в бюджет; незамеренное разрешение считается укладывающимся. Если
+        не укладывается ни одно, берётся наименьшее.
+
+        Args:
+            budget_ms: Бюджет на модель, мс. None - основное разрешение (image_size).
+
+        Returns:
+            Разрешение входа.
+        """
+        sizes = self.resolutions()
+        if budget_ms is None or len(sizes) <= 1:
+            return self._settings.image_size
+        for size in reversed(sizes):
+            latency = self._latency_ms.get(size)
+            if latency is None or latency <= budget_ms:
+                return size
+        return sizes[0]
+
+    def warmup_stats(self) -> dict:
+        """Задержки прогревочных запусков и признак стабилизации."""
+        return {
+            "runs": len(self._warmup_latencies),
+            "stable": self._warmup_stable,
+            "latencies_ms": list(self._warmup_latencies),
+        }
+
+    def _latency_stable(self) -> bool:
+        """Задержки последних warmup_window запусков в пределах допуска от их медианы."""
+        window = max(2, self._settings.warmup_window)
+        if len(self._warmup_latencies) < window:
+            return False
+        recent = self._warmup_latencies[-window:]
+        median = float(np.median(recent))
+        return median > 0 and (max(recent) - min(recent)) / median <= self._settings.warmup_tolerance
+
+    def _load_warmup_frames(self) -> list[np.ndarray]:
+        """
+        Кадры для прогрева в разрешении камеры.
+
+        Returns:
+            Записанные кадры из warmup_frames_dir или, если их нет,
+            случайный кадр того же размера, что и кадры камеры.
+        """
+        import cv2
+
+        shape = (self._settings.camera_height, self._settings.camera_width)
+        frames = []
+        frames_dir = Path(self._settings.warmup_frames_dir)
+        if frames_dir.is_dir():
+            for path in sorted(frames_dir.glob("*.jpg")):
+                frame = cv2.imread(str(path))
+                if frame is None:
+                    continue
+                if frame.shape[:2] != shape:
+                    frame = cv2.resize(frame, (shape[1], shape[0]), interpolation=cv2.INTER_AREA)
+                frames.append(frame)
+
+        if not frames:
+            logger.warning(f"Нет кадров для прогрева в {frames_dir}, используется случайный кадр")
+            frames.append(np.random.randint(0, 255, size=(*shape, 3), dtype=np.uint8))
+        return frames
+
+    def predict(self, frame: np.ndarray, image_size: Optional[int] = None) -> tuple[str, float]:
         """
         Выполнить предсказание для кадра.
 
         Args:
             frame: Изображение как numpy array (BGR формат).
+            image_size: Разрешение входа (см. select_resolution). Если None, image_size из настроек.
 
         Returns:
             Кортеж (class_name, confidence):
@@ -134,39 +321,309 @@ class InferenceEngine:
             logger.warning("Модель не готова к инференсу")
             return "NONE", 0.0
 
+        # Кэш ведётся только для основного разрешения: ответ другого
+        # разрешения не должен подменяться закэшированным и наоборот
+        frame_hash = None
+        if self._cache is not None and image_size in (None, self._settings.image_size):
+            frame_hash = perceptual_hash(frame)
+            cached = self._cache.lookup(frame_hash)
+            self._log_cache_stats()
+            if cached is not None:
+                logger.debug("Предсказание из кэша: %s (%.3f)", cached[0], cached[1])
+                return cached
+
         try:
-            start = time.perf_counter()
+            prediction = self._predict_frame(frame, image_size=image_size)
+        except Exception as e:
+            logger.error(f"Ошибка при предсказании: {e}")
+            return "NONE", 0.0
 
-            results = self._model.predict(
-                source=frame,
-                imgsz=self._settings.image_size,
-                verbose=False
-            )
+        if prediction is None:
+            logger.warning("Пустой результат предсказания")
+            return "NONE", 0.0
 
-            elapsed_ms = (time.perf_counter() - start) * 1000
+        if frame_hash is not None:
+            self._cache.store(frame_hash, prediction)
+        return prediction
 
-            if not results:
-                logger.warning("Пустой результат предсказания")
-                return "NONE", 0.0
+    def _predict_frame(
+        self, frame: np.ndarray, escalate: bool = False, image_size: Optional[int] = None
+    ) -> Optional[tuple[str, float]]:
+        """
+        Предобработка, модель и постобработка одного кадра (без кэша).
 
-            result = results[0]
-            class_idx, confidence = self._get_top1(result)
-            raw_class_name = result.names[int(class_idx)]
+        С каскадом сначала работает первая ступень; её ответ принимается,
+        если уверенность не ниже cascade_confidence и отрыв top-1 от
+        top-2 не ниже cascade_margin. Иначе кадр идёт в полную модель.
+        Если её уверенность ниже tta_threshold (и TTA включён), ответ
+        уточняется по аугментированным копиям кадра.
 
-            # Маппинг на выходные значения
-            class_name = self.CLASS_MAPPING.get(raw_class_name.upper(), "NONE")
+        Args:
+            frame: Изображение (BGR формат).
+            escalate: Худший путь: обе ступени каскада и TTA (прогрев).
+            image_size: Разрешение полной модели. Если None, image_size из настроек.
 
-            logger.debug(f"Предсказание: {class_name} ({confidence:.3f}) за {elapsed_ms:.1f} мс")
-            return class_name, confidence
+        Returns:
+            Кортеж (class_name, confidence) или None при пустом результате.
+        """
+        size = image_size or self._settings.image_size
+        model = self._models.get(size, self._model)
+        if self._stage1_model is not None and self._stage1_model is not model:
+            stage1 = self._predict_stage1(frame)
+            confident = (stage1 is not None
+                         and stage1[1] >= self._settings.cascade_confidence
+                         and stage1[2] >= self._settings.cascade_margin)
+            if not escalate:
+                self._count_cascade(escalated=not confident)
+                if confident:
+                    return stage1[:2]
+
+        start = time.perf_counter()
+
+        results = model.predict(
+            source=frame,
+            imgsz=size,
+            verbose=False
+        )
+
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self._record_latency(size, elapsed_ms)
+
+        if not results:
+            return None
+
+        result = results[0]
+        class_idx, confidence = self._get_top1(result)
+        raw_class_name = result.names[int(class_idx)]
+
+        # Маппинг на выходные значения
+        class_name = self.CLASS_MAPPING.get(raw_class_name.upper(), "NONE")
+
+        logger.debug("Предсказание: %s (%.3f) за %.1f мс (%d px)", class_name, confidence, elapsed_ms, size)
+
+        if self._settings.tta_enabled:
+            if not escalate:
+                self._tta_requests += 1
+            if escalate or confidence < self._settings.tta_threshold:
+                return self._predict_tta(frame, model, size, result, (class_name, confidence), escalate)
+        return class_name, confidence
+
+    def _predict_tta(
+        self, frame: np.ndarray, model, size: int, result, prediction: tuple[str, float], warmup: bool
+    ) -> tuple[str, float]:
+        """
+        Уточнить сомнительный ответ по аугментированным копиям кадра.
+
+        Копии (см. tta_views) идут в модель одним пакетом, их вероятности
+        усредняются с вероятностями исходного кадра.
 
+        Args:
+            frame: Исходный кадр.
+            model: Модель, давшая ответ.
+            size: Разрешение входа.
+            result: Результат модели для исходного кадра.
+            prediction: Ответ по исходному кадру.
+            warmup: Прогревочный запуск (метрики не учитываются).
+
+        Returns:
+            Кортеж (class_name, confidence) по усреднённым вероятностям.
+        """
+        start = time.perf_counter()
+        try:
+            views = tta_views(frame, self._settings.tta_crop)
+            results = model.predict(source=views, imgsz=size, verbose=False)
+            if not results or len(results) != len(views):
+                return prediction
+            probs = np.stack([self._probs_array(result)] + [self._probs_array(r) for r in results])
         except Exception as e:
-            logger.error(f"Ошибка при предсказании: {e}")
-            return "NONE", 0.0
+            logger.error(f"Ошибка TTA: {e}")
+            return prediction
+
+        mean = probs.mean(axis=0)
+        idx = int(mean.argmax())
+        tta_prediction = (self.CLASS_MAPPING.get(result.names[idx].upper(), "NONE"), float(mean[idx]))
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        if not warmup:
+            self._tta_triggered += 1
+            self._tta_changed += tta_prediction[0] != prediction[0]
+            self._tta_latencies.append(elapsed_ms)
+            if self._tta_triggered % self.TTA_STATS_INTERVAL == 0:
+                stats = self.tta_stats()
+                logger.info("TTA: срабатываний %.1f%%, смена ответа %s/%s, p95 %s мс",
+                            stats["trigger_rate"] * 100, stats["changed"], stats["triggered"],
+                            stats["latency"].get("p95_ms"))
+
+        logger.debug("TTA (%d копий): %s (%.3f) -> %s (%.3f) за %.1f мс", len(views),
+                     prediction[0], prediction[1], tta_prediction[0], tta_prediction[1], elapsed_ms)
+        return tta_prediction
+
+    def tta_stats(self) -> Optional[dict]:
+        """Метрики TTA (None если TTA выключен)."""
+        if not self._settings.tta_enabled:
+            return None
+        return {
+            "requests": self._tta_requests,
+            "triggered": self._tta_triggered,
+            "trigger_rate": round(self._tta_triggered / self._tta_requests, 4) if self._tta_requests else 0.0,
+            "changed": self._tta_changed,
+            "latency": percentiles(list(self._tta_latencies)),
+        }
+
+    def _record_latency(self, size: int, elapsed_ms: float) -> None:
+        """Обновить скользящую оценку задержки разрешения."""
+        previous = self._latency_ms.get(size)
+        if previous is None:
+            self._latency_ms[size] = elapsed_ms
+        else:
+            self._latency_ms[size] = previous + self.LATENCY_EMA_ALPHA * (elapsed_ms - previous)
+
+    def _predict_stage1(self, frame: np.ndarray) -> Optional[tuple[str, float, float]]:
+        """
+        Первая ступень каскада.
+
+        Returns:
+            Кортеж (class_name, confidence, отрыв top-1 от top-2) или None.
+        """
+        start = time.perf_counter()
+        results = self._stage1_model.predict(
+            source=frame,
+            imgsz=self._settings.cascade_image_size,
+            verbose=False
+        )
+        if not results:
+            return None
+
+        probs = self._probs_array(results[0])
+        order = np.argsort(probs)[::-1]
+        confidence = float(probs[order[0]])
+        margin = confidence - float(probs[order[1]]) if len(order) > 1 else confidence
+        class_name = self.CLASS_MAPPING.get(results[0].names[int(order[0])].upper(), "NONE")
+
+        logger.debug("Каскад, ступень 1: %s (%.3f, отрыв %.3f) за %.1f мс",
+                     class_name, confidence, margin, (time.perf_counter() - start) * 1000)
+        return class_name, confidence, margin
+
+    def _count_cascade(self, escalated: bool) -> None:
+        """Учесть ответ каскада и периодически логировать долю эскалаций."""
+        if escalated:
+            self._cascade_escalated += 1
+        else:
+            self._cascade_answered += 1
+        stats = self.cascade_stats()
+        if stats["requests"] % self.CASCADE_STATS_INTERVAL == 0:
+            logger.info("Каскад: эскалаций %.1f%% (%s/%s)",
+                        stats['escalation_rate'] * 100, stats['escalated'], stats['requests'])
+
+    def cascade_stats(self) -> Optional[dict]:
+        """Метрики каскада (None если каскад выключен)."""
+        if self._stage1_model is None:
+            return None
+        requests = self._cascade_answered + self._cascade_escalated
+        return {
+            "requests": requests,
+            "answered_stage1": self._cascade_answered,
+            "escalated": self._cascade_escalated,
+            "escalation_rate": round(self._cascade_escalated / requests, 4) if requests else 0.0,
+        }
+
+    def predict_batch(self, frames: list) -> list[tuple[str, float]]:
+        """
+        Выполнить предсказание для пакета кадров за один вызов модели.
+
+        Args:
+            frames: Список изображений (BGR формат).
+
+        Returns:
+            Список кортежей (class_name, confidence) в порядке кадров.
+            При ошибке для всех кадров возвращается ("NONE", 0.0).
+        """
+        if not frames:
+            return []
+
+        probs, names = self.predict_probs(frames)
+        if probs is None:
+            return [("NONE", 0.0)] * len(frames)
+
+        top1 = probs.argmax(axis=1)
+        return [
+            (self.CLASS_MAPPING.get(names[int(idx)].upper(), "NONE"), float(probs[i, idx]))
+            for i, idx in enumerate(top1)
+        ]
+
+    def predict_probs(self, frames: list, image_size: Optional[int] = None) -> tuple[Optional[np.ndarray], list[str]]:
+        """
+        Получить вероятности всех классов для пакета кадров.
+
+        Args:
+            frames: Список изображений (BGR формат).
+            image_size: Размер входа модели. Если None, берётся из настроек.
+                Для экспортированного разрешения используется его модель.
+
+        Returns:
+            Кортеж (probs, class_names): матрица вероятностей (N, C)
+            и исходные имена классов модели. При ошибке (None, []).
+        """
+        if not self._is_ready or self._model is None:
+            logger.warning("Модель не готова к инференсу")
+            return None, []
+
+        try:
+            size = image_size or self._settings.image_size
+            start = time.perf_counter()
+            results = self._models.get(size, self._model).predict(
+                source=list(frames),
+                imgsz=size,
+                verbose=False
+            )
+            elapsed_ms = (time.perf_counter() - start) * 1000
+
+            if not results or len(results) != len(frames):
+                logger.warning("Пустой или неполный результат пакетного предсказания")
+                return None, []
+
+            probs = np.stack([self._probs_array(r) for r in results])
+            names = [results[0].names[i] for i in range(probs.shape[1])]
+            logger.debug("Пакет из %d кадров за %.1f мс", len(frames), elapsed_ms)
+            return probs, names
+
+        except Exception as e:
+            logger.error(f"Ошибка при пакетном предсказании: {e}")
+            return None, []
 
     def is_ready(self) -> bool:
         """Проверить, готова ли модель к инференсу."""
         return self._is_ready and self._model is not None
 
+    def cache_stats(self) -> Optional[dict]:
+        """Метрики кэша результатов (None если кэш выключен)."""
+        return self._cache.stats() if self._cache is not None else None
+
+    def _log_cache_stats(self) -> None:
+        """Периодически логировать долю попаданий в кэш."""
+        stats = self._cache.stats()
+        if (stats["hits"] + stats["misses"]) % self.CACHE_STATS_INTERVAL == 0:
+            logger.info(
+                "Кэш результатов: hit_rate=%.1f%% (%s/%s), записей %s",
+                stats["hit_rate"] * 100, stats["hits"], stats["hits"] + stats["misses"], stats["size"],
+            )
+
+    @staticmethod
+    def _probs_array(result) -> np.ndarray:
+        """
+        Извлечь вектор вероятностей классов из результата YOLO.
+
+        Args:
+            result: Результат предсказания YOLO.
+
+        Returns:
+            Вектор вероятностей (float32).
+        """
+        data = result.probs.data
+        if hasattr(data, "cpu"):
+            data = data.cpu().numpy()
+        return np.asarray(data, dtype=np.float32).reshape(-1)
+
     @staticmethod
     def _get_top1(result) -> tuple[int, float]:
         """
@@ -182,3 +639,46 @@ class InferenceEngine:
         top1 = getattr(probs, "top1", int(probs.top5[0]))
         top1conf = getattr(probs, "top1conf", float(probs.top5conf[0]))
         return int(top1), float(top1conf)
+
+
+def parse_resolution_models(spec: str) -> dict[int, Path]:
+    """
+    Разобрать список экспортированных разрешений.
+
+    Args:
+        spec: Строка вида "640=weights/best_640,960=weights/best_960".
+
+    Returns:
+        Словарь {разрешение: путь к модели}; некорректные элементы пропускаются.
+    """
+    models = {}
+    for item in spec.split(","):
+        size, sep, path = item.partition("=")
+        if not sep or not path.strip():
+            continue
+        try:
+            models[int(size)] = Path(path.strip())
+        except ValueError:
+            logger.warning(f"Некорректное разрешение в RESOLUTION_MODELS: {item!r}")
+    return models
+
+
+def tta_views(frame: np.ndarray, crop: float = 0.85) -> list[np.ndarray]:
+    """
+    Аугментированные копии кадра для TTA.
+
+    Все копии - представления (views) исходного массива без копирования
+    пикселей: горизонтальное отражение, центральная обрезка и её отражение.
+
+    Args:
+        frame: Изображение (H, W, C).
+        crop: Доля стороны, остающаяся после центральной обрезки.
+
+    Returns:
+        Список представлений кадра.
+    """
+    height, width = frame.shape[:2]
+    dy = int(height * (1 - crop) / 2)
+    dx = int(width * (1 - crop) / 2)
+    center = frame[dy:height - dy, dx:width - dx]
+    return [frame[:, ::-1], center, center[:, ::-1]]
@@ -0,0 +1,566 @@
+"""
+InferencePool - несколько экземпляров модели в рабочих потоках.
+
+Обеспечивает:
+- N движков (InferenceEngine или совместимых), каждый в своём потоке
+- Ограниченную очередь заданий и Future на каждое задание
+- Сроки выполнения: просроченные задания снимаются с очереди, не занимая модель
+- Горячую замену модели: загрузка, прогрев и проверка в фоне, атомарное
+  переключение между заданиями, освобождение старой модели после их завершения
+- Разбиение пакета кадров на части между воркерами
+- Метрики загрузки каждого воркера
+
+Потоки (а не процессы) достаточны: вызовы модели выполняются в нативном
+коде без GIL. Каждый экземпляр RKNN модели получает свой контекст NPU,
+распределение по ядрам выполняет драйвер.
+"""
+import dataclasses
+import itertools
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Optional, Union
+
+import numpy as np
+
+from core.clock import SYSTEM_CLOCK, Clock
+from core.config import Settings
+from core.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+# Маркер остановки воркера
+_STOP = object()
+
+
+class DeadlineExceeded(Exception):
+    """Срок запроса истёк до начала инференса: задание снято без вызова модели."""
+
+    def __init__(self, request_id: Optional[str]):
+        super().__init__(f"Срок запроса {request_id} истёк в очереди")
+        self.request_id = request_id
+
+
+@dataclass
+class InferenceResult:
+    """Результат запроса, поставленного через submit."""
+
+    request_id: str
+    class_name: str
+    confidence: float
+    queued_ms: float
+    inference_ms: float
+
+
+class _Task:
+    """Задание очереди: вызов движка, Future и срок выполнения."""
+
+    __slots__ = ("call", "args", "future", "frames", "deadline", "request_id", "enqueued_at")
+
+    def __init__(self, call, args, future, frames, deadline, request_id, enqueued_at):
+        self.call = call
+        self.args = args
+        self.future = future
+        self.frames = frames
+        self.deadline = deadline
+        self.request_id = request_id
+        self.enqueued_at = enqueued_at
+
+
+class _WorkerStats:
+    """Счётчики одного воркера."""
+
+    def __init__(self):
+        self.tasks = 0
+        self.frames = 0
+        self.busy_seconds = 0.0
+        self.errors = 0
+        self.expired = 0
+        self.cancelled = 0
+
+
+class InferencePool:
+    """
+    Пул движков инференса с общей ограниченной очередью.
+
+    Повторяет интерфейс InferenceEngine (load_model, warmup, predict,
+    predict_batch, predict_probs, is_ready), поэтому может использоваться
+    вместо него; вызовы из разных потоков выполняются параллельно.
+
+    Использование:
+        pool = InferencePool(settings, workers=3)
+        pool.load_model()
+        pool.warmup()
+
+        future = pool.submit(frame, deadline=pool.clock.now() + 1.8)
+        result = future.result()          # InferenceResult или DeadlineExceeded
+        future.cancel()                   # снять ещё не начатое задание
+
+        probs, names = pool.predict_probs(frames)   # пакет делится между воркерами
+
+        pool.swap_model_async("weights/new_model")  # без остановки обслуживания
+        pool.shutdown()
+    """
+
+    def __init__(
+        self,
+        settings: Settings,
+        workers: Optional[int] = None,
+        queue_size: Optional[int] = None,
+        engine_factory: Optional[Callable[[int, Settings], Any]] = None,
+        clock: Optional[Clock] = None,
+    ):
+        """
+        Инициализация пула.
+
+        Args:
+            settings: Настройки приложения.
+            workers: Количество воркеров. Если None, берётся из настроек.
+            queue_size: Размер очереди заданий. Если None, берётся из настроек.
+            engine_factory: Функция (номер воркера, настройки) → движок. По умолчанию InferenceEngine.
+            clock: Часы, по которым сверяются сроки заданий (по умолчанию реальные).
+        """
+        if engine_factory is None:
+            from vision.inference_engine import InferenceEngine
+            engine_factory = lambda index, engine_settings: InferenceEngine(engine_settings)
+
+        self._settings = settings
+        self._clock = clock if clock is not None else SYSTEM_CLOCK
+        self._engine_factory = engine_factory
+        self._workers = workers or settings.inference_workers
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size or settings.inference_queue_size)
+        self._engines = [engine_factory(index, settings) for index in range(self._workers)]
+        # Движки меняются целиком при горячей замене; _active - движок,
+        # на котором воркер выполняет текущее задание
+        self._engines_lock = threading.Lock()
+        self._active: list[Any] = [None] * self._workers
+        # Заменённые движки, на которых к концу замены ещё шло задание:
+        # их освобождает воркер, завершив задание
+        self._retired: list[Any] = []
+        self._swap_lock = threading.Lock()
+        self._swaps = 0
+        self._stats = [_WorkerStats() for _ in range(self._workers)]
+        self._stats_lock = threading.Lock()
+        self._threads: list[threading.Thread] = []
+        self._started_at: Optional[float] = None
+        self._request_ids = itertools.count(1)
+
+        self.CLASS_MAPPING = getattr(self._engines[0], "CLASS_MAPPING", {})
+
+    @property
+    def clock(self) -> Clock:
+        """Часы, по которым задаются сроки заданий."""
+        return self._clock
+
+    @property
+    def workers(self) -> int:
+        """Количество воркеров."""
+        return self._workers
+
+    def load_model(self) -> bool:
+        """
+        Загрузить модели во всех воркерах (параллельно) и запустить потоки.
+
+        Returns:
+            True если все модели загружены.
+        """
+        results = self._run_on_engines(lambda engine: engine.load_model())
+        if not all(results):
+            logger.error(f"Не удалось загрузить модель в воркерах: "
+                         f"{[i for i, ok in enumerate(results) if not ok]}")
+            return False
+
+        self._start_workers()
+        logger.info("Пул инференса: %s воркеров", self._workers)
+        return True
+
+    def warmup(self, runs: Optional[int] = None) -> bool:
+        """Прогреть все модели пула (параллельно, до начала работы)."""
+        return all(self._run_on_engines(lambda engine: engine.warmup(runs)))
+
+    def swap_model(self, model_path: Union[str, Path], reference_dir: Optional[Path] = None) -> bool:
+        """
+        Заменить модель без остановки обслуживания.
+
+        Новые движки загружаются и прогреваются, пока старые продолжают
+        выполнять задания. Затем новая модель проверяется на эталонном
+        наборе и, если точность не ниже model_swap_min_accuracy, движки
+        подменяются атомарно: каждое следующее задание берёт новый движок.
+        Старые движки освобождаются, когда завершатся уже начатые на них задания;
+        если задание не успело к таймауту, движок освобождает воркер после него.
+
+        Args:
+            model_path: Путь к новой модели.
+            reference_dir: Эталонные кадры с метками в именях. Если None, берётся из настроек.
+
+        Returns:
+            True если модель заменена.
+        """
+        with self._swap_lock:
+            settings = dataclasses.replace(self._settings, model_path=Path(model_path))
+            reference_dir = Path(reference_dir or settings.model_reference_dir)
+            logger.info("Замена модели: %s → %s", self._settings.model_path, settings.model_path)
+            start = time.perf_counter()
+
+            engines = [self._engine_factory(index, settings) for index in range(self._workers)]
+            loaded = self._run_on_engines(lambda engine: engine.load_model() and engine.warmup(), engines)
+            if not all(loaded):
+                logger.error("Замена модели отменена: новая модель не загрузилась")
+                self._release(engines)
+                return False
+
+            accuracy = self._validate(engines[0], reference_dir)
+            if accuracy is None or accuracy < settings.model_swap_min_accuracy:
+                logger.error(f"Замена модели отменена: точность на эталонном наборе {accuracy} "
+                             f"ниже {settings.model_swap_min_accuracy}")
+                self._release(engines)
+                return False
+
+            with self._engines_lock:
+                old_engines = self._engines
+                self._engines = engines
+                self._settings = settings
+                self.CLASS_MAPPING = getattr(engines[0], "CLASS_MAPPING", {})
+                self._swaps += 1
+
+            drained = self._wait_drained(old_engines, timeout=settings.inference_queue_timeout)
+            self._release_when_idle(old_engines)
+            logger.info("Модель заменена за %.1f сек (точность на эталонах %.1f%%%s)",
+                        time.perf_counter() - start, accuracy * 100,
+                        "" if drained else ", старые задания не завершились к таймауту")
+            return True
+
+    def swap_model_async(self, model_path: Union[str, Path], reference_dir: Optional[Path] = None) -> Future:
+        """
+        Запустить swap_model в фоновом потоке.
+
+        Returns:
+            Future с результатом swap_model (bool).
+        """
+        future: Future = Future()
+
+        def run() -> None:
+            try:
+                future.set_result(self.swap_model(model_path, reference_dir))
+            except Exception as e:
+                logger.error(f"Ошибка замены модели: {e}")
+                future.set_exception(e)
+
+        threading.Thread(target=run, name="ModelSwap", daemon=True).start()
+        return future
+
+    @property
+    def model_path(self) -> Path:
+        """Путь к текущей модели."""
+        return self._settings.model_path
+
+    def is_swapping(self) -> bool:
+        """Идёт замена модели."""
+        return self._swap_lock.locked()
+
+    def warmup_stats(self) -> list[dict]:
+        """Результаты прогрева каждого движка (см. InferenceEngine.warmup_stats)."""
+        return [engine.warmup_stats() for engine in self._engines if hasattr(engine, "warmup_stats")]
+
+    def resolution_stats(self) -> list[dict]:
+        """Оценка задержки по разрешениям для каждого движка (см. InferenceEngine.resolution_stats)."""
+        return [engine.resolution_stats() for engine in self._engines if hasattr(engine, "resolution_stats")]
+
+    def tta_stats(self) -> list[dict]:
+        """Метрики TTA каждого движка (см. InferenceEngine.tta_stats), пустой список - TTA выключен."""
+        stats = [engine.tta_stats() for engine in self._engines if hasattr(engine, "tta_stats")]
+        return [item for item in stats if item]
+
+    def cascade_stats(self) -> Optional[dict]:
+        """Метрики каскада, суммированные по движкам (None если каскад выключен)."""
+        stats = [engine.cascade_stats() for engine in self._engines if hasattr(engine, "cascade_stats")]
+        stats = [item for item in stats if item]
+        if not stats:
+            return None
+        answered = sum(item["answered_stage1"] for item in stats)
+        escalated = sum(item["escalated"] for item in stats)
+        requests = answered + escalated
+        return {
+            "requests": requests,
+            "answered_stage1": answered,
+            "escalated": escalated,
+            "escalation_rate": round(escalated / requests, 4) if requests else 0.0,
+        }
+
+    def is_ready(self) -> bool:
+        """Все воркеры запущены и их модели готовы."""
+        return bool(self._threads) and all(engine.is_ready() for engine in self._engines)
+
+    def submit(
+        self,
+        frame: np.ndarray,
+        deadline: Optional[float] = None,
+        request_id: Optional[str] = None,
+        timeout: Optional[float] = None,
+    ) -> Future:
+        """
+        Поставить кадр в очередь на классификацию.
+
+        Args:
+            frame: Кадр (BGR).
+            deadline: Срок по часам пула (clock.now()). Если воркер берёт задание
+                позже срока, модель не вызывается, Future завершается
+                с DeadlineExceeded.
+            request_id: Идентификатор запроса (по умолчанию - порядковый номер).
+            timeout: Сколько ждать места в очереди (None - без ожидания).
+
+        Returns:
+            Future с InferenceResult. Ещё не начатое задание можно снять через cancel().
+
+        Raises:
+            queue.Full: Очередь заполнена.
+        """
+        return self.submit_call(_predict_frame, frame, deadline=deadline, request_id=request_id, timeout=timeout)
+
+    def submit_call(
+        self,
+        call: Callable[..., tuple[str, float]],
+        *args,
+        deadline: Optional[float] = None,
+        request_id: Optional[str] = None,
+        timeout: Optional[float] = None,
+    ) -> Future:
+        """
+        Поставить в очередь произвольную классификацию call(engine, *args).
+
+        Используется, когда одному запросу соответствует несколько кадров
+        (например, набор ракурсов CameraGroup.predict).
+
+        Returns:
+            Future с InferenceResult (см. submit).
+        """
+        if request_id is None:
+            request_id = str(next(self._request_ids))
+        task = _Task(call, args, Future(), 1, deadline, request_id, self._clock.now())
+        self._queue.put(task, block=timeout is not None, timeout=timeout)
+        return task.future
+
+    def predict(self, frame: np.ndarray) -> tuple[str, float]:
+        """Синхронная классификация кадра (совместимо с InferenceEngine)."""
+        return self._enqueue("predict", (frame,), self._settings.inference_queue_timeout).result()
+
+    def predict_batch(self, frames: list) -> list[tuple[str, float]]:
+        """Пакетная классификация с разбиением между воркерами."""
+        return [result for part in self._scatter("predict_batch", frames) for result in part]
+
+    def predict_probs(self, frames: list, image_size: Optional[int] = None) -> tuple[Optional[np.ndarray], list[str]]:
+        """
+        Вероятности классов для пакета, разбитого между воркерами.
+
+        Returns:
+            Кортеж (probs, class_names) как у InferenceEngine.predict_probs.
+        """
+        parts = self._scatter("predict_probs", frames, image_size)
+        if not parts or any(probs is None for probs, _ in parts):
+            return None, []
+        return np.concatenate([probs for probs, _ in parts]), parts[0][1]
+
+    def stats(self) -> dict:
+        """Метрики пула: очередь и загрузка каждого воркера."""
+        elapsed = self._clock.now() - self._started_at if self._started_at else 0.0
+        with self._stats_lock:
+            workers = [
+                {
+                    "tasks": s.tasks,
+                    "frames": s.frames,
+                    "errors": s.errors,
+                    "expired": s.expired,
+                    "cancelled": s.cancelled,
+                    "busy_s": round(s.busy_seconds, 3),
+                    "utilisation": round(s.busy_seconds / elapsed, 3) if elapsed else 0.0,
+                }
+                for s in self._stats
+            ]
+        return {
+            "workers": workers,
+            "queued": self._queue.qsize(),
+            "uptime_s": round(elapsed, 1),
+            "model_path": str(self._settings.model_path),
+            "model_swaps": self._swaps,
+        }
+
+    def shutdown(self) -> None:
+        """Остановить воркеры (задания в очереди выполняются до конца)."""
+        for _ in self._threads:
+            self._queue.put(_STOP)
+        for thread in self._threads:
+            thread.join(timeout=10.0)
+        self._threads = []
+
+    def _start_workers(self) -> None:
+        """Запустить потоки воркеров."""
+        if self._threads:
+            return
+        self._started_at = self._clock.now()
+        self._threads = [
+            threading.Thread(target=self._worker_loop, args=(index,), name=f"inference-{index}", daemon=True)
+            for index in range(self._workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def _run_on_engines(self, action: Callable[[Any], bool], engines: Optional[list] = None) -> list[bool]:
+        """Выполнить действие на всех движках параллельно (загрузка, прогрев)."""
+        engines = engines if engines is not None else self._engines
+        results = [False] * len(engines)
+
+        def run(index: int) -> None:
+            try:
+                results[index] = action(engines[index])
+            except Exception as e:
+                logger.error(f"Воркер {index}: {e}")
+
+        threads = [threading.Thread(target=run, args=(i,), daemon=True) for i in range(len(engines))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def _validate(self, engine, reference_dir: Path) -> Optional[float]:
+        """
+        Точность движка на эталонных кадрах (рабочий путь predict).
+
+        Returns:
+            Доля верных ответов или None, если размеченных кадров нет.
+        """
+        from vision.evaluate import decode_frame, iter_samples
+
+        if not reference_dir.exists():
+            logger.error(f"Эталонный набор не найден: {reference_dir}")
+            return None
+
+        mapping = getattr(engine, "CLASS_MAPPING", {})
+        total = correct = 0
+        for sample in iter_samples(reference_dir):
+            if sample.label is None:
+                continue
+            frame, _ = decode_frame(sample.payload, self._settings.image_size)
+            if frame is None:
+                continue
+            class_name, _ = engine.predict(frame)
+            total += 1
+            correct += class_name == mapping.get(sample.label, sample.label)
+
+        if total == 0:
+            logger.error(f"В эталонном наборе {reference_dir} нет размеченных кадров")
+            return None
+        return correct / total
+
+    def _wait_drained(self, engines: list, timeout: float) -> bool:
+        """Дождаться завершения заданий, уже начатых на движках engines."""
+        return self._clock.wait_until(
+            lambda: not any(active is not None and any(active is engine for engine in engines)
+                            for active in list(self._active)),
+            timeout=timeout,
+            interval=0.005,
+        )
+
+    def _release_when_idle(self, engines: list) -> None:
+        """Освободить свободные движки сразу, занятые - после завершения их задания (воркером)."""
+        with self._engines_lock:
+            busy = [engine for engine in engines if any(active is engine for active in self._active)]
+            self._retired.extend(busy)
+        if busy:
+            logger.warning("Замена модели: %d старых движков освободятся после текущих заданий", len(busy))
+        self._release([engine for engine in engines if not any(engine is item for item in busy)])
+
+    @staticmethod
+    def _release(engines: list) -> None:
+        """Освободить модели движков."""
+        for engine in engines:
+            release = getattr(engine, "release", None)
+            if release is not None:
+                release()
+
+    def _enqueue(self, method: str, args: tuple, timeout: Optional[float]) -> Future:
+        """Поставить вызов метода движка в очередь (результат - как у движка)."""
+        frames = len(args[0]) if method in ("predict_batch", "predict_probs") else 1
+        task = _Task(method, args, Future(), frames, None, None, self._clock.now())
+        self._queue.put(task, block=timeout is not None, timeout=timeout)
+        return task.future
+
+    def _scatter(self, method: str, frames: list, *extra) -> list:
+        """Разбить пакет на части по числу воркеров и собрать результаты по порядку."""
+        if not frames:
+            return []
+        parts = np.array_split(np.arange(len(frames)), min(self._workers, len(frames)))
+        timeout = self._settings.inference_queue_timeout
+        futures = [self._enqueue(method, ([frames[i] for i in part], *extra), timeout) for part in parts]
+        return [future.result() for future in futures]
+
+    def _worker_loop(self, index: int) -> None:
+        """Цикл воркера: брать задания из общей очереди и выполнять на своём движке."""
+        while True:
+            task = self._queue.get()
+            if task is _STOP:
+                break
+
+            if not task.future.set_running_or_notify_cancel():
+                with self._stats_lock:
+                    self._stats[index].cancelled += 1
+                continue
+
+            start = self._clock.now()
+            if task.deadline is not None and start >= task.deadline:
+                with self._stats_lock:
+                    self._stats[index].expired += 1
+                logger.debug("Запрос %s просрочен в очереди на %.0f мс, пропущен",
+                             task.request_id, (start - task.deadline) * 1000)
+                task.future.set_exception(DeadlineExceeded(task.request_id))
+                continue
+
+            # Движок берётся на каждое задание: после горячей замены - уже новый
+            with self._engines_lock:
+                engine = self._engines[index]
+                self._active[index] = engine
+            try:
+                if isinstance(task.call, str):
+                    result = getattr(engine, task.call)(*task.args)
+                else:
+                    result = task.call(engine, *task.args)
+            except Exception as e:
+                with self._stats_lock:
+                    self._stats[index].errors += 1
+                task.future.set_exception(e)
+                continue
+            finally:
+                with self._engines_lock:
+                    self._active[index] = None
+                    retired = (any(item is engine for item in self._retired)
+                               and not any(active is engine for active in self._active))
+                    if retired:
+                        self._retired = [item for item in self._retired if item is not engine]
+                if retired:
+                    logger.info("Воркер %d: старый движок освобождён после задания", index)
+                    self._release([engine])
+                busy = self._clock.now() - start
+                with self._stats_lock:
+                    stats = self._stats[index]
+                    stats.tasks += 1
+                    stats.busy_seconds += busy
+                    stats.frames += task.frames
+
+            if task.request_id is not None:
+                class_name, confidence = result
+                result = InferenceResult(
+                    request_id=task.request_id,
+                    class_name=class_name,
+                    confidence=confidence,
+                    queued_ms=round((start - task.enqueued_at) * 1000, 2),
+                    inference_ms=round(busy * 1000, 2),
+                )
+            task.future.set_result(result)
+
+
+def _predict_frame(engine, frame: np.ndarray) -> tuple[str, float]:
+    """Классификация одного кадра (задание submit)."""
+    return engine.predict(frame)
@@ -4,9 +4,18 @@ Inference Service - WebSocket клиент для классификации о
 
 Протокол:
     Подключение → отправка "vision" (имя клиента)
+    Получение {"command": "classify", "id": ...} → инференс → {"id": ..., "result": ..., ...}
     Получение "bottle_exist" → выполнение инференса → отправка "bottle" или "bank"
     Получение "bank_exist" → выполнение инференса → отправка "bottle" или "bank"
     Получение "none" → отправка "none"
+    Получение {"command": "camera_health"} → метрики камеры (JSON)
+    Получение {"command": "status"} → {"status": "warming" | "ready" | "failed", ...}
+    Получение {"command": "swap_model", "model_path": ...} → замена модели в фоне
+
+Модель загружается и прогревается в фоне: клиент подключается сразу,
+отправляет {"status": "warming"} и до готовности отвечает "none".
+
+Формат JSON запросов и ответов описан в core/vision_protocol.py.
 
 Использование:
     python inference_service.py              # Запуск WebSocket клиента
@@ -18,7 +27,9 @@ import base64
 import json
 import os
 import sys
-import time
+import queue
+import threading
+from concurrent.futures import Future
 from datetime import datetime
 from pathlib import Path
 from typing import Optional
@@ -28,18 +39,31 @@ os.environ.setdefault("OPENCV_LOG_LEVEL", "ERROR")
 os.environ.setdefault("OPENCV_VIDEOIO_DEBUG", "0")
 
 import cv2
+import numpy as np
 import websockets
 from websockets.exceptions import ConnectionClosed
 
+from vision.camera_discovery import CameraDiscovery
+from vision.camera_group import CameraGroup
 from vision.camera_manager import CameraManager
+from vision.camera_supervisor import CameraSupervisor
+from core.clock import SYSTEM_CLOCK, Clock
 from core.config import Settings, get_settings
+from core.vision_protocol import CLASSIFY_COMMAND, VisionReply
+from vision.frame_analysis import MotionState
 from vision.inference_engine import InferenceEngine
-from core.logging_config import get_logger, setup_logging
+from vision.inference_pool import DeadlineExceeded, InferencePool, InferenceResult
+from vision.startup_profile import StartupProfile
+from core.flight_recorder import KIND_INFERENCE, KIND_WS_IN, KIND_WS_OUT, FlightRecorder, compact_message
+from core.logging_config import get_logger, log_timing, setup_logging
 
-# Инициализация логирования
-setup_logging()
 logger = get_logger(__name__)
 
+# Состояния сервиса (сообщение {"status": ...})
+STATUS_WARMING = "warming"
+STATUS_READY = "ready"
+STATUS_FAILED = "failed"
+
 
 class InferenceClient:
     """
@@ -47,23 +71,62 @@ class InferenceClient:
 
     Протокол:
         Подключение → отправка "vision" (имя клиента)
+        Получение {"command": "classify", "id": ...} → инференс → JSON ответ с тем же id
         Получение "bottle_exist" → инференс → отправка "bottle" или "bank"
         Получение "bank_exist" → инференс → отправка "bottle" или "bank"
         Получение "none" → отправка "none"
     """
 
-    def __init__(self, settings: Settings):
+    # Доля оставшегося срока запроса, которую можно ждать стабильную сцену:
+    # остальное время остаётся на инференс
+    STABLE_WAIT_SHARE = 0.25
+
+    def __init__(self, settings: Settings, clock: Optional[Clock] = None):
         """
         Инициализация клиента.
 
         Args:
             settings: Настройки приложения.
+            clock: Часы для сроков запросов, камер и отметок ответов (по умолчанию реальные).
         """
         self._settings = settings
-        self._camera = CameraManager(settings)
-        self._engine = InferenceEngine(settings)
+        self._clock = clock if clock is not None else SYSTEM_CLOCK
+        self._profile = StartupProfile()
+        self._profile.mark("imports")
+        self._status = STATUS_WARMING
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        # Бортовой самописец: сообщения и результаты инференса
+        self._recorder = FlightRecorder.from_settings(settings, "vision", clock=self._clock)
+
+        # Вызовы модели идут через очередь пула (inference_workers экземпляров
+        # модели) и не блокируют event loop; просроченные запросы снимаются
+        # с очереди, не занимая модель
+        self._engine = InferencePool(settings, clock=self._clock)
         self._running = False
         self._websocket = None
+        # Запросы classify выполняются параллельно с приёмом следующих сообщений
+        self._classify_tasks: set[asyncio.Task] = set()
+
+        # Несколько ракурсов: основная камера группы используется как одиночная
+        self._camera_group: Optional[CameraGroup] = None
+        if settings.camera_group:
+            self._camera_group = CameraGroup(settings, settings.camera_group, clock=self._clock)
+            self._camera = self._camera_group.primary
+        else:
+            self._camera = CameraManager(settings, clock=self._clock)
+        self._discovery = CameraDiscovery(settings)
+
+        # Камера живёт независимо от WebSocket соединения
+        self._supervisor = CameraSupervisor(
+            settings, self._camera_group or self._camera, self._discovery, clock=self._clock
+        )
+
+        # Спекулятивная классификация стабильной занятой сцены:
+        # (stable_since, кадр, время кадра, Future)
+        self._speculative: Optional[tuple[float, np.ndarray, float, Future]] = None
+        self._speculative_lock = threading.Lock()
+        if settings.motion_detection and settings.speculative_inference:
+            self._camera.add_motion_listener(self._on_motion_event)
 
     def initialize(self) -> bool:
         """
@@ -76,9 +139,11 @@ class InferenceClient:
 
         if not self._engine.load_model():
             return False
+        self._profile.mark("model_loaded")
 
         if not self._engine.warmup():
             return False
+        self._profile.mark("model_warmed")
 
         # Создаём директорию для сохранения кадров
         if self._settings.save_frames:
@@ -88,17 +153,23 @@ class InferenceClient:
         return True
 
     async def start(self) -> None:
-        """Запустить WebSocket клиент с автоматическим переподключением."""
-        if not self._engine.is_ready():
-            logger.error("Модель не готова")
-            return
+        """
+        Запустить WebSocket клиент с автоматическим переподключением.
 
+        Модель загружается в фоновом потоке параллельно с открытием
+        камеры и подключением; до готовности сервис сообщает "warming".
+        """
         uri = f"ws://{self._settings.websocket_host}:{self._settings.websocket_port}"
         self._running = True
+        self._loop = asyncio.get_running_loop()
+
+        # Камера открывается один раз и переживает переподключения
+        self._supervisor.start()
+        threading.Thread(target=self._load_model, name="ModelLoader", daemon=True).start()
 
         while self._running:
             try:
-                logger.info(f"Подключение к {uri}...")
+                logger.info("Подключение к %s...", uri)
                 async with websockets.connect(uri) as websocket:
                     self._websocket = websocket
                     logger.debug("Подключено, отправка имени клиента 'vision'...")
@@ -106,37 +177,13 @@ class InferenceClient:
                     # Отправляем имя клиента
                     await websocket.send("vision")
                     logger.info("Зарегистрирован как 'vision', ожидание запросов...")
+                    self._profile.mark("connected")
+                    await websocket.send(json.dumps(self._status_payload()))
 
-                    # Открываем камеру и запускаем захват (с попыткой разных индексов)
-                    if not self._camera.is_open():
-                        camera_opened = False
-                        camera_idx_used = None
-                        # Пробуем разные индексы камеры
-                        for camera_idx in range(5):  # Пробуем индексы 0-4
-                            logger.debug(f"Попытка открыть камеру с индексом {camera_idx}...")
-                            if self._camera.open(camera_index=camera_idx):
-                                camera_opened = True
-                                camera_idx_used = camera_idx
-                                # Обновляем индекс в настройках для дальнейшего использования
-                                self._settings.camera_index = camera_idx
-                                logger.info(f"Камера успешно открыта с индексом {camera_idx}")
-                                break
-                            else:
-                                # Сбрасываем состояние камеры перед следующей попыткой
-                                self._camera.close()
-
-                        if not camera_opened:
-                            logger.error("Не удалось открыть камеру ни с одним индексом (0-4)")
-                            await asyncio.sleep(self._settings.websocket_reconnect_delay)
-                            continue
-
-                    if not self._camera.start_capture():
-                        logger.error("Не удалось запустить захват кадров")
-                        self._camera.close()
-                        await asyncio.sleep(self._settings.websocket_reconnect_delay)
-                        continue
-
-                    logger.info("Камера открыта, захват запущен")
+                    if self._supervisor.is_ready():
+                        logger.info("Камера готова, в буфере %s кадров", self._camera.buffer_size)
+                    else:
+                        logger.warning("Камера ещё не готова, запросы до готовности получат 'none'")
 
                     # Основной цикл обработки сообщений
                     while self._running:
@@ -149,6 +196,7 @@ class InferenceClient:
                             
                             response = await self._handle_message(message)
                             if response:
+                                self._recorder.record(KIND_WS_OUT, compact_message(response))
                                 await websocket.send(response)
 
                         except asyncio.TimeoutError:
@@ -166,9 +214,6 @@ class InferenceClient:
             except Exception as e:
                 logger.error(f"Ошибка подключения: {e}")
             
-            # Закрываем камеру при разрыве соединения
-            self._camera.stop_capture()
-            self._camera.close()
 
             if self._running:
                 await asyncio.sleep(self._settings.websocket_reconnect_delay)
@@ -179,13 +224,83 @@ class InferenceClient:
         """Остановить клиент."""
         self._running = False
 
+    def _load_model(self) -> None:
+        """
+        Загрузить и прогреть модель (фоновый поток), затем отметить готовность.
+
+        Время до готовности отсчитывается от старта процесса: оно
+        включает импорты, загрузку и прогрев модели и открытие камеры.
+        """
+        if not self.initialize():
+            logger.error("Не удалось загрузить модель, остановка сервиса")
+            self._set_status(STATUS_FAILED)
+            self._running = False
+            return
+
+        self._set_status(STATUS_READY)
+        if self._supervisor.wait_ready(timeout=self._settings.camera_reopen_max_delay):
+            self._profile.mark("camera_ready")
+        self._profile.mark("ready")
+        logger.info("Сервис готов за %.0f мс от старта процесса (%s)",
+                    self._profile.elapsed_ms('ready'), self._profile.summary())
+
+    def _set_status(self, status: str) -> None:
+        """Сменить состояние сервиса и сообщить его серверу."""
+        self._status = status
+        websocket, loop = self._websocket, self._loop
+        if websocket is None or loop is None or loop.is_closed():
+            return
+        asyncio.run_coroutine_threadsafe(
+            websocket.send(json.dumps(self._status_payload())), loop
+        ).add_done_callback(lambda future: future.exception())
+
+    def _start_model_swap(self, model_path: Optional[str]) -> dict:
+        """
+        Запустить горячую замену модели (запросы обслуживаются старой моделью до переключения).
+
+        Args:
+            model_path: Путь к новой модели.
+
+        Returns:
+            Ответ на команду swap_model.
+        """
+        if not model_path:
+            return {"error": "model_path_required"}
+        if self._status != STATUS_READY or self._engine.is_swapping():
+            return {"error": "busy", "status": self._status, "swapping": self._engine.is_swapping()}
+
+        future = self._engine.swap_model_async(model_path)
+
+        def done(finished: Future) -> None:
+            swapped = not finished.exception() and finished.result()
+            logger.info("Замена модели на %s: %s", model_path, 'выполнена' if swapped else 'отменена')
+            self._set_status(self._status)  # сообщить серверу текущую модель
+
+        future.add_done_callback(done)
+        return {"status": "swapping", "model_path": model_path}
+
+    def _status_payload(self) -> dict:
+        """Состояние сервиса: модель, камера и фазы запуска."""
+        return {
+            "status": self._status,
+            "model_ready": self._engine.is_ready(),
+            "model_path": str(self._engine.model_path),
+            "swapping": self._engine.is_swapping(),
+            "camera": self._supervisor.health,
+            "startup_ms": self._profile.phases(),
+            "warmup": self._engine.warmup_stats(),
+            "cascade": self._engine.cascade_stats(),
+            "resolutions": self._engine.resolution_stats(),
+            "tta": self._engine.tta_stats(),
+        }
+
     async def _handle_message(self, message: str) -> Optional[str]:
         """
         Обработка сообщения от сервера.
 
         Поддерживает форматы:
         - Строки: "bottle_exist", "bank_exist", "none"
-        - JSON: {"command": "get_photo"}
+        - JSON: {"command": "classify"}, {"command": "get_photo"}, {"command": "camera_health"}
 
         Args:
             message: Сообщение от сервера.
@@ -193,16 +308,39 @@ class InferenceClient:
         Returns:
             Ответ клиенту или None если ответ не требуется.
         """
-        logger.debug(f"Получено сообщение: {message}")
+        logger.debug("Получено сообщение: %s", message)
+        self._recorder.record(KIND_WS_IN, compact_message(message))
 
         # Попытка парсинга JSON команды
         try:
             data = json.loads(message)
             command = data.get("command")
 
+            if command == CLASSIFY_COMMAND:
+                # Ответ отправляет сама задача: запросы можно слать не дожидаясь ответов
+                task = asyncio.create_task(self._reply_classify(data))
+                self._classify_tasks.add(task)
+                task.add_done_callback(self._classify_tasks.discard)
+                return None
+
             if command == "get_photo":
                 return await self._handle_get_photo()
 
+            if command == "camera_health":
+                return json.dumps(self._supervisor.stats())
+
+            if command == "status":
+                return json.dumps(self._status_payload())
+
+            if command == "swap_model":
+                return json.dumps(self._start_model_swap(data.get("model_path")))
+
+            if command == "dump_flight_recorder":
+                path = self._recorder.dump_async(
+                    data.get("reason", "request"), seconds=data.get("seconds"), force=bool(data.get("force"))
+                )
+                return json.dumps({"flight_recorder": str(path) if path else None})
+
             logger.warning(f"Неизвестная JSON команда: {command}")
             return json.dumps({"error": "unknown_command"})
 
@@ -218,45 +356,121 @@ class InferenceClient:
         if message in ("bottle_exist", "bank_exist"):
             return await self._handle_inference()
 
-        logger.debug(f"Неизвестное сообщение: {message}")
+        logger.debug("Неизвестное сообщение: %s", message)
         return None
 
-    async def _handle_inference(self) -> str:
+    async def _reply_classify(self, request: dict) -> None:
+        """
+        Выполнить JSON запрос classify и отправить ответ с его id.
+
+        Срок запроса - меньшее из inference_deadline и timeout_ms запроса.
+        Если результат к сроку не получен, отправляется "none" с ошибкой
+        deadline_exceeded, во время прогрева модели - с ошибкой warming.
+
+        Args:
+            request: Разобранный JSON запрос.
+        """
+        received_at = self._clock.time()
+        request_id = str(request.get("id", ""))
+        timeout = self._settings.inference_deadline
+        if request.get("timeout_ms"):
+            timeout = min(timeout, float(request["timeout_ms"]) / 1000)
+
+        if self._status != STATUS_READY:
+            # Модель ещё прогревается (или не загрузилась): отвечаем сразу
+            reply = VisionReply(result="none", id=request_id, error=self._status)
+        else:
+            outcome = await self._run_inference(self._clock.now() + timeout, request_id or None)
+            if outcome is None:
+                reply = VisionReply(result="none", id=request_id, error="deadline_exceeded")
+                self._recorder.dump_async("deadline_exceeded")
+            else:
+                result, confidence, inference = outcome
+                reply = VisionReply(
+                    result=result,
+                    id=request_id,
+                    confidence=round(confidence, 4),
+                    model_ms=inference.inference_ms if inference else None,
+                    queue_ms=inference.queued_ms if inference else None,
+                )
+        reply.received_at = round(received_at, 6)
+        reply.replied_at = round(self._clock.time(), 6)
+
+        message = reply.to_json()
+        self._recorder.record(KIND_WS_OUT, message)
+        websocket = self._websocket
+        if websocket is None:
+            return
+        try:
+            await websocket.send(message)
+        except ConnectionClosed:
+            logger.warning(f"Ответ на запрос {request_id} не отправлен: соединение закрыто")
+
+    async def _handle_inference(self) -> Optional[str]:
+        """
+        Обработать строковый запрос классификации (режим совместимости).
+
+        На запрос отводится inference_deadline секунд (меньше таймаута
+        ожидания ответа в Application). Если срок истёк, ответ не
+        отправляется: иначе Application примет устаревший результат
+        за ответ на следующий запрос.
+
+        Returns:
+            "bottle", "bank", "none" или None, если срок запроса истёк.
+        """
+        outcome = await self._run_inference(self._clock.now() + self._settings.inference_deadline)
+        return outcome[0] if outcome is not None else None
+
+    async def _run_inference(
+        self, deadline: float, request_id: Optional[str] = None
+    ) -> Optional[tuple[str, float, Optional[InferenceResult]]]:
         """
         Выполнить мульти-инференс (3 кадра) и вернуть результат по большинству.
 
+        Args:
+            deadline: Срок запроса по часам клиента (clock.now()).
+            request_id: Идентификатор запроса (для логов и результата пула).
+
         Returns:
-            "bottle", "bank" или "none".
+            Кортеж ("bottle" | "bank" | "none", средняя уверенность,
+            InferenceResult последнего кадра) или None, если срок истёк.
         """
-        # Фиксируем время начала распознавания
-       
-        
-        if not self._camera.is_open():
-            logger.warning("Камера не открыта")
-            return "none"
+        # Во время прогрева модели и восстановления камеры отвечаем сразу
+        if not self._engine.is_ready():
+            logger.warning(f"Модель не готова ({self._status})")
+            return "none", 0.0, None
+        if not self._supervisor.is_ready():
+            logger.warning(f"Камера не готова ({self._supervisor.health})")
+            return "none", 0.0, None
 
         num_frames = 1#3
         results = []
         confidences = []
+        inference = None
 
         for i in range(num_frames):
-            # Получаем кадр
-            frame = self._camera.get_frame()
+            # Получаем кадр (самый качественный кадр стабильной сцены с объектом)
+            frame, timestamp, speculative = await self._acquire_frame(deadline)
             if frame is None:
-                frame = self._camera.capture_single_frame()
-                if frame is None:
-                    logger.warning(f"Не удалось получить кадр {i+1}/{num_frames}")
-                    continue
+                logger.warning(f"Не удалось получить кадр {i+1}/{num_frames}")
+                continue
 
             # Сохраняем кадр если нужно
             if self._settings.save_frames:
                 self._save_frame(frame, suffix=f"_inf{i+1}")
 
-            # Выполняем инференс
-            inference_start_time = time.time()
-            class_name, confidence = self._engine.predict(frame)
-            inference_delta_ms = (time.time() - inference_start_time) * 1000
-            print(f"[TIMING] Дельта распознавания: {inference_delta_ms:.2f}")
+            # Выполняем инференс (или берём готовый спекулятивный результат)
+            inference_start_time = self._clock.now()
+            inference = await self._classify(frame, timestamp, speculative, deadline, request_id)
+            if inference is None:
+                return None
+            class_name, confidence = inference.class_name, inference.confidence
+            self._recorder.record(KIND_INFERENCE, {
+                "id": request_id, "class": class_name, "confidence": round(confidence, 4),
+                "queue_ms": inference.queued_ms, "model_ms": inference.inference_ms,
+            })
+            inference_delta_ms = (self._clock.now() - inference_start_time) * 1000
+            log_timing("inference", inference_delta_ms, id=request_id)
 
             # Маппим результат
             if class_name == "PET":
@@ -268,11 +482,11 @@ class InferenceClient:
 
             results.append(result)
             confidences.append(confidence)
-            logger.debug(f"Кадр {i+1}/{num_frames}: {class_name} ({confidence:.3f}) -> {result}")
+            logger.debug("Кадр %d/%d: %s (%.3f) -> %s", i + 1, num_frames, class_name, confidence, result)
 
         if not results:
             logger.warning("Не удалось получить ни одного кадра")
-            return "none"
+            return "none", 0.0, None
 
         # Голосование по большинству
         from collections import Counter
@@ -283,8 +497,176 @@ class InferenceClient:
         # Вычисляем дельту времени между запросом и завершением распознавания
         
 
-        logger.info(f"Итог: {final_result} (голосов: {count}/{len(results)}, средняя уверенность: {avg_confidence:.3f})")
-        return final_result
+        logger.info("Итог: %s (голосов: %s/%s, средняя уверенность: %.3f)",
+                    final_result, count, len(results), avg_confidence)
+        return final_result, avg_confidence, inference
+
+    async def _acquire_frame(
+        self, deadline: float
+    ) -> tuple[Optional[np.ndarray], Optional[float], Optional[Future]]:
+        """
+        Получить кадр для инференса.
+
+        Если детектор движения включён, ждёт стабильную сцену с объектом
+        (пустые кадры пропускаются), но не дольше stable_wait_timeout и
+        STABLE_WAIT_SHARE оставшегося срока запроса. Из кадров за последние
+        best_frame_window секунд берётся самый резкий и правильно экспонированный.
+        Если для этого периода стабильности уже идёт спекулятивная
+        классификация, возвращаются её кадр и Future.
+
+        Args:
+            deadline: Срок запроса по часам клиента (clock.now()).
+
+        Returns:
+            Кортеж (кадр или None, время захвата, Future спекулятивного результата или None).
+        """
+        if self._settings.motion_detection:
+            wait = min(self._settings.stable_wait_timeout,
+                       self.STABLE_WAIT_SHARE * max(0.0, deadline - self._clock.now()))
+            loop = asyncio.get_running_loop()
+            frame, timestamp = await loop.run_in_executor(None, self._camera.wait_for_stable_frame, wait)
+            if frame is not None:
+                with self._speculative_lock:
+                    speculative = self._speculative
+                if speculative is not None and speculative[0] == timestamp:
+                    return speculative[1:]
+            else:
+                state = self._camera.get_motion_state()
+                logger.debug("Стабильный кадр с объектом не дождались (occupied=%s, stable=%s), берём последний",
+                             state.occupied, state.stable)
+
+        frame, timestamp, quality = self._camera.best_frame(self._settings.best_frame_window)
+        if frame is None:
+            frame = self._camera.capture_single_frame()
+        elif quality is not None:
+            logger.debug("Качество кадра: резкость %.1f, яркость %.0f", quality.sharpness, quality.brightness)
+        return frame, timestamp, None
+
+    async def _classify(
+        self,
+        frame: np.ndarray,
+        timestamp: Optional[float],
+        speculative: Optional[Future],
+        deadline: float,
+        request_id: Optional[str] = None,
+    ) -> Optional[InferenceResult]:
+        """
+        Получить результат классификации кадра к сроку запроса.
+
+        Args:
+            frame: Кадр основной камеры.
+            timestamp: Время захвата кадра.
+            speculative: Future уже идущей спекулятивной классификации этого кадра.
+            deadline: Срок запроса по часам клиента (clock.now()).
+            request_id: Идентификатор запроса.
+
+        Returns:
+            InferenceResult или None, если срок истёк (результат отбрасывается).
+        """
+        if speculative is not None:
+            future = speculative
+            logger.debug("Использован спекулятивный результат")
+        else:
+            try:
+                future = self._engine.submit_call(
+                    self._predict, frame, timestamp, deadline, deadline=deadline, request_id=request_id
+                )
+            except queue.Full:
+                logger.warning("Очередь инференса заполнена, запрос отклонён")
+                return InferenceResult(request_id or "", "NONE", 0.0, 0.0, 0.0)
+
+        try:
+            result = await asyncio.wait_for(
+                asyncio.wrap_future(future), timeout=max(0.0, deadline - self._clock.now())
+            )
+        except DeadlineExceeded as e:
+            logger.warning(f"Запрос {e.request_id} просрочен в очереди, ответ не отправляется")
+            return None
+        except asyncio.TimeoutError:
+            # Ещё не начатое задание снимается с очереди (cancel через wrap_future),
+            # уже идущее завершится, но его результат никуда не попадёт
+            logger.warning(f"Срок запроса истёк ({self._settings.inference_deadline:.1f} сек), "
+                           f"ответ не отправляется")
+            return None
+
+        logger.debug("Запрос %s: очередь %.1f мс, модель %.1f мс",
+                     result.request_id, result.queued_ms, result.inference_ms)
+        return result
+
+    def _predict(
+        self, engine, frame: np.ndarray, timestamp: Optional[float], deadline: Optional[float] = None
+    ) -> tuple[str, float]:
+        """
+        Классифицировать кадр (выполняется в воркере пула инференса).
+
+        При группе камер к кадру основной камеры добавляются кадры других
+        ракурсов, снятые в пределах допуска, и все они идут одним пакетом.
+        Разрешение входа выбирается по остатку срока запроса и
+        latency_budget_ms (см. InferenceEngine.select_resolution).
+
+        Args:
+            engine: Движок воркера.
+            frame: Кадр основной камеры.
+            timestamp: Время захвата кадра (None - кадр не из буфера).
+            deadline: Срок запроса по часам клиента (clock.now()) (None - спекулятивный запуск).
+
+        Returns:
+            Кортеж (class_name, confidence).
+        """
+        image_size = engine.select_resolution(self._latency_budget(deadline))
+        if self._camera_group is not None and timestamp is not None:
+            frame_set = self._camera_group.get_frame_set(
+                timeout=self._settings.camera_sync_tolerance * 4, reference=timestamp
+            )
+            if frame_set is not None:
+                frame_set.frames[0] = frame
+                logger.debug("Набор из %d ракурсов, разброс %.1f мс", len(frame_set.frames), frame_set.skew_ms)
+                return self._camera_group.predict(engine, frame_set, image_size=image_size)
+            logger.warning("Ракурсы не синхронизированы, классификация по основной камере")
+        return engine.predict(frame, image_size=image_size)
+
+    def _latency_budget(self, deadline: Optional[float]) -> Optional[float]:
+        """
+        Бюджет задержки модели на запрос, мс.
+
+        Args:
+            deadline: Срок запроса по часам клиента (clock.now()).
+
+        Returns:
+            Меньшее из latency_budget_ms и остатка срока, None - без ограничения.
+        """
+        budgets = []
+        if self._settings.latency_budget_ms > 0:
+            budgets.append(self._settings.latency_budget_ms)
+        if deadline is not None:
+            budgets.append(max(0.0, (deadline - self._clock.now()) * 1000))
+        return min(budgets) if budgets else None
+
+    def _on_motion_event(self, event: str, state: MotionState) -> None:
+        """
+        Обработчик событий детектора движения (поток захвата).
+
+        Когда сцена с объектом стабилизировалась, заранее запускает
+        классификацию лучшего кадра, не дожидаясь запроса.
+        """
+        logger.debug("Камера: %s (occupied=%s, stable=%s)", event, state.occupied, state.stable)
+
+        if event not in ("stable", "occupied") or not (state.stable and state.occupied):
+            return
+        if not self._engine.is_ready():
+            return
+
+        _, stable_since = self._camera.wait_for_stable_frame(timeout=0)
+        frame, timestamp, _ = self._camera.best_frame(self._settings.best_frame_window)
+        if stable_since is None or frame is None:
+            return
+
+        try:
+            future = self._engine.submit_call(self._predict, frame, timestamp)
+        except queue.Full:
+            return
+        with self._speculative_lock:
+            self._speculative = (stable_since, frame, timestamp, future)
 
     async def _handle_get_photo(self) -> str:
         """
@@ -295,9 +677,9 @@ class InferenceClient:
         Returns:
             JSON с photo_base64 или error.
         """
-        if not self._camera.is_open():
-            logger.warning("Камера не открыта")
-            return json.dumps({"error": "camera_unavailable"})
+        if not self._supervisor.is_ready():
+            logger.warning(f"Камера не готова ({self._supervisor.health})")
+            return json.dumps({"error": "camera_unavailable", "health": self._supervisor.health})
 
         # Получаем кадр
         frame = self._camera.get_frame()
@@ -340,7 +722,7 @@ class InferenceClient:
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
             filename = self._settings.output_dir / f"{timestamp}{suffix}.jpg"
             cv2.imwrite(str(filename), frame)
-            logger.debug(f"Сохранено: {filename}")
+            logger.debug("Сохранено: %s", filename)
             return filename
         except Exception as e:
             logger.error(f"Ошибка сохранения кадра: {e}")
@@ -348,8 +730,8 @@ class InferenceClient:
 
     def _cleanup(self) -> None:
         """Освободить ресурсы."""
-        self._camera.stop_capture()
-        self._camera.close()
+        self._supervisor.stop()
+        self._engine.shutdown()
         logger.info("Остановлен")
 
 
@@ -394,13 +776,13 @@ def run_interactive_camera(settings: Settings) -> None:
                     continue
 
                 class_name, confidence = engine.predict(frame)
-                logger.info(f"Результат: {class_name} ({confidence:.3f})")
+                logger.info("Результат: %s (%.3f)", class_name, confidence)
 
                 # Сохраняем кадр
                 timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
                 filename = settings.output_dir / f"{timestamp}_{class_name}.jpg"
                 cv2.imwrite(str(filename), frame)
-                logger.debug(f"Сохранено: {filename}")
+                logger.debug("Сохранено: %s", filename)
             else:
                 print("Неизвестная команда. Используйте 'c' или 'q'")
 
@@ -435,6 +817,7 @@ def parse_args():
 
 def main():
     """Точка входа."""
+    setup_logging()
     args = parse_args()
     settings = get_settings()
 
@@ -448,12 +831,11 @@ def main():
         run_interactive_camera(settings)
     else:
         client = InferenceClient(settings)
-        if client.initialize():
-            try:
-                asyncio.run(client.start())
-            except KeyboardInterrupt:
-                logger.info("Прервано пользователем")
-                client.stop()
+        try:
+            asyncio.run(client.start())
+        except KeyboardInterrupt:
+            logger.info("Прервано пользователем")
+            client.stop()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,142 @@
+"""
+ResultCache - кэш результатов инференса по перцептивному хэшу кадра.
+
+Обеспечивает:
+- Дешёвый dHash кадра (прореживание + уменьшение до hash_size x hash_size)
+- Поиск почти одинаковых кадров по расстоянию Хэмминга
+- LRU вытеснение и ограничение времени жизни записи (TTL)
+- Метрики попаданий
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+import cv2
+import numpy as np
+
+
+def perceptual_hash(frame: np.ndarray, hash_size: int = 16) -> int:
+    """
+    Вычислить разностный хэш (dHash) кадра.
+
+    Кадр сначала прореживается срезом (view без копирования полного кадра),
+    затем уменьшается до (hash_size + 1) x hash_size. Бит хэша - сравнение
+    яркости соседних по горизонтали пикселей.
+
+    Args:
+        frame: Изображение BGR (или grayscale).
+        hash_size: Сторона сетки хэша (hash_size² бит).
+
+    Returns:
+        Хэш как целое число.
+    """
+    height, width = frame.shape[:2]
+    step = max(1, min(height, width) // (hash_size * 8))
+    small = np.ascontiguousarray(frame[::step, ::step])
+    small = cv2.resize(small, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    if small.ndim == 3:
+        small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+    bits = small[:, 1:] > small[:, :-1]
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def hamming_distance(a: int, b: int) -> int:
+    """Количество различающихся бит двух хэшей."""
+    return bin(a ^ b).count("1")
+
+
+class ResultCache:
+    """
+    LRU кэш результатов по перцептивному хэшу.
+
+    Использование:
+        cache = ResultCache(max_size=32, max_distance=4, ttl=2.0)
+        key = perceptual_hash(frame)
+        result = cache.lookup(key)
+        if result is None:
+            result = engine_predict(frame)
+            cache.store(key, result)
+    """
+
+    def __init__(self, max_size: int = 32, max_distance: int = 4, ttl: float = 2.0):
+        """
+        Инициализация кэша.
+
+        Args:
+            max_size: Максимальное количество записей.
+            max_distance: Максимальное расстояние Хэмминга для попадания.
+            ttl: Время жизни записи в секундах.
+        """
+        self._max_size = max_size
+        self._max_distance = max_distance
+        self._ttl = ttl
+        self._entries: OrderedDict = OrderedDict()  # hash → (result, stored_at)
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, key: int) -> Optional[Any]:
+        """
+        Найти результат для кадра с близким хэшем.
+
+        Args:
+            key: Перцептивный хэш кадра.
+
+        Returns:
+            Сохранённый результат или None.
+        """
+        now = time.monotonic()
+        with self._lock:
+            best_key, best_distance = None, self._max_distance + 1
+            expired = []
+            for stored_key, (_, stored_at) in self._entries.items():
+                if now - stored_at > self._ttl:
+                    expired.append(stored_key)
+                    continue
+                distance = hamming_distance(key, stored_key)
+                if distance < best_distance:
+                    best_key, best_distance = stored_key, distance
+                    if distance == 0:
+                        break
+            for stored_key in expired:
+                del self._entries[stored_key]
+
+            if best_key is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(best_key)
+            self.hits += 1
+            return self._entries[best_key][0]
+
+    def store(self, key: int, result: Any) -> None:
+        """
+        Сохранить результат для кадра.
+
+        Args:
+            key: Перцептивный хэш кадра.
+            result: Результат инференса.
+        """
+        with self._lock:
+            self._entries[key] = (result, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Удалить все записи (например, после смены модели)."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        """Метрики кэша: попадания, промахи, доля попаданий, размер."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+                "size": len(self._entries),
+            }
@@ -0,0 +1,144 @@
+"""
+StartupProfile - замер времени запуска inference сервиса.
+
+Обеспечивает:
+- Отметки фаз запуска относительно старта процесса (импорты, подключение,
+  камера, загрузка и прогрев модели, готовность)
+- Время до готовности (time-to-ready) после перезагрузки или падения
+- Разбивку времени импорта по пакетам (python -X importtime)
+
+Использование:
+    python -m vision.startup_profile                    # импорт inference_service
+    python -m vision.startup_profile --module ultralytics --top 15
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+import time
+from typing import Optional
+
+_IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|\s*(\S+)")
+
+
+def process_uptime() -> Optional[float]:
+    """
+    Время с момента запуска процесса (включая старт интерпретатора).
+
+    Returns:
+        Секунды или None, если /proc недоступен.
+    """
+    try:
+        with open("/proc/self/stat", "r") as f:
+            # Имя процесса в скобках может содержать пробелы
+            fields = f.read().rsplit(")", 1)[1].split()
+        with open("/proc/uptime", "r") as f:
+            system_uptime = float(f.read().split()[0])
+        start_ticks = int(fields[19])
+        return system_uptime - start_ticks / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class StartupProfile:
+    """
+    Отметки фаз запуска.
+
+    Время отсчитывается от старта процесса (по /proc), а если он
+    недоступен - от создания профиля.
+
+    Использование:
+        profile = StartupProfile()
+        profile.mark("imports")
+        ...
+        profile.mark("ready")
+        logger.info(profile.summary())
+    """
+
+    def __init__(self):
+        uptime = process_uptime()
+        self._origin = time.monotonic() - (uptime if uptime is not None else 0.0)
+        self._phases: dict[str, float] = {}
+
+    def mark(self, phase: str) -> float:
+        """
+        Отметить завершение фазы (повторная отметка игнорируется).
+
+        Args:
+            phase: Имя фазы.
+
+        Returns:
+            Миллисекунды от старта процесса.
+        """
+        if phase not in self._phases:
+            self._phases[phase] = round((time.monotonic() - self._origin) * 1000, 1)
+        return self._phases[phase]
+
+    def elapsed_ms(self, phase: str) -> Optional[float]:
+        """Время фазы от старта процесса (None если фазы ещё не было)."""
+        return self._phases.get(phase)
+
+    def phases(self) -> dict[str, float]:
+        """Отметки фаз в порядке их завершения (мс от старта процесса)."""
+        return dict(self._phases)
+
+    def summary(self) -> str:
+        """Строка для лога: фазы в порядке завершения."""
+        return ", ".join(f"{phase}={ms:.0f} мс" for phase, ms in self._phases.items())
+
+
+def import_breakdown(module: str, top: int = 10) -> tuple[float, list[tuple[str, float]]]:
+    """
+    Разбивка времени импорта модуля по пакетам верхнего уровня.
+
+    Импорт выполняется в отдельном процессе с -X importtime, поэтому
+    уже загруженные в текущий процесс модули не искажают результат.
+
+    Args:
+        module: Импортируемый модуль.
+        top: Сколько самых медленных пакетов вернуть.
+
+    Returns:
+        Кортеж (общее время мс, [(пакет, мс), ...] по убыванию).
+        Время пакета включает его зависимости, поэтому суммы пересекаются.
+    """
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, check=False,
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr.strip().splitlines()[-1] if completed.stderr else module)
+
+    packages: dict[str, float] = {}
+    total_us = 0
+    for line in completed.stderr.splitlines():
+        match = _IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        cumulative_us, name = int(match.group(2)), match.group(3)
+        if name == module:
+            total_us = cumulative_us
+        elif "." not in name and not name.startswith("_"):
+            # Пакет верхнего уровня: накопленное время включает его зависимости
+            packages[name] = max(packages.get(name, 0.0), cumulative_us / 1000)
+
+    ranked = sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]
+    return total_us / 1000, [(name, round(ms, 1)) for name, ms in ranked]
+
+
+def main():
+    """Печать разбивки времени импорта."""
+    parser = argparse.ArgumentParser(description="Профиль времени импорта")
+    parser.add_argument("--module", default="vision.inference_service", help="Импортируемый модуль")
+    parser.add_argument("--top", type=int, default=10, help="Количество пакетов в отчёте")
+    args = parser.parse_args()
+
+    total_ms, packages = import_breakdown(args.module, args.top)
+    print(f"Импорт {args.module}: {total_ms:.0f} мс")
+    for name, ms in packages:
+        print(f"  {name:<24} {ms:8.1f} мс")
+
+
+if __name__ == "__main__":
+    main()
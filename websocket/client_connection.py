@@ -0,0 +1,195 @@
+"""
+ClientConnection - исходящая очередь и writer-задача для одного клиента.
+
+Обеспечивает:
+- Неблокирующую постановку сообщений в ограниченную очередь
+- Отправку в отдельной asyncio задаче (медленный клиент не задерживает других)
+- Политику переполнения: вытеснение старых сообщений или отключение клиента
+- Метрики задержки очереди
+"""
+import asyncio
+import time
+from collections import deque
+from typing import Callable, Optional
+
+from core.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+# Политики переполнения очереди
+OVERFLOW_DROP_OLDEST = "drop_oldest"
+OVERFLOW_EVICT = "evict"
+
+
+class ClientConnection:
+    """
+    Исходящий канал одного WebSocket клиента.
+
+    Все методы вызываются только из потока event loop сервера.
+
+    Использование:
+        conn = ClientConnection("app", websocket, on_evict=callback)
+        conn.start()
+        conn.enqueue('{"event": ...}')
+        ...
+        await conn.stop()
+    """
+
+    def __init__(
+        self,
+        name: str,
+        websocket,
+        max_queue: int = 100,
+        overflow: str = OVERFLOW_DROP_OLDEST,
+        send_timeout: float = 5.0,
+        on_evict: Optional[Callable[["ClientConnection", str], None]] = None,
+    ):
+        """
+        Инициализация канала.
+
+        Args:
+            name: Имя клиента.
+            websocket: Соединение websockets.
+            max_queue: Максимальное количество сообщений в очереди.
+            overflow: Политика при переполнении (drop_oldest или evict).
+            send_timeout: Максимальное время одной отправки, после которого клиент отключается.
+            on_evict: Вызывается при отключении клиента (conn, причина).
+        """
+        self.name = name
+        self.websocket = websocket
+        self._max_queue = max_queue
+        self._overflow = overflow
+        self._send_timeout = send_timeout
+        self._on_evict = on_evict
+
+        self._queue: deque = deque()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._closed = False
+
+        # Метрики
+        self.sent = 0
+        self.dropped = 0
+        self.last_lag_ms = 0.0
+        self.max_lag_ms = 0.0
+        self._lag_sum_ms = 0.0
+
+    @property
+    def closed(self) -> bool:
+        """Канал закрыт (клиент отключен или вытеснен)."""
+        return self._closed
+
+    def start(self) -> None:
+        """Запустить writer-задачу."""
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(
+                self._writer(), name=f"ws-writer-{self.name}"
+            )
+
+    async def stop(self) -> None:
+        """Остановить writer-задачу и очистить очередь."""
+        self._closed = True
+        self._queue.clear()
+        if self._task and self._task is not asyncio.current_task():
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+        self._task = None
+
+    def enqueue(self, message: str) -> bool:
+        """
+        Поставить сообщение в очередь без ожидания.
+
+        Args:
+            message: Сообщение для клиента.
+
+        Returns:
+            True если сообщение принято в очередь.
+        """
+        if self._closed:
+            return False
+
+        if len(self._queue) >= self._max_queue:
+            if self._overflow == OVERFLOW_EVICT:
+                self._evict("send queue overflow")
+                return False
+            self._queue.popleft()
+            self.dropped += 1
+            if self.dropped == 1 or self.dropped % 100 == 0:
+                logger.warning(f"Очередь клиента {self.name} переполнена, отброшено: {self.dropped}")
+
+        self._queue.append((message, time.monotonic()))
+        self._wakeup.set()
+        return True
+
+    def stats(self) -> dict:
+        """
+        Метрики канала.
+
+        Returns:
+            Словарь: размер очереди, отправлено, отброшено, задержки очереди.
+        """
+        oldest_ms = 0.0
+        if self._queue:
+            oldest_ms = (time.monotonic() - self._queue[0][1]) * 1000
+        return {
+            "queued": len(self._queue),
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "oldest_queued_ms": round(oldest_ms, 2),
+            "last_lag_ms": round(self.last_lag_ms, 2),
+            "avg_lag_ms": round(self._lag_sum_ms / self.sent, 2) if self.sent else 0.0,
+            "max_lag_ms": round(self.max_lag_ms, 2),
+        }
+
+    async def _writer(self) -> None:
+        """Цикл отправки сообщений из очереди."""
+        try:
+            while not self._closed:
+                if not self._queue:
+                    self._wakeup.clear()
+                    await self._wakeup.wait()
+                    continue
+
+                message, enqueued_at = self._queue.popleft()
+                try:
+                    await asyncio.wait_for(self.websocket.send(message), timeout=self._send_timeout)
+                except asyncio.TimeoutError:
+                    self._evict(f"send timeout {self._send_timeout} s")
+                    return
+                except Exception as e:
+                    self._evict(f"send error: {e}")
+                    return
+
+                lag_ms = (time.monotonic() - enqueued_at) * 1000
+                self.sent += 1
+                self.last_lag_ms = lag_ms
+                self._lag_sum_ms += lag_ms
+                if lag_ms > self.max_lag_ms:
+                    self.max_lag_ms = lag_ms
+        except asyncio.CancelledError:
+            pass
+
+    def _evict(self, reason: str) -> None:
+        """Отключить клиента: закрыть канал и соединение."""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.clear()
+        self._wakeup.set()
+        logger.warning(f"Клиент {self.name} отключен: {reason}")
+
+        if self._on_evict:
+            self._on_evict(self, reason)
+
+        # Закрытие медленного соединения не должно блокировать вызывающего
+        asyncio.get_running_loop().create_task(self._close_websocket(reason))
+
+    async def _close_websocket(self, reason: str) -> None:
+        """Закрыть WebSocket соединение (1013: try again later)."""
+        try:
+            await self.websocket.close(code=1013, reason=reason[:120])
+        except Exception:
+            pass
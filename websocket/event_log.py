@@ -0,0 +1,101 @@
+"""
+EventLog - ограниченный журнал событий с номерами последовательности.
+
+Обеспечивает:
+- Присвоение монотонного номера (seq) каждому событию клиента
+- Хранение последних N событий для повторной отправки (replay)
+- Определение, нужен ли клиенту полный снимок состояния
+"""
+import threading
+from collections import deque
+from typing import Optional
+
+
+class EventLog:
+    """
+    Кольцевой журнал событий одного клиента.
+
+    Событие в формате JSON-объекта получает поле "seq" (вставляется
+    в начало строки без повторного парсинга). Строковые сообщения
+    хранятся и отправляются как есть, но тоже занимают номер.
+
+    Использование:
+        log = EventLog(maxlen=256)
+        seq, message = log.append('{"event": "receiver_empty", ...}')
+        missed = log.since(last_seq)  # None → нужен снимок состояния
+    """
+
+    def __init__(self, maxlen: int = 256):
+        """
+        Инициализация журнала.
+
+        Args:
+            maxlen: Максимальное количество хранимых событий.
+        """
+        self._events: deque = deque(maxlen=maxlen)
+        self._last_seq = 0
+        self._lock = threading.Lock()
+
+    @property
+    def last_seq(self) -> int:
+        """Номер последнего записанного события (0 если событий не было)."""
+        with self._lock:
+            return self._last_seq
+
+    def append(self, message: str) -> tuple[int, str]:
+        """
+        Записать событие и присвоить ему номер.
+
+        Args:
+            message: Сообщение для клиента (JSON-объект или строка).
+
+        Returns:
+            Кортеж (seq, message_with_seq).
+        """
+        with self._lock:
+            self._last_seq += 1
+            seq = self._last_seq
+            stamped = self.stamp(message, seq)
+            self._events.append((seq, stamped))
+            return seq, stamped
+
+    def since(self, last_seq: int) -> Optional[list[str]]:
+        """
+        Получить события, пропущенные клиентом.
+
+        Args:
+            last_seq: Номер последнего события, полученного клиентом.
+
+        Returns:
+            Список сообщений с seq > last_seq или None, если часть из них
+            уже вытеснена из журнала (или last_seq из другой сессии сервера)
+            и клиенту нужен снимок состояния.
+        """
+        with self._lock:
+            if last_seq == self._last_seq:
+                return []
+            if last_seq > self._last_seq:
+                return None
+            oldest = self._events[0][0] if self._events else self._last_seq + 1
+            if last_seq + 1 < oldest:
+                return None
+            return [message for seq, message in self._events if seq > last_seq]
+
+    @staticmethod
+    def stamp(message: str, seq: int) -> str:
+        """
+        Вставить номер seq в JSON-объект.
+
+        Args:
+            message: Исходное сообщение.
+            seq: Номер события.
+
+        Returns:
+            Сообщение с полем "seq" или исходная строка, если это не JSON-объект.
+        """
+        if message.startswith("{") and message.endswith("}"):
+            body = message[1:].lstrip()
+            if body == "}":
+                return f'{{"seq": {seq}}}'
+            return f'{{"seq": {seq}, {body}'
+        return message
@@ -1,10 +1,16 @@
 import asyncio
+import json
 import websockets
-from typing import Set
+from datetime import datetime
+from typing import Callable, Optional, Set
 import threading
 import signal
-import time
+from core.clock import SYSTEM_CLOCK
+from core.flight_recorder import KIND_WS_IN, KIND_WS_OUT, compact_message
 from core.logging_config import get_logger
+from core.vision_protocol import parse_status
+from websocket.client_connection import ClientConnection, OVERFLOW_DROP_OLDEST, OVERFLOW_EVICT
+from websocket.event_log import EventLog
 
 logger = get_logger(__name__)
 
@@ -46,54 +52,188 @@ command_list = {
 }
 
 class WebSocket:
-    def __init__(self, PLC, host = "localhost", port= 8765):
+    def __init__(self, PLC, host = "localhost", port= 8765, replay_clients = ("app",), replay_size = 256, queue_size = 100, send_timeout = 5.0, clock = None):
         self.host = host
         self.port = port
         self.PLC = PLC
         self.clients = {}  # Словарь: {"client_name": websocket}
+        self._connections = {}  # Словарь: {"client_name": ClientConnection} (только из event loop)
+        self._queue_size = queue_size
+        self._send_timeout = send_timeout
         self._clients_lock = threading.Lock()  # Lock для потокобезопасного доступа к clients
         self.server = None
         self.loop = None
         self._thread = None
         self._running = False
+        # Часы для отметок входящих сообщений (виртуальные в симуляции)
+        self._clock = clock if clock is not None else SYSTEM_CLOCK
 
         # Новая архитектура: словарь последних сообщений
         self.client_messages = {}
+        # Последнее состояние клиента ({"status": ...}) - отдельно от ответов
+        self.client_status = {}
         self.message_lock = threading.Lock()
         
         # Старые переменные для обратной совместимости (deprecated)
         self.request = "NONE"
         self.response = ""
         self.message_app = ""
-        
+
+        # Журналы событий для повторной отправки после переподключения
+        self._event_logs = {name: EventLog(replay_size) for name in replay_clients}
+        self._snapshot_providers = {}
+
+        # Клиенты с журналом при переполнении отключаются (они сделают resync),
+        # остальным отбрасываются самые старые сообщения
+        self._overflow_policies = {name: OVERFLOW_EVICT for name in replay_clients}
+
+        # Бортовой самописец процесса (входящие и исходящие сообщения)
+        self._recorder = None
+
+    def set_flight_recorder(self, recorder):
+        """
+        Записывать входящие и исходящие сообщения в бортовой самописец.
+
+        Args:
+            recorder: FlightRecorder процесса.
+        """
+        self._recorder = recorder
+
+    def set_snapshot_provider(self, client_name: str, provider: Callable[[], dict]):
+        """
+        Задать источник снимка состояния для клиента.
+
+        Снимок отправляется вместо replay, если клиент отстал
+        сильнее, чем хранит журнал событий.
+
+        Args:
+            client_name: Имя клиента.
+            provider: Функция, возвращающая компактный словарь состояния.
+        """
+        self._snapshot_providers[client_name] = provider
+
+    def get_last_seq(self, client_name: str) -> int:
+        """Номер последнего события, записанного для клиента."""
+        log = self._event_logs.get(client_name)
+        return log.last_seq if log else 0
+
+    @staticmethod
+    def _parse_hello(message: str) -> tuple:
+        """
+        Разобрать сообщение регистрации клиента.
+
+        Поддерживает форматы:
+        - Строка: "app"
+        - JSON: {"client": "app", "last_seq": 42}
+
+        Returns:
+            Кортеж (client_name, last_seq или None).
+        """
+        if message.startswith("{"):
+            try:
+                data = json.loads(message)
+                if data.get("client"):
+                    last_seq = data.get("last_seq")
+                    return data["client"], int(last_seq) if last_seq is not None else None
+            except (json.JSONDecodeError, TypeError, ValueError, AttributeError):
+                pass
+        return message, None
+
+    def _build_resync(self, client_name: str, last_seq: int) -> list:
+        """
+        Подготовить сообщения для переподключившегося клиента.
+
+        Args:
+            client_name: Имя клиента.
+            last_seq: Номер последнего полученного клиентом события.
+
+        Returns:
+            Пропущенные события или один снимок состояния.
+        """
+        log = self._event_logs.get(client_name)
+        if log is None:
+            return []
+
+        missed = log.since(last_seq)
+        if missed is not None:
+            logger.info("Replay для '%s': %s событий (с seq %s)", client_name, len(missed), last_seq)
+            return missed
+
+        provider = self._snapshot_providers.get(client_name)
+        try:
+            data = provider() if provider else {}
+        except Exception as e:
+            logger.error(f"Ошибка получения снимка состояния для {client_name}: {e}")
+            data = {}
+        logger.info("Клиент '%s' отстал (seq %s), отправка снимка состояния", client_name, last_seq)
+        return [json.dumps({
+            "seq": log.last_seq,
+            "event": "state_snapshot",
+            "data": data,
+            "timestamp": datetime.now().isoformat()
+        })]
+
     async def _handler(self, websocket):
         client_name = None
-        logger.debug(f"Новое подключение. Всего клиентов: {len(self.clients)}")
+        logger.debug("Новое подключение. Всего клиентов: %s", len(self.clients))
         
         try:
-            # Первое сообщение - это имя клиента
-            client_name = await websocket.recv()
+            # Первое сообщение - это имя клиента (опционально с last_seq)
+            client_name, last_seq = self._parse_hello(await websocket.recv())
+            resync = self._build_resync(client_name, last_seq) if last_seq is not None else []
+
+            # Своя очередь и writer-задача: медленный клиент не задерживает остальных
+            connection = ClientConnection(
+                client_name,
+                websocket,
+                max_queue=max(self._queue_size, len(resync) + 1),
+                overflow=self._overflow_policies.get(client_name, OVERFLOW_DROP_OLDEST),
+                send_timeout=self._send_timeout,
+                on_evict=self._on_client_evicted,
+            )
+            # Пропущенные события встают в очередь раньше новых (дубликаты клиент отбрасывает по seq)
+            for message in resync:
+                connection.enqueue(message)
+            connection.start()
+
+            old_connection = self._connections.get(client_name)
+            self._connections[client_name] = connection
             with self._clients_lock:
                 self.clients[client_name] = websocket
+            if old_connection:
+                await old_connection.stop()
+                # Старое соединение закрывается в фоне: его handler завершится
+                # по ConnectionClosed, а зависший клиент не задержит регистрацию
+                asyncio.get_running_loop().create_task(self._close_replaced(old_connection))
 
             # Инициализируем хранилище для этого клиента
             with self.message_lock:
                 self.client_messages[client_name] = {
                     "message": "",
-                    "timestamp": time.time()
+                    "timestamp": self._clock.time()
                 }
             
-            logger.info(f"Клиент зарегистрирован: '{client_name}'. Всего: {len(self.clients)}")
+            logger.info("Клиент зарегистрирован: '%s'. Всего: %s", client_name, len(self.clients))
             
             # Дальше обрабатываем обычные сообщения
             while True:
                 message = await websocket.recv()
-                
+                if self._recorder is not None:
+                    self._recorder.record(KIND_WS_IN, {"client": client_name, "message": compact_message(message)})
+
+                # Состояние клиента приходит без запроса и не должно затирать
+                # ответ, которого ждёт Application (например, ответ vision)
+                status = parse_status(message)
+                if status is not None:
+                    with self.message_lock:
+                        self.client_status[client_name] = status
+                    continue
+
                 # Сохраняем в новую структуру
                 with self.message_lock:
                     self.client_messages[client_name] = {
                         "message": message,
-                        "timestamp": time.time()
+                        "timestamp": self._clock.time()
                     }
                 
                 # Обратная совместимость
@@ -102,30 +242,69 @@ class WebSocket:
                     self.message_app = message
                 
         except websockets.exceptions.ConnectionClosed:
-            logger.debug(f"Соединение закрыто ({client_name})")
+            logger.debug("Соединение закрыто (%s)", client_name)
         finally:
+            # Удаляем только своё соединение: клиент мог уже переподключиться
             if client_name:
+                connection = self._connections.get(client_name)
+                if connection is not None and connection.websocket is websocket:
+                    del self._connections[client_name]
+                    await connection.stop()
                 with self._clients_lock:
-                    if client_name in self.clients:
+                    current = self.clients.get(client_name)
+                    replaced = current is not None and current is not websocket
+                    if current is websocket:
                         del self.clients[client_name]
-                with self.message_lock:
-                    if client_name in self.client_messages:
-                        del self.client_messages[client_name]
+                if not replaced:
+                    with self.message_lock:
+                        if client_name in self.client_messages:
+                            del self.client_messages[client_name]
+                        self.client_status.pop(client_name, None)
             with self._clients_lock:
                 remaining = len(self.clients)
-            logger.info(f"Клиент отключен ({client_name}). Осталось: {remaining}")
+            logger.info("Клиент отключен (%s). Осталось: %s", client_name, remaining)
 
+    @staticmethod
+    async def _close_replaced(connection: ClientConnection):
+        """Закрыть соединение, заменённое повторной регистрацией клиента."""
+        try:
+            await connection.websocket.close(code=1000, reason="replaced by new connection")
+        except Exception:
+            pass
 
+    def _on_client_evicted(self, connection: ClientConnection, reason: str):
+        """Убрать вытесненного клиента из реестра, чтобы новые сообщения не копились."""
+        if self._connections.get(connection.name) is connection:
+            del self._connections[connection.name]
+        with self._clients_lock:
+            if self.clients.get(connection.name) is connection.websocket:
+                del self.clients[connection.name]
 
+    def get_client_stats(self) -> dict:
+        """
+        Метрики исходящих очередей по клиентам.
+
+        Returns:
+            Словарь {client_name: {queued, sent, dropped, *_lag_ms}}.
+        """
+        if self.loop and self.loop.is_running():
+            future = asyncio.run_coroutine_threadsafe(self._collect_stats(), self.loop)
+            try:
+                return future.result(timeout=1.0)
+            except Exception:
+                return {}
+        return {}
+
+    async def _collect_stats(self) -> dict:
+        return {name: conn.stats() for name, conn in self._connections.items()}
 
-    
     async def _run_server(self):
         self.server = await websockets.serve(
             self._handler,
             self.host,
             self.port
         )
-        logger.info(f"Сервер запущен на ws://{self.host}:{self.port}")
+        logger.info("Сервер запущен на ws://%s:%s", self.host, self.port)
         
         # Бесконечный цикл
         self._running = True
@@ -166,41 +345,42 @@ class WebSocket:
     
     async def send_to_client_async(self, client_name: str, message: str):
         """Отправить сообщение конкретному клиенту"""
-        with self._clients_lock:
-            websocket = self.clients.get(client_name)
-        if websocket:
-            try:
-                await websocket.send(message)
-            except Exception as e:
-                logger.error(f"Ошибка отправки клиенту {client_name}: {e}")
+        self._enqueue(client_name, message)
+
+    def _enqueue(self, client_name: str, message: str):
+        """Поставить сообщение в очередь клиента (только из потока event loop)."""
+        connection = self._connections.get(client_name)
+        if connection:
+            connection.enqueue(message)
         else:
-            logger.debug(f"Клиент {client_name} не найден")
+            logger.debug("Клиент %s не найден", client_name)
     
     def send_to_client(self, client_name: str, message: str):
         """Отправить сообщение конкретному клиенту (из синхронного кода)"""
+        # Событие записывается в журнал даже если клиент сейчас отключен
+        log = self._event_logs.get(client_name)
+        if log is not None:
+            _, message = log.append(message)
+        if self._recorder is not None:
+            self._recorder.record(KIND_WS_OUT, {"client": client_name, "message": compact_message(message)})
         if self.loop and self.loop.is_running():
-            asyncio.run_coroutine_threadsafe(
-                self.send_to_client_async(client_name, message),
-                self.loop
-            )
+            self.loop.call_soon_threadsafe(self._enqueue, client_name, message)
     
     async def broadcast_async(self, message: str):
         """Отправить сообщение всем клиентам"""
-        with self._clients_lock:
-            clients_copy = list(self.clients.values())
-        if clients_copy:
-            await asyncio.gather(
-                *[client.send(message) for client in clients_copy],
-                return_exceptions=True
-            )
+        self._broadcast(message)
+
+    def _broadcast(self, message: str):
+        """Поставить сообщение в очереди всех клиентов (только из потока event loop)."""
+        for connection in list(self._connections.values()):
+            connection.enqueue(message)
     
     def broadcast(self, message: str):
         """Отправить сообщение всем клиентам (из синхронного кода)"""
+        if self._recorder is not None:
+            self._recorder.record(KIND_WS_OUT, {"client": "*", "message": compact_message(message)})
         if self.loop and self.loop.is_running():
-            asyncio.run_coroutine_threadsafe(
-                self.broadcast_async(message),
-                self.loop
-            )
+            self.loop.call_soon_threadsafe(self._broadcast, message)
     
     def get_command(self, client_name: str) -> str:
         """Получить команду от клиента (одноразовое действие) и обнулить её"""
@@ -211,6 +391,11 @@ class WebSocket:
                 return message
             return ""
     
+    def get_status(self, client_name: str) -> Optional[dict]:
+        """Последнее сообщение о состоянии клиента ({"status": ...}) или None."""
+        with self.message_lock:
+            return self.client_status.get(client_name)
+
     def get_state(self, client_name: str) -> str:
         """Получить состояние от клиента (непрерывное значение)"""
         with self.message_lock: